@@ -0,0 +1,304 @@
+# cms.py
+import hashlib
+from datetime import datetime, timezone
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+# DER tags used by CMS (RFC 5652)
+SEQUENCE, SET, UTC_TIME = 0x30, 0x31, 0x17
+CONTEXT_0, CONTEXT_1 = 0xA0, 0xA1
+
+SIGNED_DATA = "1.2.840.113549.1.7.2"
+TST_INFO = "1.2.840.113549.1.9.16.1.4"
+ATTR_MESSAGE_DIGEST = "1.2.840.113549.1.9.4"
+ATTR_SIGNING_TIME = "1.2.840.113549.1.9.5"
+ATTR_TIMESTAMP_TOKEN = "1.2.840.113549.1.9.16.2.14"
+
+DIGESTS = {
+    "1.3.14.3.2.26": "sha1",
+    "2.16.840.1.101.3.4.2.4": "sha224",
+    "2.16.840.1.101.3.4.2.1": "sha256",
+    "2.16.840.1.101.3.4.2.2": "sha384",
+    "2.16.840.1.101.3.4.2.3": "sha512",
+    "1.2.840.113549.2.5": "md5",
+}
+HASHES = {"sha1": hashes.SHA1, "sha224": hashes.SHA224, "sha256": hashes.SHA256,
+          "sha384": hashes.SHA384, "sha512": hashes.SHA512}
+# Signature algorithm -> (key type, digest it implies, or None to use the signer's digest algorithm)
+SIGNATURE_ALGORITHMS = {
+    "1.2.840.113549.1.1.1": ("rsa", None),
+    "1.2.840.113549.1.1.5": ("rsa", "sha1"),
+    "1.2.840.113549.1.1.14": ("rsa", "sha224"),
+    "1.2.840.113549.1.1.11": ("rsa", "sha256"),
+    "1.2.840.113549.1.1.12": ("rsa", "sha384"),
+    "1.2.840.113549.1.1.13": ("rsa", "sha512"),
+    "1.2.840.113549.1.1.10": ("rsa-pss", None),
+    "1.2.840.10045.2.1": ("ecdsa", None),
+    "1.2.840.10045.4.1": ("ecdsa", "sha1"),
+    "1.2.840.10045.4.3.1": ("ecdsa", "sha224"),
+    "1.2.840.10045.4.3.2": ("ecdsa", "sha256"),
+    "1.2.840.10045.4.3.3": ("ecdsa", "sha384"),
+    "1.2.840.10045.4.3.4": ("ecdsa", "sha512"),
+    "1.3.101.112": ("ed25519", None),
+}
+WEAK_DIGESTS = {"md5", "sha1"}
+
+
+class CMSError(ValueError):
+    """A signature blob that is not the CMS SignedData it claims to be"""
+
+
+class SignerInfo:
+    """One signer of a CMS SignedData structure, with the raw pieces needed to verify it"""
+
+    def __init__(self):
+        self.issuer = None           # DER of the issuer Name, for issuerAndSerialNumber
+        self.serial = None
+        self.key_id = None           # subjectKeyIdentifier, the other way to name the signer
+        self.digest_algorithm = None
+        self.signature_algorithm = None
+        self.signature_parameters = None
+        self.signed_attributes = None  # DER re-tagged as SET OF, which is what gets signed
+        self.message_digest = None
+        self.signing_time = None
+        self.signature = b""
+        self.has_timestamp = False
+        self.timestamp_token = None  # DER ContentInfo of an RFC 3161 signature timestamp
+
+
+class SignedData:
+    """The parts of a CMS SignedData (RFC 5652) that signature verification needs"""
+
+    def __init__(self, blob: bytes):
+        blob = _trim(blob)
+        content_type, content = _children(blob, *_header(blob, 0)[1:3])[:2]
+        if _oid(blob, content_type) != SIGNED_DATA:
+            raise CMSError("Not a CMS SignedData structure")
+        signed_data = _children(blob, *_header(blob, content)[1:3])[0]
+        fields = _children(blob, *_header(blob, signed_data)[1:3])
+
+        encapsulated = _children(blob, *_header(blob, fields[2])[1:3])
+        self.content_type = _oid(blob, encapsulated[0])
+        self.content = None
+        if len(encapsulated) > 1:
+            # [0] EXPLICIT OCTET STRING, possibly BER-chunked into constructed pieces
+            self.content = _octets(blob, _children(blob, *_header(blob, encapsulated[1])[1:3])[0])
+
+        self.certificates = []
+        signer_set = None
+        for field in fields[3:]:
+            tag, start, end = _header(blob, field)
+            if tag == CONTEXT_0:
+                self.certificates = [blob[child:_end(blob, child)] for child in _children(blob, start, end)
+                                     if blob[child] == SEQUENCE]
+            elif tag == SET:
+                signer_set = (start, end)
+        if signer_set is None:
+            raise CMSError("SignedData without signer infos")
+        self.signers = [_signer_info(blob, offset) for offset in _children(blob, *signer_set)]
+
+
+def content_digest_matches(signed: SignedData, signer: SignerInfo, document_digest) -> bool:
+    """Does what the signer signed commit to the document's digest?
+
+    document_digest(algorithm) returns the digest of the signed byte ranges.
+    Detached signatures carry it as the messageDigest attribute; timestamp
+    tokens carry it in TSTInfo's messageImprint; adbe.pkcs7.sha1 carries a
+    SHA-1 of the document as the encapsulated content.
+    """
+    if signed.content is None:
+        return signer.message_digest == document_digest(signer.digest_algorithm)
+    if signer.message_digest is not None and signer.message_digest != hashlib.new(
+        signer.digest_algorithm, signed.content
+    ).digest():
+        return False
+    if signed.content_type == TST_INFO:
+        algorithm, imprint = _message_imprint(signed.content)
+        return imprint == document_digest(algorithm)
+    return signed.content == document_digest("sha1")
+
+
+def verify_signer(signed: SignedData, signer: SignerInfo, public_key):
+    """Check the signature value against the signer's key; raises InvalidSignature or CMSError"""
+    key_type, implied = SIGNATURE_ALGORITHMS.get(signer.signature_algorithm, (None, None))
+    if key_type is None:
+        raise CMSError(f"Unsupported signature algorithm {signer.signature_algorithm}")
+    data = signer.signed_attributes if signer.signed_attributes is not None else signed.content
+    if data is None:
+        raise CMSError("Detached signature without signed attributes")
+    digest = _hash(implied or signer.digest_algorithm)
+
+    if key_type == "rsa" and isinstance(public_key, rsa.RSAPublicKey):
+        public_key.verify(signer.signature, data, padding.PKCS1v15(), digest)
+    elif key_type == "rsa-pss" and isinstance(public_key, rsa.RSAPublicKey):
+        digest = _hash(_pss_digest(signer.signature_parameters) or signer.digest_algorithm)
+        public_key.verify(signer.signature, data, padding.PSS(padding.MGF1(digest), padding.PSS.AUTO), digest)
+    elif key_type == "ecdsa" and isinstance(public_key, ec.EllipticCurvePublicKey):
+        public_key.verify(signer.signature, data, ec.ECDSA(digest))
+    elif key_type == "ed25519" and isinstance(public_key, ed25519.Ed25519PublicKey):
+        public_key.verify(signer.signature, data)
+    else:
+        raise InvalidSignature(f"{key_type} signature does not match the signer's {type(public_key).__name__}")
+
+
+def digest_name(oid: str) -> str:
+    name = DIGESTS.get(oid)
+    if name is None:
+        raise CMSError(f"Unsupported digest algorithm {oid}")
+    return name
+
+
+# DER reading
+
+def _header(blob: bytes, offset: int):
+    """(tag, content start, content end) of the element at offset; indefinite lengths are resolved"""
+    if offset + 2 > len(blob):
+        raise CMSError("Truncated DER element")
+    tag, length = blob[offset], blob[offset + 1]
+    start = offset + 2
+    if length == 0x80:
+        # BER indefinite length: children up to the end-of-contents octets
+        end = start
+        while blob[end:end + 2] != b"\x00\x00":
+            end = _end(blob, end)
+        return tag, start, end
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(blob[start:start + count], "big")
+        start += count
+    if start + length > len(blob):
+        raise CMSError("DER length runs past the end of the signature")
+    return tag, start, start + length
+
+
+def _end(blob: bytes, offset: int) -> int:
+    indefinite = blob[offset + 1] == 0x80
+    end = _header(blob, offset)[2]
+    return end + 2 if indefinite else end
+
+
+def _children(blob: bytes, start: int, end: int) -> list:
+    offsets = []
+    while start < end and blob[start:start + 2] != b"\x00\x00":
+        offsets.append(start)
+        start = _end(blob, start)
+    return offsets
+
+
+def _value(blob: bytes, offset: int) -> bytes:
+    _, start, end = _header(blob, offset)
+    return blob[start:end]
+
+
+def _octets(blob: bytes, offset: int) -> bytes:
+    tag, start, end = _header(blob, offset)
+    if tag & 0x20:
+        return b"".join(_octets(blob, child) for child in _children(blob, start, end))
+    return blob[start:end]
+
+
+def _oid(blob: bytes, offset: int) -> str:
+    raw = _value(blob, offset)
+    if not raw:
+        raise CMSError("Empty object identifier")
+    parts = [min(raw[0] // 40, 2), raw[0] - 40 * min(raw[0] // 40, 2)]
+    value = 0
+    for byte in raw[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(part) for part in parts)
+
+
+def _time(blob: bytes, offset: int):
+    tag = blob[offset]
+    text = _value(blob, offset).decode("ascii").rstrip("Z")
+    layout = "%y%m%d%H%M%S" if tag == UTC_TIME else "%Y%m%d%H%M%S"
+    return datetime.strptime(text[:12 if tag == UTC_TIME else 14], layout).replace(tzinfo=timezone.utc)
+
+
+def _trim(blob: bytes) -> bytes:
+    """/Contents is zero-padded to its reserved size; keep just the outer element"""
+    if not blob or blob[0] != SEQUENCE:
+        raise CMSError("Signature contents are not a DER SEQUENCE")
+    return blob[:_end(blob, 0)]
+
+
+def _signer_info(blob: bytes, offset: int) -> SignerInfo:
+    signer = SignerInfo()
+    fields = _children(blob, *_header(blob, offset)[1:3])
+    sid_tag, sid_start, sid_end = _header(blob, fields[1])
+    if sid_tag == SEQUENCE:
+        issuer, serial = _children(blob, sid_start, sid_end)[:2]
+        signer.issuer = blob[issuer:_end(blob, issuer)]
+        signer.serial = int.from_bytes(_value(blob, serial), "big", signed=True)
+    else:
+        signer.key_id = blob[sid_start:sid_end]
+    signer.digest_algorithm = digest_name(_oid(blob, _children(blob, *_header(blob, fields[2])[1:3])[0]))
+
+    position = 3
+    if blob[fields[position]] == CONTEXT_0:
+        _, start, end = _header(blob, fields[position])
+        # Signed over as an explicit SET OF, not the [0] IMPLICIT tag it is stored with
+        signer.signed_attributes = bytes([SET]) + blob[fields[position] + 1:_end(blob, fields[position])]
+        for attribute in _children(blob, start, end):
+            kind, values = _children(blob, *_header(blob, attribute)[1:3])[:2]
+            first = _children(blob, *_header(blob, values)[1:3])[0]
+            kind = _oid(blob, kind)
+            if kind == ATTR_MESSAGE_DIGEST:
+                signer.message_digest = _value(blob, first)
+            elif kind == ATTR_SIGNING_TIME:
+                signer.signing_time = _time(blob, first)
+        position += 1
+
+    algorithm = _children(blob, *_header(blob, fields[position])[1:3])
+    signer.signature_algorithm = _oid(blob, algorithm[0])
+    if len(algorithm) > 1 and blob[algorithm[1]] == SEQUENCE:
+        signer.signature_parameters = (blob, algorithm[1])
+    signer.signature = _value(blob, fields[position + 1])
+
+    for field in fields[position + 2:]:
+        if blob[field] == CONTEXT_1:
+            for attribute in _children(blob, *_header(blob, field)[1:3]):
+                kind, values = _children(blob, *_header(blob, attribute)[1:3])[:2]
+                if _oid(blob, kind) == ATTR_TIMESTAMP_TOKEN:
+                    signer.has_timestamp = True
+                    token = _children(blob, *_header(blob, values)[1:3])[0]
+                    signer.timestamp_token = blob[token:_end(blob, token)]
+    return signer
+
+
+def _pss_digest(parameters):
+    """Hash algorithm named in RSASSA-PSS parameters ([0] hashAlgorithm; SHA-1 when absent)"""
+    if parameters is None:
+        return None
+    blob, offset = parameters
+    for child in _children(blob, *_header(blob, offset)[1:3]):
+        if blob[child] == CONTEXT_0:
+            algorithm = _children(blob, *_header(blob, child)[1:3])[0]
+            return digest_name(_oid(blob, _children(blob, *_header(blob, algorithm)[1:3])[0]))
+    return "sha1"
+
+
+def _message_imprint(tst_info: bytes):
+    """(digest algorithm, hashed message) from an RFC 3161 TSTInfo"""
+    fields = _children(tst_info, *_header(tst_info, 0)[1:3])
+    algorithm, hashed = _children(tst_info, *_header(tst_info, fields[2])[1:3])
+    algorithm = _oid(tst_info, _children(tst_info, *_header(tst_info, algorithm)[1:3])[0])
+    return digest_name(algorithm), _value(tst_info, hashed)
+
+
+def timestamp_info(tst_info: bytes):
+    """(digest algorithm, hashed message, genTime) from an RFC 3161 TSTInfo"""
+    fields = _children(tst_info, *_header(tst_info, 0)[1:3])
+    algorithm, imprint = _message_imprint(tst_info)
+    return algorithm, imprint, _time(tst_info, fields[4])
+
+
+def _hash(name: str):
+    if name not in HASHES:
+        raise CMSError(f"Unsupported digest algorithm {name}")
+    return HASHES[name]()
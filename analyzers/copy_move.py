@@ -0,0 +1,257 @@
+# copy_move.py
+import math
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Copy-move matching is costlier than the per-cell checks, so it gets its own budget
+PIXEL_BUDGET = int(os.getenv("COPY_MOVE_PIXEL_BUDGET", str(2_000_000)))
+STRIDE = int(os.getenv("COPY_MOVE_STRIDE", "1"))
+
+BLOCK = 16
+FREQUENCIES = 3        # features are the FREQUENCIES x FREQUENCIES lowest DCT coefficients
+SORT_STEP = 16         # features are bucketed this coarsely for sorting
+TOLERANCE = 4          # coefficients (orthonormal DCT units) may differ by this much and still match
+NEIGHBOURS = 16        # rows compared after each row in sorted feature order
+MIN_TEXTURE = 3.0      # per-pixel AC std below this is background, not content
+MIN_BALANCE = 0.15     # share of AC energy needed in each direction; rules and strokes have ~0
+MIN_MATCHES = 32       # blocks that must share a shift before it counts as a clone
+MIN_CLONE_SIZE = 3 * BLOCK  # clones narrower than this are mostly repeated words and rules
+MIN_COVERAGE = 0.3     # share of a patch's cells with content that must hold a match
+GAP_CELLS = 1
+MAX_SHIFT_CLUSTERS = 256
+MAX_PARTNERS = 2       # a patch paired with this many other patches is a recurring pattern
+MAX_CLONES = 5
+BAND_BLOCKS = 32       # block rows whose features are computed at a time
+
+
+def _dct_basis(size: int, count: int) -> np.ndarray:
+    n = np.arange(size)
+    basis = np.cos((2 * n[None, :] + 1) * np.arange(count)[:, None] * np.pi / (2 * size)) * np.sqrt(2 / size)
+    basis[0] /= np.sqrt(2)
+    return basis.astype(np.float32)
+
+
+BASIS = _dct_basis(BLOCK, FREQUENCIES)
+
+
+def detect_copy_move(image, scale: float = 1.0, pixel_budget: int = PIXEL_BUDGET, stride: int = STRIDE):
+    """Find areas of an 8-bit luminance PIL image duplicated elsewhere in it.
+
+    Returns (regions, info). Regions are boxes in original-image pixels
+    (scale maps the given image back to the original), each paired with the
+    box it duplicates.
+    """
+    if image.width * image.height > pixel_budget:
+        factor = math.ceil(math.sqrt(image.width * image.height / pixel_budget))
+        image = image.reduce(factor)
+        scale *= factor
+    pixels = np.asarray(image, dtype=np.uint8)
+    if min(pixels.shape) < 4 * BLOCK:
+        return [], {"skipped": "Image too small to analyze"}
+
+    positions, features = block_features(pixels, stride)
+    info = {"blocks": int(len(positions)), "stride": stride}
+    if len(positions) < MIN_MATCHES:
+        info["matches"] = 0
+        return [], info
+
+    sources, shifts = match_blocks(positions, features)
+    info["matches"] = int(len(sources))
+    candidates = [
+        (box, shift)
+        for cluster_sources, shift in cluster_shifts(sources, shifts, stride)
+        for box in clone_regions(cluster_sources, positions)
+    ]
+    regions = [_region(box, shift, scale) for box, shift in _isolated(candidates)]
+    regions.sort(key=lambda region: region["matches"], reverse=True)
+    return regions[:MAX_CLONES], info
+
+
+def block_features(pixels: np.ndarray, stride: int = STRIDE):
+    """Quantized low-frequency DCT features of every textured BLOCK x BLOCK block at the stride.
+
+    The 2-D DCT is separable, so features are computed with two small matrix
+    products over sliding-window views, a band of block rows at a time.
+    Returns (positions as (y, x) int32 pairs, features rounded to int16 rows).
+    """
+    height, width = pixels.shape
+    block_rows = (height - BLOCK) // stride + 1
+    block_cols = (width - BLOCK) // stride + 1
+    all_positions, all_features = [], []
+
+    for first in range(0, block_rows, BAND_BLOCKS):
+        last = min(first + BAND_BLOCKS, block_rows)
+        band = pixels[first * stride:(last - 1) * stride + BLOCK].astype(np.float32)
+        vertical = sliding_window_view(band, BLOCK, axis=0)[::stride] @ BASIS.T  # (rows, width, F)
+        blocks = sliding_window_view(vertical, BLOCK, axis=1)[:, ::stride] @ BASIS.T  # (rows, cols, F, F)
+        coefficients = blocks.reshape(last - first, block_cols, FREQUENCIES * FREQUENCIES)
+
+        # Skip background (flat blocks match each other everywhere) and one-directional
+        # structure such as rules and long strokes, which repeats all over a document
+        energy = blocks ** 2
+        across = energy[:, :, 1:, :].sum(axis=(2, 3))  # vertical frequencies: horizontal edges
+        along = energy[:, :, :, 1:].sum(axis=(2, 3))   # horizontal frequencies: vertical edges
+        total = energy.sum(axis=(2, 3)) - energy[:, :, 0, 0]
+        texture = np.sqrt(total) / BLOCK
+        balance = np.minimum(across, along) / np.maximum(total, 1e-6)
+        ys, xs = np.nonzero((texture >= MIN_TEXTURE) & (balance >= MIN_BALANCE))
+        all_positions.append(np.stack([(ys + first) * stride, xs * stride], axis=1).astype(np.int32))
+        all_features.append(np.rint(coefficients[ys, xs]).astype(np.int16))
+
+    return np.concatenate(all_positions), np.concatenate(all_features)
+
+
+def match_blocks(positions: np.ndarray, features: np.ndarray):
+    """Pair blocks with near-identical features via lexicographic sort instead of all pairs.
+
+    Features are bucketed by SORT_STEP and sorted; each row is compared with
+    the next NEIGHBOURS rows. A second pass with buckets offset by half a step
+    catches pairs that straddle a bucket edge. Equal keys sort by position, so
+    runs of identical blocks along a rule only pair with their immediate
+    neighbours and fall under the minimum shift.
+
+    Returns (source positions, shift vectors) with shifts normalized to point
+    right (or down), so both halves of a clone agree.
+    """
+    min_shift = 2 * BLOCK
+    pairs = []
+    for offset in (0, SORT_STEP // 2):
+        buckets = (features + offset) // SORT_STEP
+        order = np.lexsort([positions[:, 1], positions[:, 0]] + [buckets[:, i] for i in reversed(range(buckets.shape[1]))])
+        # Column-major copy, so each coefficient can be compared as one contiguous array
+        columns = np.asfortranarray(features[order])
+        sorted_positions = positions[order]
+        for step in range(1, NEIGHBOURS + 1):
+            # Narrow the candidates one coefficient at a time; most rows fail on the first few
+            rows = np.nonzero(np.abs(columns[step:, 0] - columns[:-step, 0]) <= TOLERANCE)[0]
+            for i in range(1, columns.shape[1]):
+                rows = rows[np.abs(columns[rows + step, i] - columns[rows, i]) <= TOLERANCE]
+            first = sorted_positions[rows]
+            second = sorted_positions[rows + step]
+            shift = second - first
+            far = np.abs(shift).max(axis=1) >= min_shift
+            first, second, shift = first[far], second[far], shift[far]
+            flip = (shift[:, 1] < 0) | ((shift[:, 1] == 0) & (shift[:, 0] < 0))
+            first[flip] = second[flip]
+            shift[flip] = -shift[flip]
+            pairs.append(np.concatenate([first, shift], axis=1))
+    pairs = np.unique(np.concatenate(pairs), axis=0)
+    return pairs[:, :2], pairs[:, 2:]
+
+
+def cluster_shifts(sources: np.ndarray, shifts: np.ndarray, stride: int = STRIDE):
+    """Group matches by shift vector; a clone shows up as many blocks sharing one shift.
+
+    Shifts are binned at twice the stride and each strong bin absorbs its
+    neighbours, since a clone offset that is not a multiple of the stride
+    splits its matches across adjacent bins. Yields (source positions, shift).
+    """
+    if not len(shifts):
+        return
+    bins = np.floor_divide(shifts, 2 * stride)
+    unique, inverse, counts = np.unique(bins, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    taken = np.zeros(len(unique), bool)
+    for index in np.argsort(-counts)[:MAX_SHIFT_CLUSTERS]:
+        if counts[index] < MIN_MATCHES / 4:
+            return
+        if taken[index]:
+            continue
+        near = (np.abs(unique - unique[index]).max(axis=1) <= 1) & ~taken
+        members = np.isin(inverse, np.nonzero(near)[0])
+        if members.sum() < MIN_MATCHES:
+            continue
+        taken |= near
+        yield np.unique(sources[members], axis=0), np.median(shifts[members], axis=0)
+
+
+def clone_regions(sources: np.ndarray, positions: np.ndarray):
+    """Split one shift cluster into connected patches and keep the ones that look like a clone.
+
+    Scattered matches that happen to share a shift form thin strips or sparse
+    patches; a cloned stamp, signature or photo is a compact patch where most
+    BLOCK-sized cells with content have a match. Cells up to GAP_CELLS apart
+    are connected, since thin strokes match only in places.
+    Yields (top, left, bottom, right, matched blocks) in analyzed pixels.
+    """
+    cells = {tuple(cell) for cell in (sources // BLOCK).tolist()}
+    reach = range(-GAP_CELLS, GAP_CELLS + 1)
+    while cells:
+        stack = [cells.pop()]
+        component = []
+        while stack:
+            cell = stack.pop()
+            component.append(cell)
+            for dy in reach:
+                for dx in reach:
+                    neighbour = (cell[0] + dy, cell[1] + dx)
+                    if neighbour in cells:
+                        cells.remove(neighbour)
+                        stack.append(neighbour)
+        rows, cols = zip(*component)
+        top, left = min(rows) * BLOCK, min(cols) * BLOCK
+        bottom, right = (max(rows) + 2) * BLOCK, (max(cols) + 2) * BLOCK
+        if bottom - top < MIN_CLONE_SIZE or right - left < MIN_CLONE_SIZE:
+            continue
+        matched = int(_inside(sources, top, left, bottom, right).sum())
+        if matched < MIN_MATCHES:
+            continue
+        content_cells = len(np.unique(positions[_inside(positions, top, left, bottom, right)] // BLOCK, axis=0))
+        if len(component) < MIN_COVERAGE * content_cells:
+            continue
+        yield top, left, bottom, right, matched
+
+
+def _isolated(candidates: list) -> list:
+    """Drop candidate pairs that share a patch with other pairs.
+
+    A clone pairs one patch with one other; a patch that pairs with several
+    (a table column, a repeated heading, lines of boilerplate) is a pattern
+    that occurs naturally several times.
+    """
+    def patches(candidate):
+        (top, left, bottom, right, _), (dy, dx) = candidate
+        return [(top, left, bottom, right), (top + dy, left + dx, bottom + dy, right + dx)]
+
+    def overlaps(a, b):
+        height = min(a[2], b[2]) - max(a[0], b[0])
+        width = min(a[3], b[3]) - max(a[1], b[1])
+        smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+        return height > 0 and width > 0 and height * width >= 0.5 * smaller
+
+    kept = []
+    for i, candidate in enumerate(candidates):
+        partners = sum(
+            1 for j, other in enumerate(candidates)
+            if i != j and any(overlaps(a, b) for a in patches(candidate) for b in patches(other))
+        )
+        if partners < MAX_PARTNERS:
+            kept.append(candidate)
+    return kept
+
+
+def _inside(points: np.ndarray, top: int, left: int, bottom: int, right: int) -> np.ndarray:
+    return (points[:, 0] >= top) & (points[:, 0] < bottom) & (points[:, 1] >= left) & (points[:, 1] < right)
+
+
+def _region(box: tuple, shift: np.ndarray, scale: float) -> dict:
+    """Report a cloned patch in original-image pixels together with the patch it duplicates"""
+    top, left, bottom, right, matched = box
+    dy, dx = shift
+    return {
+        "x": int(left * scale),
+        "y": int(top * scale),
+        "width": int((right - left) * scale),
+        "height": int((bottom - top) * scale),
+        "score": round(min(1.0, matched / (4 * MIN_MATCHES)), 2),
+        "method": "copyMove",
+        "copiedTo": {
+            "x": int((left + dx) * scale),
+            "y": int((top + dy) * scale),
+            "width": int((right - left) * scale),
+            "height": int((bottom - top) * scale),
+        },
+        "matches": matched,
+    }
@@ -0,0 +1,77 @@
+# deadline.py
+import os
+import threading
+import time
+
+# Default per-document budget in seconds (0 = no deadline) and the most a client may ask for
+ANALYSIS_DEADLINE = float(os.getenv("ANALYSIS_DEADLINE", "30"))
+ANALYSIS_DEADLINE_MAX = float(os.getenv("ANALYSIS_DEADLINE_MAX", "300"))
+# Share of the budget held back so analyzers wrap up before the pipeline stops waiting
+DEADLINE_RESERVE = float(os.getenv("ANALYSIS_DEADLINE_RESERVE", "0.15"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work is started after its request was given up on"""
+
+
+class Deadline:
+    """Time budget for one document, shared by the pipeline and its analyzers.
+
+    Analyzers poll expired() between units of work (pages, images, signatures)
+    and return what they have once it is true. The pipeline waits a little
+    longer, until hard_remaining() runs out, then cancels: sections still
+    running are reported as timed out and the document context stops handing
+    out handles.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.hard = self.started + seconds
+        self.soft = self.hard - seconds * DEADLINE_RESERVE
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        """Seconds analyzers have left before they should return partial results"""
+        return max(0.0, self.soft - time.monotonic())
+
+    def hard_remaining(self) -> float:
+        """Seconds the pipeline has left before it stops waiting"""
+        return max(0.0, self.hard - time.monotonic())
+
+    def expired(self) -> bool:
+        return self._cancelled.is_set() or time.monotonic() >= self.soft
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise DeadlineExceeded once the pipeline has given up on this document"""
+        if self._cancelled.is_set():
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded")
+
+
+def parse_deadline(value: float = None) -> float:
+    """Validate a client-supplied budget in seconds; None means the server default"""
+    if value is not None and not 0 < value <= ANALYSIS_DEADLINE_MAX:
+        raise ValueError(f"Invalid timeout: {value:g} (must be between 0 and {ANALYSIS_DEADLINE_MAX:g} seconds)")
+    return value
+
+
+def start_deadline(seconds: float = None):
+    """Deadline starting now, using ANALYSIS_DEADLINE when seconds is None; None when disabled"""
+    seconds = ANALYSIS_DEADLINE if seconds is None else seconds
+    return Deadline(seconds) if seconds > 0 else None
+
+
+def out_of_time(context) -> bool:
+    """Whether an analyzer sharing this context should stop and return partial results"""
+    deadline = getattr(context, "deadline", None)
+    return deadline is not None and deadline.expired()
@@ -0,0 +1,183 @@
+# document_context.py
+import threading
+from contextlib import contextmanager
+
+from analyzers.limits import ResourceBudget
+from analyzers.log import get_logger
+from analyzers.registry import load_library
+
+log = get_logger("context")
+
+
+class DocumentContext:
+    """Per-request cache of parsed document handles shared by all analyzers.
+
+    Each backend (pikepdf, PyMuPDF, PyPDF2, OOXML package) is opened at most
+    once, and only when an analyzer asks for it. Failures are remembered too, so
+    a file that pikepdf cannot parse is not re-parsed by every analyzer.
+    Once the request's deadline is cancelled, no more handles are handed out.
+    The decoded-data budget in limits is shared by every analyzer of the request.
+    """
+
+    def __init__(self, file_path: str, file_info: dict, deadline=None, limits: ResourceBudget = None):
+        self.file_path = file_path
+        self.file_info = file_info
+        self.deadline = deadline
+        self.limits = limits or ResourceBudget()
+        self._handles = {}
+        self._errors = {}
+        self._memo = {}
+        self._open_lock = threading.Lock()
+        self._backend_locks = {}
+        self._openers = {
+            "pikepdf": self._open_pikepdf,
+            "fitz": self._open_fitz,
+            "pypdf2": self._open_pypdf2,
+            "ooxml": self._open_ooxml,
+        }
+
+    @contextmanager
+    def open(self, backend: str):
+        """Yield the parsed handle for a backend, parsing the file on first use.
+
+        Handles are not thread-safe, so the backend stays locked while the caller
+        holds it; analyzers using different backends still run side by side.
+        """
+        if self.deadline is not None:
+            self.deadline.check()
+        with self._lock_for(backend):
+            yield self._get(backend)
+
+    def memo(self, key: str, factory):
+        """Compute a derived value once per request (page lists, docinfo, XMP...)"""
+        with self._open_lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = factory()
+        with self._open_lock:
+            return self._memo.setdefault(key, value)
+
+    # Shared derived data
+
+    def pdf_docinfo(self):
+        """Info dictionary as plain strings (pikepdf)"""
+        def build():
+            with self.open("pikepdf") as pdf:
+                if not pdf.docinfo:
+                    return {}
+                return {str(key): str(value) for key, value in pdf.docinfo.items()}
+        return self.memo("pdf_docinfo", build)
+
+    def pdf_xmp(self):
+        """XMP metadata keyed by prefixed name ("xmpMM:LastModifiedBy"); empty when unreadable"""
+        def build():
+            from pikepdf.models.metadata import DEFAULT_NAMESPACES
+            prefixes = dict(DEFAULT_NAMESPACES)
+            with self.open("pikepdf") as pdf:
+                try:
+                    meta = pdf.open_metadata()
+                    xmp = {}
+                    for key, value in meta.items():
+                        if not value:
+                            continue
+                        uri, _, local = str(key).lstrip("{").partition("}")
+                        name = f"{prefixes[uri]}:{local}" if local and uri in prefixes else str(key)
+                        xmp[name] = str(value)
+                    return xmp
+                except Exception:
+                    return {}
+        return self.memo("pdf_xmp", build)
+
+    def pdf_pages(self):
+        """pikepdf page objects as a list, walked from the page tree once"""
+        def build():
+            with self.open("pikepdf") as pdf:
+                return list(pdf.pages)
+        return self.memo("pdf_pages", build)
+
+    def pdf_xref(self):
+        """(object number, generation) of every indirect object in the file"""
+        def build():
+            with self.open("pikepdf") as pdf:
+                return [obj.objgen for obj in pdf.objects if obj.is_indirect]
+        return self.memo("pdf_xref", build)
+
+    def close(self):
+        """Release every handle opened during the request"""
+        with self._open_lock:
+            handles = list(self._handles.items())
+            self._handles.clear()
+            self._memo.clear()
+        for backend, handle in handles:
+            try:
+                with self._lock_for(backend):
+                    closer = getattr(handle, "close", None)
+                    if closer:
+                        closer()
+            except Exception as e:
+                log.warning("context.close_failed", f"Failed to close {backend} handle: {e}")
+        self._close_raw_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Internals
+
+    def _lock_for(self, backend: str):
+        with self._open_lock:
+            if backend not in self._openers:
+                raise ValueError(f"Unknown document backend: {backend}")
+            return self._backend_locks.setdefault(backend, threading.RLock())
+
+    def _get(self, backend: str):
+        if backend in self._handles:
+            return self._handles[backend]
+        if backend in self._errors:
+            raise self._errors[backend]
+        try:
+            handle = self._openers[backend]()
+        except Exception as e:
+            self._errors[backend] = e
+            raise
+        self._handles[backend] = handle
+        return handle
+
+    def _open_pikepdf(self):
+        pikepdf = load_library("pikepdf")
+        return pikepdf.Pdf.open(self.file_path)
+
+    def _open_fitz(self):
+        fitz = load_library("fitz")
+        return fitz.open(self.file_path)
+
+    def _open_pypdf2(self):
+        PyPDF2 = load_library("PyPDF2")
+        # PyPDF2 reads lazily from the stream, so keep it open with the reader
+        self._raw_file = open(self.file_path, "rb")
+        return PyPDF2.PdfReader(self._raw_file)
+
+    def _open_ooxml(self):
+        from analyzers.ooxml import OOXMLPackage
+        return OOXMLPackage(self.file_path)
+
+    def _close_raw_file(self):
+        raw_file = getattr(self, "_raw_file", None)
+        if raw_file:
+            raw_file.close()
+            self._raw_file = None
+
+
+@contextmanager
+def use_context(context, file_path: str, file_info: dict = None):
+    """Yield the shared request context, or a private one closed on exit"""
+    if context is not None:
+        yield context
+        return
+    private = DocumentContext(file_path, file_info or {})
+    try:
+        yield private
+    finally:
+        private.close()
@@ -1,46 +1,56 @@
 # docx_analyzer.py
-from docx import Document
-import zipfile
-import xml.etree.ElementTree as ET
 from datetime import datetime
 import os
 import mimetypes
+from analyzers.document_context import use_context
+from analyzers.executor import get_executor
+from analyzers.log import get_logger
+
+log = get_logger("docx")
 
 class DOCXAnalyzer:
-    async def extract_metadata(self, file_path: str):
-        """Extract real metadata from DOCX file"""
-        try:
-            return await self._extract_with_docx(file_path)
-        except Exception as e:
-            print(f"DOCX extraction failed: {e}")
-            return await self._get_basic_info(file_path)
+    name = "docx"
+
+    async def extract_metadata(self, file_path: str, context=None, quick: bool = False):
+        """Extract DOCX metadata without blocking the event loop"""
+        return await get_executor().run(self, "extract_metadata_sync", file_path, quick, context=context)
+
+    def extract_metadata_sync(self, file_path: str, quick: bool = False, context=None):
+        """Extract real metadata from DOCX file; quick never reads the document body"""
+        with use_context(context, file_path) as context:
+            try:
+                return self._extract_with_ooxml(file_path, context, quick)
+            except Exception as e:
+                log.warning("docx.failed", f"DOCX extraction failed: {e}")
+                return self._get_basic_info(file_path)
     
-    async def _extract_with_docx(self, file_path: str):
-        """Extract metadata using python-docx"""
-        doc = Document(file_path)
-        core_props = doc.core_properties
+    def _extract_with_ooxml(self, file_path: str, context, quick: bool = False):
+        """Extract metadata from the package's docProps parts"""
+        with context.open("ooxml") as package:
+            core = package.core_properties()
+            app = package.app_properties()
+            pages = app["Pages"] if isinstance(app["Pages"], int) else None
+            if pages is None and not quick:
+                # No statistics saved by the editor: fall back to a rough estimate from the body
+                pages = max(1, sum(1 for _ in package.iter_paragraphs()) // 25)
 
         mime, _ = mimetypes.guess_type(file_path)
-        metadata = {
+        return {
             "type": mime or "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            "author": core_props.author or "Not specified",
-            "title": core_props.title or "Not specified",
-            "subject": core_props.subject or "Not specified",
-            "creator": core_props.author or "Not specified",
-            "keywords": core_props.keywords or "Not specified",
-            "lastModifiedBy": getattr(core_props, "last_modified_by", None) or "Not specified",
-            "createdDate": core_props.created.isoformat() if core_props.created else None,
-            "modifiedDate": core_props.modified.isoformat() if core_props.modified else None,
+            "author": core["creator"] or "Not specified",
+            "title": core["title"] or "Not specified",
+            "subject": core["subject"] or "Not specified",
+            "creator": core["creator"] or "Not specified",
+            "keywords": core["keywords"] or "Not specified",
+            "lastModifiedBy": core["lastModifiedBy"] or "Not specified",
+            "createdDate": core["created"].isoformat() if core["created"] else None,
+            "modifiedDate": core["modified"].isoformat() if core["modified"] else None,
+            "pageCount": pages or "Unknown",
+            "wordCount": app["Words"] if isinstance(app["Words"], int) else None,
+            "application": app["Application"],
         }
 
-        # Rough page estimate
-        paragraph_count = len(doc.paragraphs)
-        estimated_pages = max(1, paragraph_count // 25)
-        metadata["pageCount"] = estimated_pages
-
-        return metadata
-    
-    async def _get_basic_info(self, file_path: str):
+    def _get_basic_info(self, file_path: str):
         """Get basic file information when metadata extraction fails"""
         stat = os.stat(file_path)
         mime, _ = mimetypes.guess_type(file_path)
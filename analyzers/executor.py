@@ -0,0 +1,136 @@
+# executor.py
+import asyncio
+import importlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from analyzers.limits import limit_worker_memory
+from analyzers.log import get_logger
+from analyzers.metrics import ANALYZER_SECONDS
+
+log = get_logger("executor")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class AnalysisExecutor:
+    """Runs blocking analyzer work off the event loop.
+
+    Analyzers backed by C extensions that release the GIL (PyMuPDF, pikepdf)
+    run on a thread pool and share the request's DocumentContext. Analyzers
+    listed in ANALYZER_PROCESS_POOL run in a process pool instead; they parse
+    the file again in the worker, so the pool is off unless sized explicitly.
+
+    Environment:
+        ANALYZER_THREAD_WORKERS     thread pool size (default: min(8, cpus + 4))
+        ANALYZER_PROCESS_WORKERS    process pool size (default: 0, disabled)
+        ANALYZER_PROCESS_POOL       analyzer names sent to processes (default: docx,signature)
+        ANALYZER_PROCESS_MAX_TASKS  tasks before a worker is recycled (default: 100, 0 = never)
+        ANALYZER_MAX_MEMORY_MB      address-space cap per pool worker (default: 0, uncapped)
+    """
+
+    def __init__(self):
+        cpus = os.cpu_count() or 1
+        self.thread_workers = max(1, _env_int("ANALYZER_THREAD_WORKERS", min(8, cpus + 4)))
+        self.process_workers = max(0, _env_int("ANALYZER_PROCESS_WORKERS", 0))
+        self.process_max_tasks = max(0, _env_int("ANALYZER_PROCESS_MAX_TASKS", 100))
+        self.process_analyzers = {
+            name.strip() for name in os.getenv("ANALYZER_PROCESS_POOL", "docx,signature").split(",") if name.strip()
+        }
+        self._lock = threading.Lock()
+        self._thread_pool = None
+        self._process_pool = None
+
+    def thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="analyzer"
+                )
+            return self._thread_pool
+
+    def process_pool(self):
+        """Process pool, or None when ANALYZER_PROCESS_WORKERS is 0"""
+        if self.process_workers == 0:
+            return None
+        with self._lock:
+            if self._process_pool is None:
+                kwargs = {"max_workers": self.process_workers, "initializer": limit_worker_memory}
+                if self.process_max_tasks:
+                    # Recycled workers need the spawn start method
+                    kwargs["max_tasks_per_child"] = self.process_max_tasks
+                self._process_pool = ProcessPoolExecutor(**kwargs)
+            return self._process_pool
+
+    async def run(self, analyzer, method: str, file_path: str, *args, context=None):
+        """Run analyzer.method(file_path, *args, context) in the right pool, timing the call"""
+        name = getattr(analyzer, "name", type(analyzer).__name__)
+        with ANALYZER_SECONDS.time(analyzer=name, method=method):
+            return await self._run(analyzer, name, method, file_path, *args, context=context)
+
+    async def _run(self, analyzer, name: str, method: str, file_path: str, *args, context=None):
+        loop = asyncio.get_running_loop()
+
+        process_pool = self.process_pool() if name in self.process_analyzers else None
+        if process_pool is not None:
+            cls = type(analyzer)
+            try:
+                return await loop.run_in_executor(
+                    process_pool, _run_in_worker, cls.__module__, cls.__name__, method, file_path, args
+                )
+            except BrokenProcessPool:
+                # A worker died (OOM, segfault); start a fresh pool and retry on threads
+                log.warning("executor.pool_broken", f"⚠️ Process pool broken while running {name}, falling back to threads")
+                self._reset_process_pool()
+
+        bound = getattr(analyzer, method)
+        return await loop.run_in_executor(self.thread_pool(), lambda: bound(file_path, *args, context=context))
+
+    def shutdown(self):
+        with self._lock:
+            thread_pool, self._thread_pool = self._thread_pool, None
+            process_pool, self._process_pool = self._process_pool, None
+        if thread_pool:
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+        if process_pool:
+            process_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _reset_process_pool(self):
+        with self._lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_in_worker(module_name: str, class_name: str, method: str, file_path: str, args: tuple):
+    """Process pool entry point; the analyzer opens its own document context"""
+    cls = getattr(importlib.import_module(module_name), class_name)
+    return getattr(cls(), method)(file_path, *args)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> AnalysisExecutor:
+    """Process-wide executor, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = AnalysisExecutor()
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor:
+        executor.shutdown()
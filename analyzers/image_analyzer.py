@@ -1,14 +1,34 @@
-import PyPDF2
-import pikepdf
+import io
 import os
+from analyzers.deadline import out_of_time
+from analyzers.document_context import use_context
+from analyzers.executor import get_executor
+from analyzers.limits import MAX_IMAGE_PIXELS, image_xobject_size, mark_limit_exceeded
+from analyzers.log import get_logger
+from analyzers.metrics import BACKEND_FALLBACKS, PAGES
+
+# Embedded images examined per PDF; each one is bounded by IMAGE_PIXEL_BUDGET
+MAX_PDF_IMAGES = int(os.getenv("IMAGE_FORENSICS_MAX_IMAGES", "16"))
+MIN_IMAGE_PIXELS = 128 * 128  # logos and icons are too small for the statistics to mean anything
+MAX_SUSPICIOUS_REGIONS = 50
+MAX_INVENTORY_ENTRIES = 200  # imageInventory is truncated beyond this; imagesFound still counts all
+
+log = get_logger("image")
 
 class ImageAnalyzer:
-    async def analyze(self, file_path: str, file_info: dict):
+    name = "image"
+
+    async def analyze(self, file_path: str, file_info: dict, context=None):
+        """Run image analysis without blocking the event loop"""
+        return await get_executor().run(self, "analyze_sync", file_path, file_info, context=context)
+
+    def analyze_sync(self, file_path: str, file_info: dict, context=None):
         """Perform REAL image analysis"""
         if file_info["type"] == "application/pdf":
-            return await self._analyze_pdf_images(file_path)
+            with use_context(context, file_path, file_info) as context:
+                return self._analyze_pdf_images(file_path, context)
         elif file_info["type"].startswith('image/'):
-            return await self._analyze_single_image(file_path)
+            return self._analyze_single_image(file_path)
         else:
             return {
                 "imagesFound": 0,
@@ -17,33 +37,108 @@ class ImageAnalyzer:
                 "suspiciousRegions": []
             }
     
-    async def _analyze_pdf_images(self, file_path: str):
+    def image_hashes(self, file_path: str, file_info: dict, context=None) -> list:
+        """Perceptual hashes only, without the forensics checks (for image index backfills)"""
+        from analyzers.image_forensics import load_image
+        from analyzers.image_hash import perceptual_hashes
+
+        entries = []
+        if file_info["type"] == "application/pdf":
+            with use_context(context, file_path, file_info) as context:
+                candidates = self._find_pdf_images(context)[1]
+                for page_num, name, objgen in candidates:
+                    try:
+                        with context.open("pikepdf") as pdf:
+                            source = self._embedded_image(pdf.get_object(objgen))
+                        entries.append((page_num, name, perceptual_hashes(load_image(source)[0])))
+                    except Exception as e:
+                        log.warning("image.hash_skipped", f"Image hash skipped for {name} on page {page_num}: {e}")
+        elif file_info["type"].startswith('image/'):
+            entries.append((None, None, perceptual_hashes(load_image(file_path)[0])))
+        return [
+            {"page": page_num, "image": name, "phash": f"{hashes[0]:016x}", "dhash": f"{hashes[1]:016x}"}
+            for page_num, name, hashes in entries if hashes
+        ]
+
+    def _analyze_pdf_images(self, file_path: str, context):
         """Extract REAL images from PDF"""
-        images_found = 0
+        images_found, candidates, pages, oversized, inventory = self._find_pdf_images(context)
+        tampered_images, examined, regions, hashes, reached = self._examine_pdf_images(context, candidates)
+        regions.sort(key=lambda region: region["score"], reverse=True)
+        
+        result = {
+            "imagesFound": images_found,
+            "imagesExamined": examined,
+            "tamperedImages": tampered_images,
+            "confidence": self._confidence(regions, 95 if images_found == 0 else 85),
+            "suspiciousRegions": regions[:MAX_SUSPICIOUS_REGIONS],
+            "imageHashes": hashes
+        }
+        if inventory is not None:
+            from analyzers.pdf_images import describe
+            result["imageReferences"] = inventory.references
+            result["imageInventory"] = [describe(entry) for entry in list(inventory.images.values())[:MAX_INVENTORY_ENTRIES]]
+        if oversized:
+            # Declared larger than LIMIT_MAX_IMAGE_PIXELS; never decoded
+            result["imagesSkipped"] = oversized
+        pages_scanned, page_count = pages
+        if context.limits.exceeded:
+            mark_limit_exceeded(result, context.limits.exceeded)
+        elif pages_scanned < page_count or reached < len(candidates):
+            # Out of time: counts cover the pages and images reached so far
+            result["status"] = "partial"
+            result["coverage"] = {
+                "pagesScanned": pages_scanned,
+                "totalPages": page_count,
+                "imagesExamined": examined,
+                "imagesSelected": len(candidates),
+            }
+        return result
+
+    def _find_pdf_images(self, context):
+        """Inventory the PDF's images; returns (unique images found, (page, name, object id) of those
+        worth examining, (pages scanned, page count), images too large to decode, the ImageInventory
+        or None when PyPDF2 could only count them)"""
+        from analyzers.pdf_images import ImageInventory
+
+        inventory = ImageInventory()
+        candidates = []  # (page number, name, object id) of images worth examining
+        pages_scanned = page_count = 0
+        oversized = 0
         
         try:
-            # Method 1: Using pikepdf
-            with pikepdf.Pdf.open(file_path) as pdf:
-                print(f"📄 Analyzing PDF with {len(pdf.pages)} pages for images...")
+            # Method 1: Using pikepdf, through forms and annotation appearances
+            with context.open("pikepdf"):
+                pages = context.pdf_pages()
+                page_count = len(pages)
+                log.debug("image.pages", f"📄 Analyzing PDF with {len(pages)} pages for images...")
                 
-                for page_num, page in enumerate(pdf.pages, 1):
+                for page_num, page in enumerate(pages, 1):
+                    if out_of_time(context):
+                        break
+                    pages_scanned = page_num
                     try:
-                        if '/Resources' in page and '/XObject' in page['/Resources']:
-                            xobjects = page['/Resources']['/XObject']
-                            for name, xobj in xobjects.items():
-                                if xobj.get('/Subtype') == '/Image':
-                                    images_found += 1
-                                    print(f"Found image: {name} on page {page_num}")
+                        inventory.add_page(page_num, page)
                     except Exception as e:
-                        continue
+                        log.debug("image.page_skipped", f"Image inventory skipped page {page_num}: {e}", sample=True)
+
+                # Candidates are picked from unique images, so a shared one is decoded once
+                for entry in inventory.images.values():
+                    if entry["width"] * entry["height"] > MAX_IMAGE_PIXELS:
+                        oversized += 1
+                        log.warning("image.oversized", f"Image {entry['name']} on page {entry['pages'][0]} is {entry['width']}x{entry['height']}, not decoding it")
+                    elif self._worth_examining(entry, candidates):
+                        candidates.append((entry["pages"][0], entry["name"], entry["objgen"]))
                         
         except Exception as e:
-            print(f"pikepdf analysis failed: {e}")
+            log.warning("image.fallback", f"pikepdf analysis failed, falling back to PyPDF2: {e}")
+            BACKEND_FALLBACKS.inc(analyzer="image", source="pikepdf", fallback="pypdf2")
+            inventory = None
             
-            # Method 2: Fallback with PyPDF2
+            # Method 2: Fallback with PyPDF2, counting page-level images once per object
+            images = set()
             try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
+                with context.open("pypdf2") as pdf_reader:
                     for page_num, page in enumerate(pdf_reader.pages, 1):
                         try:
                             if '/Resources' in page and '/XObject' in page['/Resources']:
@@ -51,27 +146,106 @@ class ImageAnalyzer:
                                 for obj_name in xobjects:
                                     obj = xobjects[obj_name]
                                     if obj.get('/Subtype') == '/Image':
-                                        images_found += 1
-                                        print(f"Found image: {obj_name} on page {page_num}")
+                                        ref = xobjects.raw_get(obj_name)
+                                        images.add(getattr(ref, "idnum", None) or (page_num, obj_name))
+                                        log.debug("image.found", f"Found image: {obj_name} on page {page_num}", sample=True)
                         except:
                             continue
             except Exception as e:
-                print(f"PyPDF2 fallback failed: {e}")
+                log.warning("image.failed", f"PyPDF2 fallback failed: {e}")
         
-        print(f"🖼️ Total images found: {images_found}")
-        
-        return {
-            "imagesFound": images_found,
-            "tamperedImages": 0,
-            "confidence": 95 if images_found == 0 else 85,
-            "suspiciousRegions": []
-        }
+        images_found = len(inventory.images) if inventory is not None else len(images)
+        PAGES.inc(pages_scanned, analyzer="image")
+        log.debug("image.found_total", f"🖼️ Total images found: {images_found}")
+        return images_found, candidates, (pages_scanned, page_count), oversized, inventory
+
+    def _worth_examining(self, entry: dict, candidates: list) -> bool:
+        """Skip tiny images and 1-bit masks (inventory entries are already unique)"""
+        if len(candidates) >= MAX_PDF_IMAGES:
+            return False
+        if entry["imageMask"] or entry["bitsPerComponent"] == 1:
+            return False
+        return entry["width"] * entry["height"] >= MIN_IMAGE_PIXELS
+
+    def _examine_pdf_images(self, context, candidates: list):
+        """Run the forensics engine on embedded images; returns (tampered, examined, regions, hashes,
+        candidates reached before the deadline or the decoded-data limit)"""
+        from analyzers.image_forensics import analyze_image
+
+        tampered_images = 0
+        examined = 0
+        regions = []
+        hashes = []  # perceptual hashes, for the cross-document image index
+        reached = 0
+        for page_num, name, objgen in candidates:
+            if out_of_time(context):
+                break
+            reached += 1
+            try:
+                # Only decoding needs the shared handle; the analysis runs without holding it
+                with context.open("pikepdf") as pdf:
+                    xobj = pdf.get_object(objgen)
+                    if not context.limits.charge(image_xobject_size(xobj)[2], f"image {name}"):
+                        reached -= 1
+                        break
+                    source = self._embedded_image(xobj)
+                report = analyze_image(source)
+            except Exception as e:
+                log.warning("image.skipped", f"Image forensics skipped for {name} on page {page_num}: {e}")
+                continue
+            examined += 1
+            if report["perceptualHash"]:
+                hashes.append({"page": page_num, "image": name, **report["perceptualHash"]})
+            if report["tampered"]:
+                tampered_images += 1
+                log.info("image.suspicious", f"⚠️ Suspicious image: {name} on page {page_num}", score=report["score"])
+                regions.extend({"page": page_num, "image": name, **region} for region in report["regions"])
+        return tampered_images, examined, regions, hashes, reached
+
+    def _embedded_image(self, xobj):
+        """PIL image for an image XObject; plain JPEG streams keep their quantization tables"""
+        import pikepdf
+        from PIL import Image
+
+        filters = xobj.get('/Filter')
+        if isinstance(filters, pikepdf.Array) and len(filters) == 1:
+            filters = filters[0]
+        if filters == '/DCTDecode':
+            return Image.open(io.BytesIO(xobj.read_raw_bytes()))
+        return pikepdf.PdfImage(xobj).as_pil_image()
     
-    async def _analyze_single_image(self, file_path: str):
+    def _analyze_single_image(self, file_path: str):
         """Analyze single image file"""
+        from analyzers.image_forensics import analyze_image
+
+        try:
+            report = analyze_image(file_path)
+        except Exception as e:
+            log.warning("image.failed", f"Image forensics failed: {e}")
+            return {
+                "imagesFound": 1,
+                "tamperedImages": 0,
+                "confidence": 50,
+                "suspiciousRegions": [],
+                "error": f"Image could not be analyzed: {e}"
+            }
+
         return {
             "imagesFound": 1,
-            "tamperedImages": 0,
-            "confidence": 90,
-            "suspiciousRegions": []
+            "tamperedImages": 1 if report["tampered"] else 0,
+            "confidence": self._confidence(report["regions"], 90),
+            "suspiciousRegions": report["regions"],
+            "imageHashes": [report["perceptualHash"]] if report["perceptualHash"] else [],
+            "forensics": {
+                "score": report["score"],
+                "analyzedSize": report["analyzedSize"],
+                "scale": report["scale"],
+                "checks": report["checks"],
+            }
         }
+
+    def _confidence(self, regions: list, clean_confidence: int) -> int:
+        """Confidence in the verdict: fixed when clean, rising with the strongest finding"""
+        if not regions:
+            return clean_confidence
+        return int(60 + 35 * max(region["score"] for region in regions))
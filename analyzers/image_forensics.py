@@ -0,0 +1,288 @@
+# image_forensics.py
+import io
+import math
+import os
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+from analyzers.copy_move import detect_copy_move
+from analyzers.image_hash import perceptual_hashes
+
+# Larger images are downscaled before analysis, so worst-case latency is bounded
+PIXEL_BUDGET = int(os.getenv("IMAGE_PIXEL_BUDGET", str(12_000_000)))
+
+CELL = 32          # statistics are computed per CELL x CELL pixel cell
+BAND_ROWS = 256    # rows processed at a time; a multiple of CELL and of the 8px JPEG grid
+ELA_QUALITY = 90
+OUTLIER_Z = 3.0    # robust z-score, averaged over a 3x3 neighbourhood, for a cell to count as inconsistent
+MIN_REGION_CELLS = 2
+MAX_FLAGGED_SHARE = 0.2  # beyond this the "anomaly" is a property of the whole image
+MAX_REGIONS = 20
+FLAT_CELL_STD = 2.0  # flat cells carry no error-level signal
+ELA_FLOOR = 0.01    # minimum spreads, so near-uniform images do not turn tiny differences into outliers
+NOISE_FLOOR = 0.2    # log units: noise must differ by ~1.8x at OUTLIER_Z
+MIN_NOISE_LEVEL = 0.3  # median log noise below this means a rendered, noise-free image
+
+DQ_COEFFICIENTS = ((0, 1), (1, 0), (1, 1), (0, 2), (2, 0), (1, 2), (2, 1))
+DQ_RANGE = 24
+DQ_MIN_SAMPLES = 2000
+DQ_THRESHOLD = 0.25
+
+
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(8)
+    matrix = np.cos((2 * n[None, :] + 1) * n[:, None] * np.pi / 16) * np.sqrt(2 / 8)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+DCT8 = _dct_matrix()
+
+
+def load_image(source, pixel_budget: int = PIXEL_BUDGET):
+    """Open a path, file object or PIL image as 8-bit luminance within the pixel budget.
+
+    Returns (image, scale, quantization) where scale maps analyzed pixels back to
+    original ones and quantization is the JPEG luminance table (None when unknown
+    or when the image had to be resampled).
+    """
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+    width, height = image.size
+    quantization = None
+    if image.format == "JPEG" and getattr(image, "quantization", None):
+        quantization = image.quantization.get(0)
+
+    if width * height > pixel_budget:
+        quantization = None
+        factor = math.sqrt(width * height / pixel_budget)
+        if image.format == "JPEG":
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of materializing every pixel
+            image.draft("L", (max(1, int(width / factor)), max(1, int(height / factor))))
+    if image.mode != "L":
+        image = image.convert("L")
+    if image.width * image.height > pixel_budget:
+        image = image.reduce(math.ceil(math.sqrt(image.width * image.height / pixel_budget)))
+    return image, width / image.width, quantization
+
+
+def analyze_image(source, pixel_budget: int = PIXEL_BUDGET) -> dict:
+    """Run ELA, noise consistency, JPEG double-quantization and copy-move checks on one image"""
+    image, scale, quantization = load_image(source, pixel_budget)
+    hashes = perceptual_hashes(image)
+    pixels = np.asarray(image, dtype=np.uint8)
+    rows, cols = pixels.shape[0] // CELL, pixels.shape[1] // CELL
+    if rows * cols < 4:
+        return _result(image, scale, hashes, [], {"skipped": "Image too small to analyze"})
+
+    ela, noise, textured, unclipped = _cell_statistics(pixels, rows, cols, quantization)
+    checks = {}
+    regions = []
+
+    ela_z = _robust_z(ela, textured, floor=ELA_FLOOR)
+    if ela_z is not None:
+        ela_z = _neighbourhood_mean(ela_z)
+        found, flagged = _regions(ela_z > OUTLIER_Z, ela_z, scale, "errorLevel")
+        regions += found
+        checks["errorLevel"] = {"outlierCells": flagged, "cells": int(textured.sum())}
+
+    # Flat cells stay in: a patch with no noise at all inside a noisy scan is the classic edit.
+    # Rendered (noise-free) images have nothing to compare, so they are skipped.
+    baseline = float(np.median(noise[unclipped])) if unclipped.any() else 0.0
+    noise_z = _robust_z(noise, unclipped, floor=NOISE_FLOOR) if baseline >= MIN_NOISE_LEVEL else None
+    if noise_z is not None:
+        noise_z = np.abs(_neighbourhood_mean(noise_z))
+        found, flagged = _regions(noise_z > OUTLIER_Z, noise_z, scale, "noise")
+        regions += found
+        checks["noise"] = {"outlierCells": flagged, "cells": int(unclipped.sum())}
+    else:
+        checks["noise"] = {"skipped": "No sensor noise to compare"}
+
+    if quantization is not None:
+        score = _double_quantization_score(pixels, quantization)
+        checks["doubleQuantization"] = {
+            "score": None if score is None else round(score, 3),
+            "detected": score is not None and score > DQ_THRESHOLD,
+        }
+        if checks["doubleQuantization"]["detected"]:
+            # Recompression is a property of the whole image, so the region is the whole image
+            regions.append({
+                "x": 0,
+                "y": 0,
+                "width": int(image.width * scale),
+                "height": int(image.height * scale),
+                "score": round(min(1.0, score * 2), 2),
+                "method": "doubleQuantization",
+            })
+
+    found, checks["copyMove"] = detect_copy_move(image, scale)
+    regions += found
+
+    regions.sort(key=lambda region: region["score"], reverse=True)
+    return _result(image, scale, hashes, regions[:MAX_REGIONS], checks)
+
+
+def _result(image, scale: float, hashes, regions: list, checks: dict) -> dict:
+    return {
+        "perceptualHash": {"phash": f"{hashes[0]:016x}", "dhash": f"{hashes[1]:016x}"} if hashes else None,
+        "tampered": bool(regions),
+        "score": max([region["score"] for region in regions] + [0.0]),
+        "analyzedSize": [image.width, image.height],
+        "scale": round(scale, 3),
+        "regions": regions,
+        "checks": checks,
+    }
+
+
+def _cell_statistics(pixels: np.ndarray, rows: int, cols: int, quantization=None):
+    """Per-cell error level, noise level and validity masks, computed one band of rows at a time.
+
+    JPEGs are recompressed with their own luminance table: regions that went
+    through the same compression settings before barely change, pasted ones do.
+    """
+    save_options = {"qtables": [list(quantization)]} if quantization is not None else {"quality": ELA_QUALITY}
+    ela = np.zeros((rows, cols), np.float32)
+    noise = np.zeros((rows, cols), np.float32)
+    textured = np.zeros((rows, cols), bool)
+    unclipped = np.zeros((rows, cols), bool)
+    height, width = rows * CELL, cols * CELL
+
+    for top in range(0, height, BAND_ROWS):
+        bottom = min(top + BAND_ROWS, height)
+        cell_rows = slice(top // CELL, bottom // CELL)
+        band = pixels[top:bottom, :width]
+
+        # Error level: residual after one more JPEG pass. Bands start on the 8px grid,
+        # so recompressing a band gives the same blocks as recompressing the image.
+        buffer = io.BytesIO()
+        Image.fromarray(np.ascontiguousarray(band)).save(buffer, "JPEG", **save_options)
+        buffer.seek(0)
+        recompressed = np.asarray(Image.open(buffer), dtype=np.int16)
+        residual = np.abs(band.astype(np.int16) - recompressed).astype(np.float32)
+
+        # Noise: Laplacian residual with real neighbours across band edges where they exist
+        above, below = max(top - 1, 0), min(bottom + 1, pixels.shape[0])
+        padded = pixels[above:below, :width].astype(np.float32)
+        padded = np.pad(padded, ((1 - (top - above), 1 - (below - bottom)), (1, 1)), mode="edge")
+        laplacian = np.abs(
+            4 * padded[1:-1, 1:-1] - padded[:-2, 1:-1] - padded[2:, 1:-1] - padded[1:-1, :-2] - padded[1:-1, 2:]
+        )
+
+        values = band.astype(np.float32)
+        mean = _cells(values).mean(axis=2)
+        std = _cells(values).std(axis=2)
+        texture = _cells(laplacian).mean(axis=2)
+        # Error level grows with edge content; damping by texture leaves more of the compression history
+        ela[cell_rows] = _cells(residual).mean(axis=2) / np.sqrt(1.0 + texture)
+        # Mean of the lowest quarter of |Laplacian| ignores text strokes and edges as long as a
+        # quarter of the cell is background; 0.1588 = that mean for |N(0,1)|, 20 = filter gain
+        quarter = CELL * CELL // 4
+        lowest = np.partition(_cells(laplacian), quarter, axis=2)[..., :quarter]
+        noise[cell_rows] = np.log1p(lowest.mean(axis=2) / 0.1588 / math.sqrt(20))
+        unclipped[cell_rows] = (mean > 5) & (mean < 250)
+        textured[cell_rows] = unclipped[cell_rows] & (std >= FLAT_CELL_STD)
+
+    return ela, noise, textured, unclipped
+
+
+def _cells(band: np.ndarray) -> np.ndarray:
+    """View a band as (cell rows, cell cols, CELL*CELL pixels)"""
+    rows, cols = band.shape[0] // CELL, band.shape[1] // CELL
+    return band.reshape(rows, CELL, cols, CELL).transpose(0, 2, 1, 3).reshape(rows, cols, CELL * CELL)
+
+
+def _robust_z(values: np.ndarray, valid: np.ndarray, floor: float):
+    """Median/MAD z-scores so the tampered cells themselves do not skew the baseline"""
+    sample = values[valid]
+    if sample.size < 8:
+        return None
+    median = np.median(sample)
+    mad = max(float(np.median(np.abs(sample - median))) * 1.4826, floor)
+    z = (values - median) / mad
+    z[~valid] = 0
+    return z
+
+
+def _neighbourhood_mean(z: np.ndarray) -> np.ndarray:
+    """3x3 box average: a pasted area is a patch of cells, a lone spike is usually an edge"""
+    padded = np.pad(z, 1, mode="edge")
+    rows, cols = z.shape
+    return sum(padded[r:r + rows, c:c + cols] for r in range(3) for c in range(3)) / 9
+
+
+def _regions(flags: np.ndarray, strength: np.ndarray, scale: float, method: str):
+    """Group flagged cells into 4-connected regions with boxes in original-image pixels"""
+    # Border cells take part in the baseline but are never flagged: frames, scan edges
+    # and partial JPEG blocks dominate there
+    flags = flags.copy()
+    flags[[0, -1], :] = False
+    flags[:, [0, -1]] = False
+    flagged = int(flags.sum())
+    if not flagged or flagged > MAX_FLAGGED_SHARE * flags.size:
+        return [], flagged
+
+    regions = []
+    seen = np.zeros_like(flags)
+    rows, cols = flags.shape
+    for start in zip(*np.nonzero(flags)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        queue = deque([start])
+        members = []
+        while queue:
+            r, c = queue.popleft()
+            members.append((r, c))
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < cols and flags[nr, nc] and not seen[nr, nc]:
+                    seen[nr, nc] = True
+                    queue.append((nr, nc))
+        if len(members) < MIN_REGION_CELLS:
+            continue
+        r_idx, c_idx = zip(*members)
+        peak = float(max(strength[m] for m in members))
+        regions.append({
+            "x": int(min(c_idx) * CELL * scale),
+            "y": int(min(r_idx) * CELL * scale),
+            "width": int((max(c_idx) - min(c_idx) + 1) * CELL * scale),
+            "height": int((max(r_idx) - min(r_idx) + 1) * CELL * scale),
+            "score": round(min(1.0, peak / (2 * OUTLIER_Z)), 2),
+            "method": method,
+        })
+    return regions, flagged
+
+
+def _double_quantization_score(pixels: np.ndarray, quantization) -> float:
+    """Periodic gaps in DCT coefficient histograms betray an earlier, coarser JPEG pass.
+
+    A singly compressed image gives histograms that fall off smoothly from zero;
+    recompression leaves every n-th bin under- or over-populated. The score is the
+    share of histogram mass that breaks monotonic decay, averaged over low
+    frequencies.
+    """
+    table = np.asarray(quantization, dtype=np.float32).reshape(8, 8)
+    height, width = (pixels.shape[0] // 8) * 8, (pixels.shape[1] // 8) * 8
+    histograms = np.zeros((len(DQ_COEFFICIENTS), DQ_RANGE + 1), np.int64)
+    us = np.array([u for u, _ in DQ_COEFFICIENTS])
+    vs = np.array([v for _, v in DQ_COEFFICIENTS])
+
+    for top in range(0, height, BAND_ROWS):
+        band = pixels[top:min(top + BAND_ROWS, height), :width].astype(np.float32) - 128
+        blocks = band.reshape(band.shape[0] // 8, 8, width // 8, 8).transpose(0, 2, 1, 3)
+        coefficients = DCT8 @ blocks @ DCT8.T
+        levels = np.abs(np.rint(coefficients[..., us, vs] / table[us, vs])).astype(np.int64)
+        levels = np.minimum(levels.reshape(-1, len(DQ_COEFFICIENTS)), DQ_RANGE + 1)
+        for i in range(len(DQ_COEFFICIENTS)):
+            histograms[i] += np.bincount(levels[:, i], minlength=DQ_RANGE + 2)[:DQ_RANGE + 1]
+
+    scores = []
+    for histogram in histograms:
+        tail = histogram[1:].astype(np.float64)  # level 0 dominates and carries no period
+        if tail.sum() < DQ_MIN_SAMPLES:
+            continue
+        rises = np.maximum(np.diff(tail), 0).sum()
+        scores.append(rises / tail.sum())
+    if not scores:
+        return None
+    return float(np.mean(scores))
@@ -0,0 +1,46 @@
+# image_hash.py
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+MIN_HASH_CONTRAST = 4.0  # grey-level std of the 32x32 thumbnail; blank images all hash alike
+
+
+def _dct_basis(size: int, count: int) -> np.ndarray:
+    n = np.arange(size)
+    basis = np.cos((2 * n[None, :] + 1) * np.arange(count)[:, None] * np.pi / (2 * size)) * np.sqrt(2 / size)
+    basis[0] /= np.sqrt(2)
+    return basis
+
+
+BASIS = _dct_basis(32, 8)
+
+
+def perceptual_hashes(image: Image.Image):
+    """64-bit pHash and dHash of a PIL image, or None when it has too little content to identify.
+
+    pHash compares the 8x8 lowest DCT frequencies of a 32x32 thumbnail with
+    their median; dHash compares horizontally adjacent pixels of a 9x8 one.
+    Both survive rescaling and recompression, and flip many bits on real edits.
+    """
+    if image.mode != "L":
+        image = image.convert("L")
+    thumbnail = np.asarray(image.resize((32, 32), Image.BOX), dtype=np.float64)
+    if thumbnail.std() < MIN_HASH_CONTRAST:
+        return None
+
+    coefficients = (BASIS @ thumbnail @ BASIS.T).reshape(-1)
+    # The DC term only tracks brightness, so it is left out of the median
+    phash = _pack(coefficients > np.median(coefficients[1:]))
+
+    small = np.asarray(image.resize((9, 8), Image.BOX), dtype=np.int16)
+    dhash = _pack((small[:, 1:] > small[:, :-1]).reshape(-1))
+    return phash, dhash
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8)).tobytes(), "big")
@@ -0,0 +1,198 @@
+# limits.py
+import os
+import threading
+
+from analyzers.log import get_logger
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Document-level caps, checked before any analyzer decodes content (0 = no cap)
+MAX_PAGES = _env_int("LIMIT_MAX_PAGES", 5000)
+MAX_OBJECTS = _env_int("LIMIT_MAX_OBJECTS", 1_000_000)  # PDF objects or zip members
+MAX_DEPTH = _env_int("LIMIT_MAX_DEPTH", 32)  # page tree, form field and XObject nesting
+MAX_XML_DEPTH = _env_int("LIMIT_MAX_XML_DEPTH", 512)
+MAX_COMPRESSION_RATIO = _env_int("LIMIT_MAX_COMPRESSION_RATIO", 200)  # per zip member over 1MB
+# Per-document budget for decoded data (image pixels, extracted text, unzipped parts)
+MAX_DECODED_BYTES = _env_int("LIMIT_MAX_DECODED_MB", 1024) * 1024 * 1024
+MAX_IMAGE_PIXELS = _env_int("LIMIT_MAX_IMAGE_PIXELS", 100_000_000)
+# Address-space cap for analysis worker processes (process pool, worker.py); 0 = off
+MAX_WORKER_MEMORY = _env_int("ANALYZER_MAX_MEMORY_MB", 0) * 1024 * 1024
+
+COMPONENTS = {"/DeviceGray": 1, "/CalGray": 1, "/DeviceCMYK": 4}
+
+log = get_logger("limits")
+
+
+class LimitExceeded(Exception):
+    """A document needs more than a resource limit allows"""
+
+    def __init__(self, limit: str, value: int, maximum: int, message: str):
+        super().__init__(message)
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+
+    def info(self) -> dict:
+        return {"limit": self.limit, "value": self.value, "max": self.maximum, "message": str(self)}
+
+
+class ResourceBudget:
+    """Decoded-data budget for one document, shared by every analyzer working on it.
+
+    Analyzers charge() what they are about to decode (image pixels, page text)
+    and stop, marking their section "limitExceeded", once a charge is refused.
+    """
+
+    def __init__(self, max_decoded: int = MAX_DECODED_BYTES):
+        self.max_decoded = max_decoded
+        self.decoded = 0
+        self.exceeded = None
+        self._lock = threading.Lock()
+
+    def charge(self, nbytes: int, what: str = "decoded data") -> bool:
+        """Reserve nbytes of decoding; False (and the budget marked exceeded) when it does not fit"""
+        with self._lock:
+            if self.exceeded is not None:
+                return False
+            if self.max_decoded and self.decoded + nbytes > self.max_decoded:
+                self.exceeded = LimitExceeded(
+                    "decodedBytes", self.decoded + nbytes, self.max_decoded,
+                    f"Decoding {what} would exceed the {self.max_decoded // (1024 * 1024)}MB decoded-data limit",
+                ).info()
+                log.warning("limits.exceeded", self.exceeded["message"])
+                return False
+            self.decoded += nbytes
+            return True
+
+
+def mark_limit_exceeded(result: dict, limit: dict) -> dict:
+    """Flag an analyzer section cut short by a resource limit (LimitExceeded.info())"""
+    result["status"] = "limitExceeded"
+    result["limit"] = limit
+    return result
+
+
+def check(limit: str, value: int, maximum: int, message: str):
+    if maximum and value > maximum:
+        raise LimitExceeded(limit, value, maximum, message)
+
+
+def preflight(context, backends):
+    """Cheap structural checks before analysis; raises LimitExceeded.
+
+    Only declared sizes are read (trailer /Size, the page tree, zip directory),
+    so a crafted document is rejected before any stream is decompressed.
+    Checks run through the backends the selected analyzers open anyway
+    ("pikepdf", "fitz", "ooxml", "pillow"), so preflight never parses a file
+    with a library the request would not otherwise load.
+    Documents the parsers cannot open are left to the analyzers to report.
+    """
+    file_type = context.file_info.get("type") or ""
+    try:
+        if file_type == "application/pdf":
+            if "pikepdf" in backends:
+                with context.open("pikepdf") as pdf:
+                    check_pdf(pdf)
+            elif "fitz" in backends:
+                with context.open("fitz") as doc:
+                    check_fitz(doc)
+        elif file_type.startswith("application/vnd.openxmlformats"):
+            if "ooxml" in backends:
+                with context.open("ooxml") as package:
+                    check_zip(package.archive)
+        elif file_type.startswith("image/"):
+            if "pillow" in backends:
+                check_image_file(context.file_path)
+    except LimitExceeded:
+        raise
+    except Exception as e:
+        log.debug("limits.preflight_skipped", f"Preflight skipped: {e}")
+
+
+def check_pdf(pdf):
+    """Object count, page count and page tree depth of a pikepdf document"""
+    objects = int(pdf.trailer.get("/Size", 0))
+    check("objects", objects, MAX_OBJECTS, f"PDF declares {objects} objects (limit {MAX_OBJECTS})")
+
+    pages = 0
+    seen = set()
+    stack = [(pdf.Root.get("/Pages"), 1)]
+    while stack:
+        node, depth = stack.pop()
+        if node is None or (node.is_indirect and node.objgen in seen):
+            continue
+        if node.is_indirect:
+            seen.add(node.objgen)
+        check("depth", depth, MAX_DEPTH, f"Page tree is nested more than {MAX_DEPTH} levels deep")
+        kids = node.get("/Kids")
+        if kids is None:
+            pages += 1
+            check("pages", pages, MAX_PAGES, f"PDF has more than {MAX_PAGES} pages")
+            continue
+        stack.extend((kid, depth + 1) for kid in kids)
+
+
+def check_fitz(doc):
+    """Object and page count of a PyMuPDF document (it has already loaded the page tree)"""
+    objects = doc.xref_length()
+    check("objects", objects, MAX_OBJECTS, f"PDF declares {objects} objects (limit {MAX_OBJECTS})")
+    check("pages", doc.page_count, MAX_PAGES, f"PDF has {doc.page_count} pages (limit {MAX_PAGES})")
+
+
+def check_zip(archive):
+    """Member count, total unzipped size and per-member compression ratio of a zip package"""
+    members = archive.infolist()
+    check("objects", len(members), MAX_OBJECTS, f"Package has {len(members)} parts (limit {MAX_OBJECTS})")
+    total = sum(member.file_size for member in members)
+    check(
+        "decodedBytes", total, MAX_DECODED_BYTES,
+        f"Package unzips to {total // (1024 * 1024)}MB (limit {MAX_DECODED_BYTES // (1024 * 1024)}MB)",
+    )
+    for member in members:
+        if member.file_size > 1024 * 1024:
+            ratio = member.file_size // max(1, member.compress_size)
+            check(
+                "compressionRatio", ratio, MAX_COMPRESSION_RATIO,
+                f"{member.filename} expands {ratio}x when unzipped (limit {MAX_COMPRESSION_RATIO}x)",
+            )
+
+
+def check_image_file(file_path: str):
+    """Pixel count from the image header, before any pixel is decoded"""
+    from PIL import Image
+
+    with Image.open(file_path) as image:
+        width, height = image.size
+    check_pixels(width, height)
+
+
+def check_pixels(width: int, height: int, name: str = "Image"):
+    pixels = width * height
+    check("imagePixels", pixels, MAX_IMAGE_PIXELS, f"{name} is {width}x{height} (limit {MAX_IMAGE_PIXELS} pixels)")
+
+
+def image_xobject_size(xobj) -> tuple:
+    """(width, height, decoded bytes) declared by a PDF image XObject"""
+    width, height = int(xobj.get("/Width", 0)), int(xobj.get("/Height", 0))
+    colorspace = xobj.get("/ColorSpace")
+    components = COMPONENTS.get(str(colorspace), 3) if not xobj.get("/ImageMask") else 1
+    bits = int(xobj.get("/BitsPerComponent", 8))
+    return width, height, (width * height * components * bits + 7) // 8
+
+
+def limit_worker_memory():
+    """Cap this process's address space at ANALYZER_MAX_MEMORY_MB, so a runaway decode
+    raises MemoryError instead of inviting the OOM killer"""
+    if not MAX_WORKER_MEMORY:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (MAX_WORKER_MEMORY, MAX_WORKER_MEMORY))
+    except (ImportError, ValueError, OSError) as e:
+        log.warning("limits.rlimit_failed", f"Could not limit worker memory: {e}")
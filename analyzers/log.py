@@ -0,0 +1,99 @@
+# log.py
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+# debug | info | warning | error | off
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+# text (one human-readable line per event) | json (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Fraction of hot-path events (per page, per image...) that are written when their level is on
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "off": logging.CRITICAL + 1,
+}
+
+_root = logging.getLogger("forgery")
+
+
+class StructuredLogger:
+    """Leveled event logger: log.info("job.completed", "✅ Job done", job=job_id).
+
+    Each call names an event and may attach fields; the text format appends them
+    as key=value, the json format writes them as properties. Calls below the
+    configured level return before any formatting, and sample=True events are
+    additionally thinned to LOG_SAMPLE_RATE.
+    """
+
+    def __init__(self, name: str):
+        self._logger = _root.getChild(name)
+
+    def enabled(self, level: int = logging.DEBUG) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event: str, message: str = "", sample: bool = False, **fields):
+        self._log(logging.DEBUG, event, message, sample, fields)
+
+    def info(self, event: str, message: str = "", sample: bool = False, **fields):
+        self._log(logging.INFO, event, message, sample, fields)
+
+    def warning(self, event: str, message: str = "", sample: bool = False, **fields):
+        self._log(logging.WARNING, event, message, sample, fields)
+
+    def error(self, event: str, message: str = "", sample: bool = False, **fields):
+        self._log(logging.ERROR, event, message, sample, fields)
+
+    def _log(self, level: int, event: str, message: str, sample: bool, fields: dict):
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample and random.random() >= LOG_SAMPLE_RATE:
+            return
+        self._logger.log(level, message or event, extra={"event": event, "fields": fields})
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = getattr(record, "fields", None)
+        line = record.getMessage()
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage(),
+            **(getattr(record, "fields", None) or {}),
+        }
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Attach the stdout handler to the "forgery" logger (idempotent)"""
+    _root.setLevel(LEVELS.get(level, logging.INFO))
+    _root.propagate = False
+    for handler in list(_root.handlers):
+        _root.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_JSONFormatter() if fmt == "json" else _TextFormatter())
+    _root.addHandler(handler)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
+
+
+configure()
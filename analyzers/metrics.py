@@ -0,0 +1,182 @@
+# metrics.py
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = {}
+_registry_lock = threading.Lock()
+
+
+class _Metric:
+    """One metric family; children are keyed by their label values"""
+
+    kind = None
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list:
+        lines = []
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        return _metrics.setdefault(metric.name, metric)
+
+
+def counter(name: str, help: str, labels: tuple = ()) -> Counter:
+    return _register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: tuple = ()) -> Gauge:
+    return _register(Gauge(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format (0.0.4)"""
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Shared metric families; modules import these rather than registering their own names
+ANALYZER_SECONDS = histogram(
+    "forgery_analyzer_duration_seconds", "Time spent in one analyzer call", ("analyzer", "method")
+)
+PAGES = counter("forgery_pages_processed_total", "Document pages read by an analyzer", ("analyzer",))
+PAGE_RATE = histogram(
+    "forgery_pages_per_second", "Per-document page throughput of an analyzer", ("analyzer",),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+BACKEND_FALLBACKS = counter(
+    "forgery_backend_fallbacks_total", "Times an analyzer fell back to another parsing library",
+    ("analyzer", "source", "fallback"),
+)
+INGESTED_BYTES = counter("forgery_ingested_bytes_total", "Upload bytes streamed to disk")
+INGESTED_FILES = counter("forgery_ingested_files_total", "Uploads streamed to disk")
+CACHE_LOOKUPS = counter("forgery_result_cache_lookups_total", "Result cache lookups", ("result", "tier"))
+SECTIONS = counter("forgery_sections_total", "Response sections produced, by completion status", ("section", "status"))
+ANALYSES_IN_FLIGHT = gauge("forgery_analyses_in_flight", "Documents being analyzed right now")
+HTTP_IN_FLIGHT = gauge("forgery_http_requests_in_flight", "HTTP requests being served right now")
+ADMISSION_ACTIVE = gauge("forgery_admission_active", "Analysis requests admitted and running in this process")
+ADMISSION_QUEUED = gauge("forgery_admission_queue_depth", "Analysis requests waiting for a slot in this process")
+ADMISSION_REJECTIONS = counter(
+    "forgery_admission_rejections_total", "Analysis requests turned away (client limit, queue full, queue timeout)",
+    ("reason",),
+)
+ADMISSION_WAIT_SECONDS = histogram("forgery_admission_wait_seconds", "Time queued requests waited for a slot")
@@ -0,0 +1,127 @@
+# ooxml.py
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import datetime
+
+from analyzers.limits import MAX_XML_DEPTH, LimitExceeded
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+PARAGRAPH, TEXT, TAB, BREAKS = f"{W}p", f"{W}t", f"{W}tab", (f"{W}br", f"{W}cr")
+CORE_NS = {
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+}
+APP_NS = {"ep": "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"}
+CORE_FIELDS = {
+    "title": "dc:title",
+    "subject": "dc:subject",
+    "creator": "dc:creator",
+    "keywords": "cp:keywords",
+    "lastModifiedBy": "cp:lastModifiedBy",
+    "revision": "cp:revision",
+    "created": "dcterms:created",
+    "modified": "dcterms:modified",
+}
+APP_FIELDS = ("Pages", "Words", "Characters", "Paragraphs", "Lines", "Application", "AppVersion", "TotalTime")
+SIGNATURE_DIR = "_xmlsignatures/"
+MAIN_PART = "word/document.xml"
+
+
+class OOXMLPackage:
+    """A Word package read straight from its zip, without building a document object model.
+
+    Property parts are small and parsed whole; the main document part is
+    streamed with iterparse and each paragraph is dropped once its text has
+    been read, so memory does not grow with the size of the document.
+    """
+
+    def __init__(self, file_path: str):
+        self.archive = zipfile.ZipFile(file_path, "r")
+        self.members = self.archive.namelist()
+        self._names = set(self.members)
+
+    def read(self, name: str) -> bytes:
+        return self.archive.read(name)
+
+    def core_properties(self) -> dict:
+        """docProps/core.xml fields by name (None when absent); created/modified as datetimes"""
+        root = self._parse("docProps/core.xml")
+        properties = {}
+        for key, tag in CORE_FIELDS.items():
+            value = root.findtext(tag, namespaces=CORE_NS) if root is not None else None
+            value = value.strip() if value and value.strip() else None
+            if key in ("created", "modified") and value:
+                try:
+                    value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                except ValueError:
+                    value = None
+            properties[key] = value
+        return properties
+
+    def app_properties(self) -> dict:
+        """docProps/app.xml statistics as saved by the editing application; counts as ints"""
+        root = self._parse("docProps/app.xml")
+        properties = {}
+        for field in APP_FIELDS:
+            value = root.findtext(f"ep:{field}", namespaces=APP_NS) if root is not None else None
+            value = value.strip() if value and value.strip() else None
+            properties[field] = int(value) if value and value.isdigit() else value
+        return properties
+
+    def iter_paragraphs(self):
+        """Text of each paragraph in the main document, body and table cells alike, in document order.
+
+        Raises LimitExceeded when elements nest deeper than LIMIT_MAX_XML_DEPTH.
+        """
+        if MAIN_PART not in self._names:
+            return
+        with self.archive.open(MAIN_PART) as part:
+            stack = []
+            depth = 0  # paragraphs nest inside text boxes; only the outermost one is emitted
+            for event, element in ET.iterparse(part, events=("start", "end")):
+                if event == "start":
+                    stack.append(element)
+                    if MAX_XML_DEPTH and len(stack) > MAX_XML_DEPTH:
+                        raise LimitExceeded(
+                            "xmlDepth", len(stack), MAX_XML_DEPTH,
+                            f"{MAIN_PART} nests elements more than {MAX_XML_DEPTH} levels deep",
+                        )
+                    if element.tag == PARAGRAPH:
+                        depth += 1
+                    continue
+                stack.pop()
+                if element.tag == PARAGRAPH:
+                    depth -= 1
+                    if depth == 0:
+                        yield _paragraph_text(element)
+                if depth == 0 and stack:
+                    # Done with this subtree: detach it so the tree never holds more than one paragraph
+                    stack[-1].remove(element)
+
+    def signature_parts(self) -> list:
+        """XML-DSig signature parts (_xmlsignatures/sigN.xml), in package order"""
+        return [
+            name for name in self.members
+            if name.startswith(SIGNATURE_DIR) and name.endswith(".xml") and "/_rels/" not in name
+        ]
+
+    def close(self):
+        self.archive.close()
+
+    def _parse(self, name: str):
+        return ET.fromstring(self.archive.read(name)) if name in self._names else None
+
+
+def _paragraph_text(paragraph) -> str:
+    parts = []
+    for node in paragraph.iter():
+        tag = node.tag
+        if tag == TEXT:
+            if node.text:
+                parts.append(node.text)
+        elif tag == TAB:
+            parts.append("\t")
+        elif tag in BREAKS:
+            parts.append("\n")
+    return "".join(parts)
@@ -1,34 +1,66 @@
 # pdf_analyzer.py (patch)
-import PyPDF2
-import pikepdf
 from datetime import datetime
 import re
 import os
 import mimetypes  # add
+from analyzers.document_context import use_context
+from analyzers.executor import get_executor
+from analyzers.log import get_logger
+from analyzers.metrics import BACKEND_FALLBACKS
+
+log = get_logger("pdf")
 
 class PDFAnalyzer:
+    name = "pdf"
+
     def __init__(self):
         self.pdf_date_pattern = re.compile(r'D:(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})')
+
+    async def extract_metadata(self, file_path: str, context=None, quick: bool = False):
+        """Extract PDF metadata without blocking the event loop"""
+        return await get_executor().run(self, "extract_metadata_sync", file_path, quick, context=context)
     
-    async def extract_metadata(self, file_path: str):
-        """Extract real metadata from PDF file"""
+    def extract_metadata_sync(self, file_path: str, quick: bool = False, context=None):
+        """Extract real metadata from PDF file.
+
+        quick reads only the trailer, Info dictionary, XMP and catalog (page
+        count from /Pages), and the revision scan walks the xref chain without
+        the full-file marker pass.
+        """
+        with use_context(context, file_path) as context:
+            try:
+                metadata = self._extract_with_pikepdf(file_path, context, quick)
+            except Exception as e:
+                log.warning("pdf.fallback", f"Pikepdf extraction failed, falling back to PyPDF2: {e}")
+                BACKEND_FALLBACKS.inc(analyzer="pdf", source="pikepdf", fallback="pypdf2")
+                try:
+                    metadata = self._extract_with_pypdf2(file_path, context)
+                except Exception as e2:
+                    log.warning("pdf.failed", f"PyPDF2 extraction failed: {e2}")
+                    metadata = self._get_basic_info(file_path)
+        metadata["revisions"] = self._scan_revisions(file_path, markers=not quick)
+        return metadata
+
+    def _scan_revisions(self, file_path: str, markers: bool = True):
+        """Incremental-update history straight from the file bytes (no object graph needed)"""
+        from analyzers.pdf_revisions import scan_revisions
+
         try:
-            return await self._extract_with_pikepdf(file_path)
+            revisions = scan_revisions(file_path, markers)
         except Exception as e:
-            print(f"Pikepdf extraction failed: {e}")
-            try:
-                return await self._extract_with_pypdf2(file_path)
-            except Exception as e2:
-                print(f"PyPDF2 extraction failed: {e2}")
-                return await self._get_basic_info(file_path)
+            log.warning("pdf.revisions_failed", f"Revision scan failed: {e}")
+            return {"error": f"Could not read revision history: {e}"}
+        if revisions["modifiedAfterSigning"]:
+            log.info("pdf.modified_after_signing", "⚠️ PDF modified after its last signature", revisions=revisions["count"])
+        return revisions
     
-    async def _extract_with_pikepdf(self, file_path: str):
+    def _extract_with_pikepdf(self, file_path: str, context, quick: bool = False):
         """Extract metadata using pikepdf"""
-        with pikepdf.Pdf.open(file_path) as pdf:
+        with context.open("pikepdf") as pdf:
             metadata = {}
             # Base docinfo fields
-            if pdf.docinfo:
-                docinfo = pdf.docinfo
+            docinfo = context.pdf_docinfo()
+            if docinfo:
                 metadata.update({
                     "author": str(docinfo.get('/Author', 'Not specified')),
                     "title": str(docinfo.get('/Title', 'Not specified')),
@@ -46,33 +78,29 @@ class PDFAnalyzer:
                     metadata["modifiedDate"] = self._parse_pdf_date(str(mod_date))
             # XMP: get last modified by if available
             last_modified_by = None
-            try:
-                meta = pdf.open_metadata()  # dict-like XMP access
-                for key in ("xmpMM:LastModifiedBy", "xmpMM:LastModifier", "pdfx:LastModifiedBy"):
-                    if key in meta and meta[key]:
-                        last_modified_by = str(meta[key])
-                        break
-                # If XMP has ModifyDate/MetadataDate but no person, we still keep timestamps from Info
-            except Exception:
-                pass
+            meta = context.pdf_xmp()  # shared XMP snapshot
+            for key in ("xmpMM:LastModifiedBy", "xmpMM:LastModifier", "pdfx:LastModifiedBy"):
+                if meta.get(key):
+                    last_modified_by = meta[key]
+                    break
+            # If XMP has ModifyDate/MetadataDate but no person, we still keep timestamps from Info
             # Nonstandard Info fallbacks
-            if not last_modified_by and pdf.docinfo:
+            if not last_modified_by and docinfo:
                 for key in ("/LastModifiedBy", "/LastSavedBy"):
-                    if key in pdf.docinfo and pdf.docinfo.get(key):
-                        last_modified_by = str(pdf.docinfo.get(key))
+                    if docinfo.get(key):
+                        last_modified_by = docinfo[key]
                         break
             metadata["lastModifiedBy"] = last_modified_by or "Not specified"
-            # Page count
-            metadata["pageCount"] = len(pdf.pages)
+            # Page count; the catalog's /Count avoids walking the page tree in quick mode
+            metadata["pageCount"] = int(pdf.Root.Pages.Count) if quick else len(pdf.pages)
             # Type for UI logic
             mime, _ = mimetypes.guess_type(file_path)
             metadata["type"] = mime or "application/pdf"
             return metadata
     
-    async def _extract_with_pypdf2(self, file_path: str):
+    def _extract_with_pypdf2(self, file_path: str, context):
         """Extract metadata using PyPDF2"""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
+        with context.open("pypdf2") as pdf_reader:
             metadata = {}
             if pdf_reader.metadata:
                 doc_info = pdf_reader.metadata
@@ -114,7 +142,7 @@ class PDFAnalyzer:
             metadata["type"] = mime or "application/pdf"
             return metadata
     
-    async def _get_basic_info(self, file_path: str):
+    def _get_basic_info(self, file_path: str):
         """Get basic file information when metadata extraction fails"""
         stat = os.stat(file_path)
         mime, _ = mimetypes.guess_type(file_path)
@@ -0,0 +1,104 @@
+# pdf_images.py
+import pikepdf
+
+from analyzers.limits import MAX_DEPTH, image_xobject_size
+
+# Annotation appearance streams: normal, rollover, down
+APPEARANCES = ("/N", "/R", "/D")
+
+
+class ImageInventory:
+    """Every image XObject a PDF's pages draw, once per object.
+
+    Images are found through page resources, nested Form XObjects and
+    annotation appearance streams. A shared image is listed once with every
+    page that references it, and each Form XObject's images are collected on
+    first visit and reused on later pages, so a logo placed through a form on
+    every page costs one traversal. Nothing is decoded; entries hold the
+    dictionary values and the object id to decode from later.
+    """
+
+    def __init__(self):
+        self.images = {}  # objgen -> entry, in first-reference order
+        self.references = 0
+        self._forms = {}  # objgen -> [(name, image xobject)] drawn by the form, nested forms included
+
+    def add_page(self, page_num: int, page):
+        """Record the images drawn by a pikepdf page, its forms and its annotations"""
+        found = self._resources(page.get("/Resources"), set(), 0)
+        for annot in page.get("/Annots") or []:
+            appearance = annot.get("/AP") if isinstance(annot, pikepdf.Dictionary) else None
+            for key in APPEARANCES:
+                stream = appearance.get(key) if appearance is not None else None
+                if stream is None:
+                    continue
+                # An appearance is a form, or a dictionary of forms by state (/On, /Off)
+                streams = [stream] if isinstance(stream, pikepdf.Stream) else list(stream.values())
+                for form in streams:
+                    found.extend(self._form(form, set(), 1))
+        for name, xobj in found:
+            self._record(page_num, name, xobj)
+
+    def _resources(self, resources, path: set, depth: int) -> list:
+        if resources is None or "/XObject" not in resources:
+            return []
+        found = []
+        for name, xobj in resources["/XObject"].items():
+            subtype = xobj.get("/Subtype")
+            if subtype == "/Image":
+                found.append((str(name), xobj))
+            elif subtype == "/Form":
+                found.extend(self._form(xobj, path, depth + 1))
+        return found
+
+    def _form(self, form, path: set, depth: int) -> list:
+        if not isinstance(form, pikepdf.Stream) or (MAX_DEPTH and depth > MAX_DEPTH):
+            return []
+        # Streams are always indirect objects, so objgen identifies every form and image
+        key = form.objgen
+        if key in self._forms:
+            return self._forms[key]
+        if key in path:  # a form that draws itself
+            return []
+        found = self._resources(form.get("/Resources"), path | {key}, depth)
+        self._forms[key] = found
+        return found
+
+    def _record(self, page_num: int, name: str, xobj):
+        self.references += 1
+        entry = self.images.get(xobj.objgen)
+        if entry is None:
+            width, height, decoded = image_xobject_size(xobj)
+            filters = xobj.get("/Filter")
+            if isinstance(filters, pikepdf.Array):
+                filters = [str(f) for f in filters]
+            elif filters is not None:
+                filters = str(filters)
+            entry = self.images[xobj.objgen] = {
+                "name": name,
+                "objgen": xobj.objgen,
+                "pages": [],
+                "width": width,
+                "height": height,
+                "filter": filters,
+                "bitsPerComponent": int(xobj.get("/BitsPerComponent", 0)) or None,
+                "imageMask": bool(xobj.get("/ImageMask", False)),
+                "bytes": int(xobj.get("/Length", 0)),
+                "decodedBytes": decoded,
+            }
+        if not entry["pages"] or entry["pages"][-1] != page_num:
+            entry["pages"].append(page_num)
+
+
+def describe(entry: dict) -> dict:
+    """Response form of an inventory entry"""
+    return {
+        "image": entry["name"],
+        "object": "%d %d" % entry["objgen"],
+        "pages": entry["pages"],
+        "width": entry["width"],
+        "height": entry["height"],
+        "filter": entry["filter"],
+        "bitsPerComponent": entry["bitsPerComponent"],
+        "bytes": entry["bytes"],
+    }
@@ -0,0 +1,267 @@
+# pdf_revisions.py
+import mmap
+import re
+import zlib
+
+TAIL_BYTES = 4096      # startxref sits in the last few bytes
+HEADER_BYTES = 1024    # the linearization dictionary must start in the first KB
+DICT_BYTES = 65536     # how far a trailer or xref-stream dictionary may extend
+MAX_SECTIONS = 1000
+MAX_LISTED_OBJECTS = 50
+SCAN_CHUNK = 8 * 1024 * 1024  # marker scan reads the file in chunks this size
+SCAN_OVERLAP = 256           # longer than any marker, so none is split between chunks
+
+STARTXREF = re.compile(rb"startxref\s+(\d+)")
+SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*\r?\n?")
+ENTRY = re.compile(rb"(\d{10})\s(\d{5})\s([nf])")
+OBJECT_HEADER = re.compile(rb"\s*\d+\s+\d+\s+obj\b")
+BYTE_RANGE = re.compile(rb"/ByteRange\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*\]")
+
+
+def scan_revisions(file_path: str, markers: bool = True) -> dict:
+    """Revision history of a PDF from its cross-reference sections, without parsing the object graph.
+
+    The file is memory-mapped and the xref chain is followed backwards from
+    startxref (classic tables, xref streams and hybrid files alike), so only
+    the xref data and a few KB of dictionaries are paged in. %%EOF markers and
+    signature /ByteRange values are found in one chunked pass over the file,
+    so memory stays flat even for multi-GB files. Byte ranges locate the
+    revision each signature covers and anything written after it. With
+    markers=False that pass is skipped and eofMarkers and signatures are None.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        sections = _xref_chain(data)
+        revisions = _revisions(data, sections)
+        eof_markers, signatures = None, None
+        if markers:
+            eof_markers, byte_ranges = _scan_markers(f)
+            signatures = _signatures(data, revisions, byte_ranges)
+        return {
+            "count": len(revisions),
+            "incrementalUpdates": max(0, len(revisions) - 1),
+            "linearized": b"/Linearized" in data[:HEADER_BYTES],
+            "eofMarkers": eof_markers,
+            "revisions": [_public(revision) for revision in revisions],
+            "signatures": signatures,
+            "modifiedAfterSigning": signatures[-1]["modifiedAfter"] if signatures else (False if markers else None),
+        }
+
+
+def _xref_chain(data) -> list:
+    """Xref sections from newest to oldest: {"offset", "type", "entries": {object number: (kind, generation)}}"""
+    # The last startxref wins; small files can have an earlier one in the tail too
+    match = STARTXREF.match(data, max(0, data.rfind(b"startxref", max(0, len(data) - TAIL_BYTES))))
+    if not match:
+        raise ValueError("No startxref found")
+    offset = int(match.group(1))
+    sections = []
+    visited = set()
+    while offset is not None and offset not in visited and len(sections) < MAX_SECTIONS:
+        visited.add(offset)
+        if offset >= len(data):
+            raise ValueError(f"Cross-reference offset {offset} is beyond the end of the file")
+        start = offset + len(data[offset:offset + 64]) - len(data[offset:offset + 64].lstrip())
+        if data[start:start + 4] == b"xref":
+            entries, trailer = _xref_table(data, start + 4)
+            section = {"offset": offset, "type": "table", "entries": entries}
+            hybrid = _int(trailer, rb"/XRefStm\s+(\d+)")
+            if hybrid is not None and hybrid < len(data):
+                # Hybrid file: objects in object streams are listed in a companion xref stream
+                stream_entries, _ = _xref_stream(data, hybrid)
+                for number, entry in stream_entries.items():
+                    entries.setdefault(number, entry)
+        elif OBJECT_HEADER.match(data, start):
+            entries, trailer = _xref_stream(data, start)
+            section = {"offset": offset, "type": "stream", "entries": entries}
+        else:
+            raise ValueError(f"No cross-reference section at offset {offset}")
+        sections.append(section)
+        offset = _int(trailer, rb"/Prev\s+(\d+)")
+    return sections
+
+
+def _xref_table(data, position: int):
+    """Entries of a classic xref table starting after the "xref" keyword, and its trailer bytes"""
+    entries = {}
+    while True:
+        match = SUBSECTION.match(data, position)
+        if not match:
+            break
+        first, count = int(match.group(1)), int(match.group(2))
+        position = match.end()
+        # Entries are 20 bytes by the spec; tolerate writers that use a 19 or 21 byte line
+        block = data[position:position + count * 21]
+        found = 0
+        for found, entry in enumerate(ENTRY.finditer(block), 1):
+            offset, generation, kind = entry.groups()
+            entries[first + found - 1] = ("n" if kind == b"n" else "f", int(generation))
+            if found == count:
+                position += entry.end()
+                break
+        if found < count:
+            raise ValueError("Truncated cross-reference table")
+    trailer_at = data.find(b"trailer", position, position + 256)
+    if trailer_at < 0:
+        raise ValueError("Cross-reference table without trailer")
+    return entries, data[trailer_at:trailer_at + DICT_BYTES].split(b"startxref", 1)[0]
+
+
+def _xref_stream(data, position: int):
+    """Entries of a cross-reference stream object at position, and its dictionary bytes"""
+    stream_at = data.find(b"stream", position, position + DICT_BYTES)
+    if stream_at < 0:
+        raise ValueError("Cross-reference stream without data")
+    header = data[position:stream_at]
+    if b"/XRef" not in header:
+        raise ValueError("Object at cross-reference offset is not an xref stream")
+    body_start = stream_at + 6
+    body_start += 2 if data[body_start:body_start + 2] == b"\r\n" else 1
+    length = _int(header, rb"/Length\s+(\d+)\b(?!\s+\d+\s+R)")
+    if length is None:
+        # Indirect /Length: the end marker is the only bound we can trust
+        length = data.find(b"endstream", body_start) - body_start
+    body = data[body_start:body_start + length]
+    if b"/FlateDecode" in header:
+        body = zlib.decompress(body)
+
+    widths = [int(w) for w in re.search(rb"/W\s*\[([^\]]*)\]", header).group(1).split()]
+    row = sum(widths)
+    predictor = _int(header, rb"/Predictor\s+(\d+)") or 1
+    if predictor >= 10:
+        body = _png_unfilter(body, _int(header, rb"/Columns\s+(\d+)") or row)
+    index_match = re.search(rb"/Index\s*\[([^\]]*)\]", header)
+    index = [int(v) for v in index_match.group(1).split()] if index_match else [0, _int(header, rb"/Size\s+(\d+)")]
+
+    entries = {}
+    cursor = 0
+    for first, count in zip(index[::2], index[1::2]):
+        for number in range(first, first + count):
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(body[cursor:cursor + width], "big") if width else None)
+                cursor += width
+            kind = 1 if widths[0] == 0 else fields[0]
+            if kind == 0:
+                entries[number] = ("f", fields[2] or 0)
+            elif kind == 1:
+                entries[number] = ("n", fields[2] or 0)
+            elif kind == 2:
+                entries[number] = ("n", 0)  # compressed objects always have generation 0
+    return entries, header
+
+
+def _png_unfilter(body: bytes, columns: int) -> bytes:
+    """Undo PNG row predictors (xref streams almost always use Up)"""
+    rows = []
+    previous = bytearray(columns)
+    for start in range(0, len(body), columns + 1):
+        kind, line = body[start], bytearray(body[start + 1:start + 1 + columns])
+        if kind == 2:
+            for i in range(len(line)):
+                line[i] = (line[i] + previous[i]) & 0xFF
+        elif kind == 1:
+            for i in range(1, len(line)):
+                line[i] = (line[i] + line[i - 1]) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"Unsupported PNG predictor {kind} in xref stream")
+        rows.append(bytes(line))
+        previous = line
+    return b"".join(rows)
+
+
+def _revisions(data, sections: list) -> list:
+    """Group sections into revisions, oldest first, with the objects each one touched.
+
+    A /Prev pointing forward in the file is linearization (the first-page
+    section points to the main one), not an update, so such pairs form one revision.
+    """
+    groups = []
+    for section in reversed(sections):
+        if groups and section["offset"] < groups[-1][-1]["offset"]:
+            groups[-1].append(section)
+        else:
+            groups.append([section])
+
+    revisions = []
+    in_use = set()
+    for number, group in enumerate(groups, 1):
+        entries = {}
+        for section in group:
+            entries.update(section["entries"])
+        used = {obj for obj, (kind, _) in entries.items() if kind == "n"}
+        freed = {obj for obj, (kind, _) in entries.items() if kind == "f" and obj in in_use}
+        offset = max(section["offset"] for section in group)
+        end = data.find(b"%%EOF", offset)
+        revisions.append({
+            "revision": number,
+            "offset": offset,
+            "end": len(data) if end < 0 else end + 5,
+            "xref": group[-1]["type"],
+            "entries": len(entries),
+            "added": sorted(used - in_use) if number > 1 else [],
+            "changed": sorted(used & in_use),
+            "deleted": sorted(freed),
+        })
+        in_use = (in_use | used) - freed
+    return revisions
+
+
+def _scan_markers(f):
+    """(number of %%EOF markers, distinct /ByteRange values) from one sequential pass"""
+    eof_markers = 0
+    byte_ranges = []
+    f.seek(0)
+    carry = b""
+    while True:
+        chunk = f.read(SCAN_CHUNK)
+        buffer = carry + chunk
+        # Matches starting in the overlap are left for the next round, which sees them whole
+        cut = len(buffer) - SCAN_OVERLAP if chunk else len(buffer)
+        eof_markers += buffer.count(b"%%EOF", 0, cut + 4) if cut > 0 else 0
+        for match in BYTE_RANGE.finditer(buffer, 0):
+            if match.start() < cut:
+                byte_range = tuple(int(value) for value in match.groups())
+                if byte_range not in byte_ranges:
+                    byte_ranges.append(byte_range)
+        if not chunk:
+            return eof_markers, byte_ranges
+        carry = buffer[max(cut, 0):]
+
+
+def _signatures(data, revisions: list, byte_ranges: list) -> list:
+    """Signed byte ranges, the revision each belongs to, and what was written after it"""
+    signatures = []
+    for byte_range in byte_ranges:
+        signed_end = byte_range[2] + byte_range[3]
+        later = [revision for revision in revisions if revision["offset"] >= signed_end]
+        covered = [revision for revision in revisions if revision["offset"] < signed_end]
+        changed = sorted({obj for revision in later for key in ("added", "changed", "deleted") for obj in revision[key]})
+        signatures.append({
+            "byteRange": list(byte_range),
+            "revision": covered[-1]["revision"] if covered else None,
+            "coversWholeFile": _blank_after(data, signed_end),
+            "modifiedAfter": bool(later) or not _blank_after(data, signed_end),
+            "revisionsAfter": len(later),
+            "objectsChangedAfter": changed[:MAX_LISTED_OBJECTS],
+        })
+    signatures.sort(key=lambda signature: signature["byteRange"][2] + signature["byteRange"][3])
+    return signatures
+
+
+def _public(revision: dict) -> dict:
+    """Revision summary for the response, with object lists capped"""
+    summary = {key: revision[key] for key in ("revision", "offset", "end", "xref", "entries")}
+    for key in ("added", "changed", "deleted"):
+        summary[key] = revision[key][:MAX_LISTED_OBJECTS]
+        summary[f"{key}Count"] = len(revision[key])
+    return summary
+
+
+def _blank_after(data, position: int) -> bool:
+    """Nothing but end-of-line padding follows position"""
+    return len(data) - position <= 64 and not data[position:].strip()
+
+
+def _int(text: bytes, pattern: bytes):
+    match = re.search(pattern, text)
+    return int(match.group(1)) if match else None
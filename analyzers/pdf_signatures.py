@@ -0,0 +1,442 @@
+# pdf_signatures.py
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509.oid import NameOID
+
+from analyzers.cms import (
+    SignedData, CMSError, TST_INFO, content_digest_matches, timestamp_info, verify_signer, WEAK_DIGESTS
+)
+from analyzers.limits import MAX_DEPTH
+from analyzers.log import get_logger
+from analyzers.trust_store import TRUST_STORE_PATH, trust_store_files
+
+CERT_CACHE_SIZE = int(os.getenv("SIGNATURE_CERT_CACHE_SIZE", "4096"))
+HASH_CHUNK = 1024 * 1024  # signed ranges are hashed through the mmap this many bytes at a time
+MAX_CHAIN_DEPTH = 10
+
+log = get_logger("signature")
+
+PDF_DATE = re.compile(r"D:(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?")
+PEM_BLOCK = re.compile(rb"-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----", re.S)
+
+
+def signature_fields(pdf) -> list:
+    """Signed signature fields of a pikepdf document: name, dictionary values and raw /Contents"""
+    acroform = pdf.Root.get("/AcroForm")
+    if acroform is None:
+        return []
+    fields = []
+    seen = set()
+
+    def walk(field, parent_name, inherited_type, depth):
+        if (MAX_DEPTH and depth > MAX_DEPTH) or (field.is_indirect and field.objgen in seen):
+            return
+        if field.is_indirect:
+            seen.add(field.objgen)
+        partial = str(field.get("/T", ""))
+        name = ".".join(part for part in (parent_name, partial) if part)
+        field_type = str(field.get("/FT", inherited_type or ""))
+        for kid in field.get("/Kids", []):
+            walk(kid, name, field_type, depth + 1)
+        value = field.get("/V")
+        if field_type != "/Sig" or value is None or "/Contents" not in value or "/ByteRange" not in value:
+            return
+        fields.append({
+            "field": name or None,
+            "byteRange": [int(number) for number in value.ByteRange],
+            "contents": bytes(value.Contents),
+            "subFilter": str(value.get("/SubFilter", "")).lstrip("/") or None,
+            "name": str(value["/Name"]) if "/Name" in value else None,
+            "signingTime": parse_pdf_date(str(value["/M"])) if "/M" in value else None,
+            "reason": str(value["/Reason"]) if "/Reason" in value else None,
+            "location": str(value["/Location"]) if "/Location" in value else None,
+        })
+
+    for field in acroform.get("/Fields", []):
+        walk(field, "", None, 0)
+    return fields
+
+
+def verify_signatures(file_path: str, fields: list, should_stop=None) -> list:
+    """Verify each signature field against the bytes it claims to cover.
+
+    The file is memory-mapped and every signed range is hashed through it in
+    HASH_CHUNK pieces, so large documents are never read into memory; digests
+    are shared between signatures that cover the same ranges. When
+    should_stop() turns true, the signatures verified so far are returned
+    (always at least one).
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        digests = {}
+
+        def document_digest(byte_range):
+            def digest(algorithm):
+                key = (tuple(byte_range), algorithm)
+                if key not in digests:
+                    digests[key] = _hash_ranges(data, byte_range, algorithm)
+                return digests[key]
+            return digest
+
+        results = []
+        for field in fields:
+            if results and should_stop and should_stop():
+                break
+            byte_range = field["byteRange"]
+            # Only line-end padding may follow the signed bytes of the final revision
+            end = byte_range[2] + byte_range[3] if len(byte_range) == 4 else 0
+            covers_whole = 0 < end <= size and size - end <= 64 and not data[end:].strip()
+            results.append(_verify(field, size, covers_whole, document_digest(byte_range)))
+        return results
+
+
+def _verify(field: dict, size: int, covers_whole: bool, document_digest) -> dict:
+    byte_range = field["byteRange"]
+    result = {
+        "field": field["field"],
+        "subFilter": field["subFilter"],
+        "signerName": field["name"] or "Unknown",
+        "signedDate": field["signingTime"].isoformat() if field["signingTime"] else "",
+        "reason": field["reason"],
+        "location": field["location"],
+        "byteRange": byte_range,
+        "coversWholeDocument": covers_whole,
+        "digestAlgorithm": None,
+        "digestMatches": False,
+        "signatureValid": False,
+        "certificateValid": False,
+        "trusted": False,
+        "timestamped": False,
+        "timestampTime": None,
+        "chain": [],
+        "isValid": False,
+        "errors": [],
+        "warnings": [],
+    }
+    errors, warnings = result["errors"], result["warnings"]
+
+    problem = _byte_range_problem(byte_range, size, len(field["contents"]))
+    if problem:
+        errors.append(problem)
+        return result
+    if not result["coversWholeDocument"]:
+        warnings.append("Signature does not cover the whole file; later revisions were appended")
+
+    try:
+        signed = SignedData(field["contents"])
+        if not signed.signers:
+            raise CMSError("SignedData without signers")
+        signer = signed.signers[0]
+        certificates = [load_certificate(der) for der in signed.certificates]
+        signer_cert = _signer_certificate(signer, certificates)
+    except (CMSError, ValueError, IndexError, TypeError) as e:
+        errors.append(f"Unreadable signature: {e}")
+        return result
+
+    result["digestAlgorithm"] = signer.digest_algorithm
+    result["timestamped"] = signer.has_timestamp or signed.content_type == TST_INFO
+    if signer.digest_algorithm in WEAK_DIGESTS:
+        warnings.append(f"Weak digest algorithm {signer.digest_algorithm}")
+
+    try:
+        result["digestMatches"] = content_digest_matches(signed, signer, document_digest)
+    except (CMSError, ValueError) as e:
+        errors.append(f"Could not compare document digest: {e}")
+    if not result["digestMatches"]:
+        errors.append("Document digest does not match the signature; signed bytes were changed")
+
+    if signer_cert is None:
+        errors.append("Signer certificate not included in the signature")
+        return result
+    result["signerName"] = _common_name(signer_cert) or result["signerName"]
+    claimed_time = signer.signing_time or field["signingTime"]
+    if signer.signing_time:
+        result["signedDate"] = signer.signing_time.isoformat()
+
+    try:
+        verify_signer(signed, signer, signer_cert.public_key())
+        result["signatureValid"] = True
+    except InvalidSignature:
+        errors.append("Signature value does not verify with the signer's certificate")
+    except (CMSError, ValueError) as e:
+        errors.append(f"Could not verify signature value: {e}")
+
+    chain = validate_chain(signer_cert, certificates)
+    result["chain"] = chain["chain"]
+    result["trusted"] = chain["trusted"]
+    if chain["error"]:
+        errors.append(chain["error"])
+
+    # The signer chooses /M and the signingTime attribute, so only a verified timestamp moves the check
+    timestamp_time = None
+    if signer.timestamp_token is not None:
+        timestamp_time, problem = verified_timestamp(signer)
+        if problem:
+            warnings.append(f"Timestamp not used: {problem}")
+    if timestamp_time is not None:
+        result["timestampTime"] = timestamp_time.isoformat()
+        at, when = timestamp_time, f"timestamp time {timestamp_time.isoformat()}"
+    else:
+        at, when = datetime.now(timezone.utc), "the current time"
+        if claimed_time is not None:
+            warnings.append(
+                f"Signer-claimed signing time {claimed_time.isoformat()} is not backed by a timestamp; "
+                "certificate validity checked against the current time"
+            )
+    expired = [subject for subject, (start, end) in zip(chain["chain"], chain["validity"]) if not start <= at <= end]
+    result["certificateValid"] = not expired
+    if expired:
+        errors.append(f"Certificate not valid at {when}: {expired[0]}")
+
+    result["isValid"] = not errors
+    return result
+
+
+def verified_timestamp(signer) -> tuple:
+    """(genTime, None) of a signer's RFC 3161 timestamp token, or (None, why it cannot be trusted).
+
+    The token must timestamp this signer's signature value, carry a valid
+    signature from its TSA and chain to the trust store, with the TSA
+    certificate valid at the time it asserts.
+    """
+    try:
+        token = SignedData(signer.timestamp_token)
+        if token.content_type != TST_INFO or token.content is None or not token.signers:
+            return None, "not an RFC 3161 timestamp token"
+        tsa = token.signers[0]
+        certificates = [load_certificate(der) for der in token.certificates]
+        tsa_cert = _signer_certificate(tsa, certificates)
+        algorithm, imprint, gen_time = timestamp_info(token.content)
+        if imprint != hashlib.new(algorithm, signer.signature).digest():
+            return None, "token does not timestamp this signature"
+        if tsa.message_digest != hashlib.new(tsa.digest_algorithm, token.content).digest():
+            return None, "token content does not match its signature"
+        if tsa_cert is None:
+            return None, "TSA certificate not included in the token"
+        verify_signer(token, tsa, tsa_cert.public_key())
+    except InvalidSignature:
+        return None, "TSA signature does not verify"
+    except (CMSError, ValueError, IndexError, TypeError) as e:
+        return None, f"unreadable token: {e}"
+    chain = validate_chain(tsa_cert, certificates)
+    if chain["error"]:
+        return None, f"TSA certificate: {chain['error']}"
+    if any(not start <= gen_time <= end for start, end in chain["validity"]):
+        return None, "TSA certificate not valid at the timestamp time"
+    return gen_time, None
+
+
+def _byte_range_problem(byte_range: list, size: int, contents_length: int):
+    """Why a /ByteRange cannot be a proper signature span, or None"""
+    if len(byte_range) != 4 or any(value < 0 for value in byte_range):
+        return f"Malformed ByteRange {byte_range}"
+    first_start, first_length, second_start, second_length = byte_range
+    if first_start != 0 or second_start < first_length or second_start + second_length > size:
+        return f"ByteRange {byte_range} does not fit a {size} byte file"
+    if second_start - first_length != 2 * contents_length + 2:
+        # The gap must be exactly the hex string holding the signature, <...>
+        return "ByteRange gap does not match the signature contents"
+    return None
+
+
+def _hash_ranges(data, byte_range: list, algorithm: str) -> bytes:
+    digest = hashlib.new(algorithm)
+    with memoryview(data) as view:
+        for start, length in zip(byte_range[::2], byte_range[1::2]):
+            for position in range(start, start + length, HASH_CHUNK):
+                digest.update(view[position:min(position + HASH_CHUNK, start + length)])
+    return digest.digest()
+
+
+def _signer_certificate(signer, certificates: list):
+    for cert in certificates:
+        if signer.key_id is not None:
+            try:
+                extension = cert.extensions.get_extension_for_class(x509.SubjectKeyIdentifier)
+            except x509.ExtensionNotFound:
+                continue
+            if extension.value.digest == signer.key_id:
+                return cert
+        elif cert.serial_number == signer.serial and cert.issuer.public_bytes() == signer.issuer:
+            return cert
+    # Some writers encode the issuer name differently from the certificate; the serial still identifies it
+    matches = [cert for cert in certificates if signer.serial is not None and cert.serial_number == signer.serial]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _common_name(cert) -> str:
+    names = cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+    return str(names[0].value) if names else cert.subject.rfc4514_string()
+
+
+def parse_pdf_date(value: str):
+    """PDF date string (D:YYYYMMDDHHmmSS...) as an aware datetime; offsets are ignored (UTC assumed)"""
+    match = PDF_DATE.match(value or "")
+    if not match:
+        return None
+    parts = [int(part) if part else default for part, default in zip(match.groups(), (0, 1, 1, 0, 0, 0))]
+    try:
+        return datetime(*parts, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+# Certificates and chains, memoized by fingerprint across documents
+
+_certificates = OrderedDict()
+_chains = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_certificate(der: bytes):
+    """Parse a DER certificate, reusing the parsed object for bytes seen before"""
+    fingerprint = hashlib.sha256(der).digest()
+    with _cache_lock:
+        cert = _certificates.get(fingerprint)
+        if cert is not None:
+            _certificates.move_to_end(fingerprint)
+            return cert
+    cert = x509.load_der_x509_certificate(der)
+    with _cache_lock:
+        _remember(_certificates, fingerprint, cert)
+    return cert
+
+
+def validate_chain(leaf, intermediates: list) -> dict:
+    """{"trusted", "chain" (subjects, leaf first), "validity", "error"} for a signer certificate.
+
+    Issuers are looked up among the signature's own certificates and the
+    trust store; each link's signature is checked. Results are memoized by
+    the fingerprints involved, so a signer seen before costs a dict lookup.
+    """
+    store = get_trust_store()
+    key = (_fingerprint(leaf), tuple(sorted(_fingerprint(cert) for cert in intermediates)), store.fingerprint)
+    with _cache_lock:
+        cached = _chains.get(key)
+        if cached is not None:
+            _chains.move_to_end(key)
+            return cached
+    result = _build_chain(leaf, intermediates, store)
+    with _cache_lock:
+        _remember(_chains, key, result)
+    return result
+
+
+def _build_chain(leaf, intermediates: list, store) -> dict:
+    chain = [leaf]
+    error = None
+    trusted = False
+    while True:
+        current = chain[-1]
+        if _fingerprint(current) in store.fingerprints:
+            trusted = True
+            break
+        if len(chain) > MAX_CHAIN_DEPTH:
+            error = "Certificate chain too long"
+            break
+        candidates = store.issuers(current.issuer) + [
+            cert for cert in intermediates if cert.subject == current.issuer and _is_ca(cert) and cert not in chain
+        ]
+        issuer = next((cert for cert in candidates if _issued_by(current, cert)), None)
+        if issuer is None:
+            if not store.fingerprints:
+                error = "No trust store configured (set SIGNATURE_TRUST_STORE)"
+            elif current.issuer == current.subject:
+                error = "Self-signed certificate is not in the trust store"
+            else:
+                error = f"Issuer not found in trust store: {current.issuer.rfc4514_string()}"
+            break
+        chain.append(issuer)
+    return {
+        "trusted": trusted,
+        "chain": [cert.subject.rfc4514_string() for cert in chain],
+        "validity": [(cert.not_valid_before_utc, cert.not_valid_after_utc) for cert in chain],
+        "error": error,
+    }
+
+
+def _issued_by(cert, issuer) -> bool:
+    try:
+        cert.verify_directly_issued_by(issuer)
+        return True
+    except (ValueError, TypeError, InvalidSignature):
+        return False
+
+
+def _is_ca(cert) -> bool:
+    try:
+        return cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        return False
+
+
+def _fingerprint(cert) -> bytes:
+    return hashlib.sha256(cert.tbs_certificate_bytes + cert.signature).digest()
+
+
+def _remember(cache: OrderedDict, key, value):
+    cache[key] = value
+    while len(cache) > CERT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+class TrustStore:
+    """Certificates trusted as anchors for signer chains, loaded once from TRUST_STORE_PATH"""
+
+    def __init__(self, path: str = TRUST_STORE_PATH):
+        self.path = path
+        self.certificates = []
+        for der in self._read(path) if path else []:
+            try:
+                self.certificates.append(load_certificate(der))
+            except ValueError as e:
+                log.warning("signature.trust_store_skipped", f"Skipping unreadable trust store certificate: {e}")
+        self.fingerprints = {_fingerprint(cert) for cert in self.certificates}
+        self._by_subject = {}
+        for cert in self.certificates:
+            self._by_subject.setdefault(cert.subject.public_bytes(), []).append(cert)
+        self.fingerprint = hashlib.sha256(b"".join(sorted(self.fingerprints))).hexdigest()[:16]
+        if path:
+            log.info("signature.trust_store", f"🔐 Loaded {len(self.certificates)} trusted certificates from {path}")
+
+    def issuers(self, name) -> list:
+        return list(self._by_subject.get(name.public_bytes(), []))
+
+    def info(self) -> dict:
+        return {"configured": bool(self.path), "certificates": len(self.certificates)}
+
+    def _read(self, path: str) -> list:
+        """DER bytes of every certificate in a PEM/DER file or a directory of them"""
+        files = trust_store_files(path)
+        if not files:
+            log.warning("signature.trust_store_missing", f"Trust store {path} not found or empty")
+        ders = []
+        for file_path in files:
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            blocks = PEM_BLOCK.findall(raw)
+            if blocks:
+                ders.extend(x509.load_pem_x509_certificate(block).public_bytes(Encoding.DER) for block in blocks)
+            else:
+                ders.append(raw)
+        return ders
+
+_trust_store = None
+_trust_store_lock = threading.Lock()
+
+
+def get_trust_store() -> TrustStore:
+    global _trust_store
+    with _trust_store_lock:
+        if _trust_store is None:
+            _trust_store = TrustStore()
+        return _trust_store
@@ -0,0 +1,113 @@
+# registry.py
+import importlib
+import os
+import sys
+import threading
+import time
+
+from analyzers.log import get_logger
+
+# Analyzer name -> (module, class). Modules are imported on first use, so a
+# cold start pays only for the analyzers (and libraries) a request needs.
+ANALYZERS = {
+    "pdf": ("analyzers.pdf_analyzer", "PDFAnalyzer"),
+    "docx": ("analyzers.docx_analyzer", "DOCXAnalyzer"),
+    "text": ("analyzers.text_analyzer", "TextAnalyzer"),
+    "image": ("analyzers.image_analyzer", "ImageAnalyzer"),
+    "signature": ("analyzers.signature_analyzer", "SignatureAnalyzer"),
+}
+# Third-party libraries behind the analyzers, imported through load_library()
+LIBRARIES = ("fitz", "pikepdf", "PyPDF2", "numpy", "PIL.Image", "cryptography.x509")
+
+ANALYZER_WARMUP = os.getenv("ANALYZER_WARMUP", "0").lower() in ("1", "true", "yes")
+
+log = get_logger("registry")
+
+_analyzers = {}
+_imports = {}  # module -> {"seconds", "trigger"}
+_warmup = {"state": "off", "seconds": None, "error": None}
+_lock = threading.Lock()
+_trigger = threading.local()
+
+
+def get_analyzer(name: str):
+    """Shared analyzer instance, importing its module the first time it is asked for"""
+    analyzer = _analyzers.get(name)
+    if analyzer is not None:
+        return analyzer
+    if name not in ANALYZERS:
+        raise ValueError(f"Unknown analyzer: {name}")
+    module_name, class_name = ANALYZERS[name]
+    analyzer = getattr(load_library(module_name), class_name)()
+    with _lock:
+        return _analyzers.setdefault(name, analyzer)
+
+
+def load_library(module_name: str):
+    """Import a module, recording how long the first import took and what caused it.
+
+    Modules already pulled in by another import are not timed again; their
+    cost shows up under whatever imported them.
+    """
+    loaded = module_name in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if not loaded:
+        with _lock:
+            _imports.setdefault(module_name, {
+                "seconds": round(time.perf_counter() - started, 4),
+                "trigger": getattr(_trigger, "name", "request"),
+            })
+    return module
+
+
+def warm_up():
+    """Import every analyzer and library and initialize what is lazily set up on first use"""
+    _trigger.name = "warmup"
+    started = time.perf_counter()
+    _warmup["state"] = "running"
+    try:
+        for module_name in LIBRARIES:
+            load_library(module_name)
+        for name in ANALYZERS:
+            get_analyzer(name)
+        _prime()
+        _warmup["state"] = "done"
+    except Exception as e:
+        log.warning("registry.warmup_failed", f"⚠️ Analyzer warm-up failed: {e}")
+        _warmup.update(state="failed", error=str(e))
+    finally:
+        _warmup["seconds"] = round(time.perf_counter() - started, 4)
+        _trigger.name = "request"
+
+
+def start_warmup():
+    """Run warm_up() on a background thread when ANALYZER_WARMUP is set; returns whether it started"""
+    if not ANALYZER_WARMUP or _warmup["state"] != "off":
+        return False
+    _warmup["state"] = "queued"
+    threading.Thread(target=warm_up, name="analyzer-warmup", daemon=True).start()
+    return True
+
+
+def report() -> dict:
+    """Import timings and warm-up state for the diagnostics endpoint"""
+    with _lock:
+        return {
+            "analyzersLoaded": sorted(_analyzers),
+            "imports": {name: dict(timing) for name, timing in _imports.items()},
+            "warmup": {"enabled": ANALYZER_WARMUP, **_warmup},
+        }
+
+
+def _prime():
+    """One-time initialization that would otherwise land on the first request"""
+    fitz = load_library("fitz")
+    document = fitz.open()
+    document.new_page()
+    document.tobytes()
+    document.close()
+    load_library("pikepdf").new().close()
+    numpy = load_library("numpy")
+    numpy.fft.rfft2(numpy.zeros((8, 8)))
+    load_library("analyzers.pdf_signatures").get_trust_store()
@@ -1,44 +1,73 @@
-import zipfile
+import base64
 import xml.etree.ElementTree as ET
-from cryptography import x509
-from cryptography.hazmat.backends import default_backend
-import PyPDF2  # For PDF handling
+from datetime import datetime, timezone
+from analyzers.deadline import out_of_time
+from analyzers.document_context import use_context
+from analyzers.pdf_signatures import (
+    signature_fields, verify_signatures, get_trust_store, load_certificate, validate_chain
+)
+from analyzers.executor import get_executor
+
+XMLDSIG_NS = {
+    'ds': 'http://www.w3.org/2000/09/xmldsig#',
+    'mdssi': 'http://schemas.openxmlformats.org/package/2006/digital-signature',
+}
 
 class SignatureAnalyzer:
-    async def analyze(self, file_path: str, file_info: dict):
+    name = "signature"
+
+    async def analyze(self, file_path: str, file_info: dict, context=None):
+        """Run signature analysis without blocking the event loop"""
+        return await get_executor().run(self, "analyze_sync", file_path, file_info, context=context)
+
+    def analyze_sync(self, file_path: str, file_info: dict, context=None):
         """Perform digital signature analysis for PDF and DOCX"""
+        with use_context(context, file_path, file_info) as context:
+            return self._analyze(file_info, context)
+
+    def _analyze(self, file_info: dict, context):
+        """Dispatch signature analysis on the shared document context"""
         file_type = file_info["type"]
         
         if file_type == "application/pdf":
             try:
-                with open(file_path, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    signatures = reader.embedded_signatures  # Detect embedded signatures
-                    
-                    if not signatures:
-                        return {
-                            "hasDigitalSignature": False,
-                            "isValid": False,
-                            "signerName": "No signature found",
-                            "signedDate": "",
-                            "certificate": "No digital signature present"
-                        }
-                    
-                    # Process the first signature (expand for multiple if needed)
-                    sig = signatures
-                    cert_data = sig.signer_info['cert']
-                    cert = x509.load_der_x509_certificate(cert_data, default_backend())
-                    
-                    # Basic validity check (e.g., not expired; add more as needed)
-                    is_valid = True  # Placeholder; implement cert chain verification
-                    
+                with context.open("pikepdf") as pdf:
+                    fields = signature_fields(pdf)
+                
+                if not fields:
                     return {
-                        "hasDigitalSignature": True,
-                        "isValid": is_valid,
-                        "signerName": cert.subject.rfc4514_string() or "Unknown",
-                        "signedDate": sig.signer_info.get('signing_time', "").isoformat(),
-                        "certificate": "Valid certificate found" if is_valid else "Invalid certificate"
+                        "hasDigitalSignature": False,
+                        "isValid": False,
+                        "signerName": "No signature found",
+                        "signedDate": "",
+                        "certificate": "No digital signature present"
                     }
+                
+                # Every signature field is checked against the bytes it covers and the trust store
+                signatures = verify_signatures(context.file_path, fields, lambda: out_of_time(context))
+                complete = len(signatures) == len(fields)
+                failed = next((signature for signature in signatures if not signature["isValid"]), None)
+                is_valid = complete and failed is None
+                first = signatures[0]
+                if failed:
+                    certificate = f"{failed['field'] or 'Signature'}: {failed['errors'][0]}"
+                elif not complete:
+                    certificate = f"Only {len(signatures)} of {len(fields)} signature(s) verified before the deadline"
+                else:
+                    certificate = f"{len(signatures)} signature(s) verified against the trust store"
+                result = {
+                    "hasDigitalSignature": True,
+                    "isValid": is_valid,
+                    "signerName": first["signerName"],
+                    "signedDate": first["signedDate"],
+                    "certificate": certificate,
+                    "signatures": signatures,
+                    "trustStore": get_trust_store().info(),
+                }
+                if not complete:
+                    result["status"] = "partial"
+                    result["coverage"] = {"signaturesVerified": len(signatures), "totalSignatures": len(fields)}
+                return result
             except Exception as e:
                 return {
                     "hasDigitalSignature": False,
@@ -50,39 +79,9 @@ class SignatureAnalyzer:
         
         elif file_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"]:
             try:
-                with zipfile.ZipFile(file_path, 'r') as docx_zip:
-                    # Check for signature directory
-                    if any('._xmlsignatures/' in name for name in docx_zip.namelist()):
-                        sig_files = [name for name in docx_zip.namelist() if name.startswith('._xmlsignatures/')]
-                        if not sig_files:
-                            raise ValueError("No signature data found")
-                        
-                        # Parse first signature XML
-                        with docx_zip.open(sig_files) as sig_file:
-                            tree = ET.parse(sig_file)
-                            root = tree.getroot()
-                            
-                            # Extract basic info (namespaces may vary; adjust as needed)
-                            ns = {'ds': 'http://www.w3.org/2000/09/xmldsig#'}
-                            signer_name = root.findtext('.//ds:X509SubjectName', namespaces=ns) or "Unknown"
-                            signed_date = root.findtext('.//ds:SigningTime', namespaces=ns) or ""
-                            
-                            # Basic certificate check
-                            cert_data = root.findtext('.//ds:X509Certificate', namespaces=ns)
-                            if cert_data:
-                                cert = x509.load_der_x509_certificate(cert_data.encode(), default_backend())
-                                is_valid = True  # Add real validation (e.g., check expiry, chain)
-                            else:
-                                is_valid = False
-                            
-                            return {
-                                "hasDigitalSignature": True,
-                                "isValid": is_valid,
-                                "signerName": signer_name,
-                                "signedDate": signed_date,
-                                "certificate": "Certificate details extracted" if is_valid else "Invalid or missing certificate"
-                            }
-                    else:
+                with context.open("ooxml") as package:
+                    sig_files = package.signature_parts()
+                    if not sig_files:
                         return {
                             "hasDigitalSignature": False,
                             "isValid": False,
@@ -90,6 +89,27 @@ class SignatureAnalyzer:
                             "signedDate": "",
                             "certificate": "No digital signature present in DOCX"
                         }
+                    signatures = [_check_xml_signature(name, package.read(name)) for name in sig_files]
+
+                failed = next((signature for signature in signatures if signature["isValid"] is False), None)
+                first = signatures[0]
+                result = {
+                    "hasDigitalSignature": True,
+                    # The XML-DSig digests are not recomputed, so a signature is never reported valid
+                    "isValid": False if failed else None,
+                    "signerName": first["signerName"],
+                    "signedDate": first["signedDate"],
+                    "certificate": (
+                        f"{failed['part']}: {failed['errors'][0]}" if failed
+                        else f"{len(signatures)} signature certificate(s) chain to the trust store; "
+                             "signed content was not verified"
+                    ),
+                    "signatures": signatures,
+                    "trustStore": get_trust_store().info(),
+                }
+                if not failed:
+                    result["status"] = "unverified"
+                return result
             except Exception as e:
                 return {
                     "hasDigitalSignature": False,
@@ -106,3 +126,82 @@ class SignatureAnalyzer:
                 "signedDate": "",
                 "certificate": "File type does not support digital signatures"
             }
+
+
+def _check_xml_signature(part: str, xml: bytes) -> dict:
+    """Certificate checks for one OOXML signature part.
+
+    The signer certificate's chain and current validity are checked with the
+    same code as PDF signatures. The XML-DSig reference
+    digests and signature value are not verified (that needs C14N 1.0), so a
+    signature that passes is reported with isValid None and status
+    "unverified", never as valid; any certificate problem makes it invalid.
+    """
+    root = ET.fromstring(xml)
+    signer_name = root.findtext('.//ds:X509SubjectName', namespaces=XMLDSIG_NS) or "Unknown"
+    # Office stores the claimed signing time in a package-signature property
+    signed_date = (root.findtext('.//mdssi:SignatureTime/mdssi:Value', namespaces=XMLDSIG_NS) or "").strip()
+    result = {
+        "part": part,
+        "signerName": signer_name,
+        "signedDate": signed_date,
+        "certificateValid": False,
+        "trusted": False,
+        "chain": [],
+        "isValid": False,
+        "status": "unverified",
+        "errors": [],
+        "warnings": [],
+    }
+    errors, warnings = result["errors"], result["warnings"]
+
+    try:
+        certificates = [
+            load_certificate(base64.b64decode("".join(element.text.split())))
+            for element in root.iterfind('.//ds:X509Certificate', XMLDSIG_NS) if element.text
+        ]
+    except ValueError as e:
+        errors.append(f"Unreadable certificate: {e}")
+        return result
+    if not certificates:
+        errors.append("Signer certificate not included in the signature")
+        return result
+    # Office writes the signer's certificate first
+    signer_cert = certificates[0]
+    if signer_name == "Unknown":
+        result["signerName"] = signer_cert.subject.rfc4514_string() or "Unknown"
+
+    chain = validate_chain(signer_cert, certificates[1:])
+    result["chain"] = chain["chain"]
+    result["trusted"] = chain["trusted"]
+    if chain["error"]:
+        errors.append(chain["error"])
+
+    # SignatureTime is whatever the signer wrote, so validity is checked as of now
+    at = datetime.now(timezone.utc)
+    expired = [subject for subject, (start, end) in zip(chain["chain"], chain["validity"]) if not start <= at <= end]
+    result["certificateValid"] = not expired
+    if expired:
+        errors.append(f"Certificate not valid at the current time: {expired[0]}")
+    claimed_time = _parse_signature_time(signed_date)
+    if claimed_time is not None:
+        warnings.append(
+            f"Signer-claimed signing time {claimed_time.isoformat()} is not backed by a timestamp; "
+            "certificate validity checked against the current time"
+        )
+    warnings.append("XML-DSig digests and signature value were not verified")
+
+    if errors:
+        result.pop("status")
+    else:
+        result["isValid"] = None
+    return result
+
+
+def _parse_signature_time(value: str):
+    """Office SignatureTime (ISO 8601, usually "...Z") as an aware datetime, or None"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
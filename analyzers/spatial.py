@@ -0,0 +1,55 @@
+# spatial.py
+from math import floor
+
+DEFAULT_CELL = 64.0  # points; close to a line of text wide, a few lines high
+
+
+class GridIndex:
+    """Uniform grid over page space for rectangle overlap queries.
+
+    Each rectangle is filed under every cell it touches, so a query only
+    looks at items near it instead of every item on the page. Rectangles are
+    (x0, y0, x1, y1) tuples in page coordinates; only the part inside bounds
+    is indexed, so a rectangle placed far off the page cannot blow up the grid.
+    """
+
+    def __init__(self, bounds, cell: float = DEFAULT_CELL):
+        self.bounds = bounds
+        self.cell = cell
+        self.items = []  # (rect, value)
+        self._cells = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def insert(self, rect, value):
+        index = len(self.items)
+        self.items.append((rect, value))
+        for key in self._keys(rect):
+            self._cells.setdefault(key, []).append(index)
+
+    def query(self, rect) -> list:
+        """(rect, value) of every item overlapping rect, in insertion order"""
+        found = set()
+        for key in self._keys(rect):
+            found.update(self._cells.get(key, ()))
+        items = self.items
+        return [items[i] for i in sorted(found) if overlap_area(items[i][0], rect) > 0]
+
+    def _keys(self, rect):
+        cell = self.cell
+        bx0, by0, bx1, by1 = self.bounds
+        x0, y0, x1, y1 = max(rect[0], bx0), max(rect[1], by0), min(rect[2], bx1), min(rect[3], by1)
+        if x0 > x1 or y0 > y1:
+            return
+        for cx in range(floor(x0 / cell), floor(x1 / cell) + 1):
+            for cy in range(floor(y0 / cell), floor(y1 / cell) + 1):
+                yield cx, cy
+
+
+def area(rect) -> float:
+    return max(0.0, rect[2] - rect[0]) * max(0.0, rect[3] - rect[1])
+
+
+def overlap_area(a, b) -> float:
+    return max(0.0, min(a[2], b[2]) - max(a[0], b[0])) * max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
@@ -1,24 +1,103 @@
-import PyPDF2
-import fitz  # PyMuPDF - more reliable
-import docx  # python-docx for DOCX files
-import re
 import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from analyzers.deadline import out_of_time
+from analyzers.document_context import use_context
+from analyzers.executor import get_executor
+from analyzers.limits import LimitExceeded, mark_limit_exceeded
+from analyzers.log import get_logger
+from analyzers.metrics import BACKEND_FALLBACKS, PAGES, PAGE_RATE
+from analyzers.text_layer import TextLayerStatistics, read_page
+from analyzers.text_stats import TextStatistics
+
+# Documents with at least this many pages are split across the process pool
+SHARD_MIN_PAGES = int(os.getenv("TEXT_SHARD_MIN_PAGES", "64"))
+SHARDS_PER_WORKER = 2
+# Shorter texts are too generic for near-duplicate matching to mean anything
+MIN_SIGNATURE_SHINGLES = 20
+# DOCX paragraphs are fed to the statistics in batches of about this many characters
+DOCX_TEXT_CHUNK = 64 * 1024
+# Confidence lost per page with text-layer outliers or hidden text, and the floor it stops at
+TEXT_LAYER_PENALTY = 5
+HIDDEN_TEXT_PENALTY = 10
+TEXT_LAYER_MIN_CONFIDENCE = 50
+
+# Default page sampling (0 = off); requests may override with file_info["options"]["textSample"]
+DEFAULT_SAMPLING = {
+    "first": int(os.getenv("TEXT_SAMPLE_FIRST", "0")),
+    "last": int(os.getenv("TEXT_SAMPLE_LAST", "0")),
+    "stride": int(os.getenv("TEXT_SAMPLE_STRIDE", "0")),
+}
+
+log = get_logger("text")
+
+
+def parse_sampling(spec: str) -> dict:
+    """Parse "first:5,last:5,stride:20" into a sampling dict; raises ValueError on bad input"""
+    sampling = {"first": 0, "last": 0, "stride": 0}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        key, _, value = part.partition(":")
+        if key not in sampling or not value.isdigit():
+            raise ValueError(f"Invalid sampling spec: {part}")
+        sampling[key] = int(value)
+    return sampling
+
+
+def select_pages(page_count: int, sampling: dict) -> list:
+    """Page indices to read: all of them, or the first N, last N and every stride-th page"""
+    if not sampling or not any(sampling.values()):
+        return list(range(page_count))
+    pages = set(range(min(sampling.get("first", 0), page_count)))
+    pages.update(range(max(0, page_count - sampling.get("last", 0)), page_count))
+    stride = sampling.get("stride", 0)
+    if stride:
+        pages.update(range(0, page_count, stride))
+    return sorted(pages)
+
+
+def extract_page_stats(file_path: str, page_numbers: list) -> tuple:
+    """Process pool entry point: open a private fitz document and summarize the given pages.
+
+    Returns (stats, text layer, characters extracted); the caller charges the
+    characters to the document's decoded-data budget.
+    """
+    import fitz
+    stats = TextStatistics()
+    layer = TextLayerStatistics()
+    extracted = 0
+    with fitz.open(file_path) as pdf_doc:
+        for page_num in page_numbers:
+            text, layout, paint_log = read_page(pdf_doc[page_num])
+            extracted += len(text)
+            stats.add_page(page_num + 1, text)
+            layer.add_page(page_num + 1, layout, paint_log)
+    return stats, layer, extracted
+
 
 class TextAnalyzer:
-    async def analyze(self, file_path: str, file_info: dict):
+    name = "text"
+
+    async def analyze(self, file_path: str, file_info: dict, context=None):
+        """Run text analysis without blocking the event loop"""
+        return await get_executor().run(self, "analyze_sync", file_path, file_info, context=context)
+
+    def analyze_sync(self, file_path: str, file_info: dict, context=None):
         """Perform REAL text analysis for forgery detection"""
         try:
             file_type = file_info["type"]
             
-            if file_type == "application/pdf":
-                return await self._analyze_pdf_text(file_path)
-            elif file_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"]:
-                return await self._analyze_docx_text(file_path)
-            else:
-                return await self._basic_analysis(file_info)
+            with use_context(context, file_path, file_info) as context:
+                if file_type == "application/pdf":
+                    sampling = file_info.get("options", {}).get("textSample") or DEFAULT_SAMPLING
+                    return self._analyze_pdf_text(file_path, context, sampling)
+                elif file_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"]:
+                    return self._analyze_docx_text(file_path, context)
+                else:
+                    return self._basic_analysis(file_info)
                 
         except Exception as e:
-            print(f"Text analysis error: {e}")
+            log.error("text.failed", f"Text analysis error: {e}", file=file_info.get("filename"))
             return {
                 "totalWords": 0,
                 "suspiciousWords": 0,
@@ -26,99 +105,202 @@ class TextAnalyzer:
                 "flags": [f"Analysis failed: {str(e)}"]
             }
     
-    async def _analyze_pdf_text(self, file_path: str):
+    def _analyze_pdf_text(self, file_path: str, context, sampling: dict = None):
         """Extract text using multiple methods for maximum coverage"""
-        extracted_text = ""
+        stats = TextStatistics()
+        layer = None  # font and baseline consistency; PyMuPDF only
+        page_count = 0
+        pages = []
+        pages_read = 0
         extraction_method = "none"
+        started = time.perf_counter()
         
         # Method 1: Try PyMuPDF first (more reliable)
         try:
-            pdf_doc = fitz.open(file_path)
-            print(f"📄 PDF has {len(pdf_doc)} pages")
-            
-            for page_num in range(len(pdf_doc)):
-                page = pdf_doc[page_num]
-                page_text = page.get_text()
-                extracted_text += page_text + " "
-                print(f"Page {page_num + 1}: {len(page_text)} characters")
+            with context.open("fitz") as pdf_doc:
+                page_count = len(pdf_doc)
+                pages = select_pages(page_count, sampling)
+                log.debug("text.pages", f"📄 PDF has {page_count} pages, reading {len(pages)}")
+                
+                sharded = self._extract_sharded(file_path, pages, context)
+                if sharded is not None:
+                    stats, layer, pages_read = sharded
+                else:
+                    # Each page is extracted once, as spans, summarized and dropped before the next is read
+                    layer = TextLayerStatistics()
+                    for page_num in pages:
+                        if out_of_time(context):
+                            break
+                        text, layout, paint_log = read_page(pdf_doc[page_num])
+                        if not context.limits.charge(len(text), "page text"):
+                            break
+                        stats.add_page(page_num + 1, text)
+                        layer.add_page(page_num + 1, layout, paint_log)
+                        pages_read += 1
             
-            pdf_doc.close()
-            print(f"🔍 PyMuPDF extracted: {len(extracted_text)} characters")
             extraction_method = "pymupdf_success"
             
         except Exception as e:
-            print(f"PyMuPDF failed: {e}")
+            log.warning("text.fallback", f"PyMuPDF failed, falling back to PyPDF2: {e}")
+            BACKEND_FALLBACKS.inc(analyzer="text", source="pymupdf", fallback="pypdf2")
             
-            # Method 2: Fallback to PyPDF2
+            # Method 2: Fallback to PyPDF2, starting over so no page is counted twice
+            stats = TextStatistics()
+            layer = None
+            pages_read = 0
             try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    print(f"📄 PDF has {len(pdf_reader.pages)} pages")
-                    
-                    for page_num, page in enumerate(pdf_reader.pages):
-                        page_text = page.extract_text()
-                        extracted_text += page_text + " "
-                        print(f"PyPDF2 Page {page_num + 1}: {len(page_text)} characters")
+                with context.open("pypdf2") as pdf_reader:
+                    page_count = len(pdf_reader.pages)
+                    pages = select_pages(page_count, sampling)
+                    log.debug("text.pages", f"📄 PDF has {page_count} pages, reading {len(pages)}")
+                    for page_num in pages:
+                        if out_of_time(context):
+                            break
+                        text = pdf_reader.pages[page_num].extract_text()
+                        if not context.limits.charge(len(text), "page text"):
+                            break
+                        stats.add_page(page_num + 1, text)
+                        pages_read += 1
                 
-                print(f"🔍 PyPDF2 extracted: {len(extracted_text)} characters")
                 extraction_method = "pypdf2_success"
                 
             except Exception as e:
-                print(f"PyPDF2 also failed: {e}")
+                log.warning("text.failed", f"PyPDF2 also failed: {e}")
                 extraction_method = "extraction_failed"
         
-        return self._process_extracted_text(extracted_text, "PDF", extraction_method)
+        if pages_read:
+            elapsed = time.perf_counter() - started
+            PAGES.inc(pages_read, analyzer="text")
+            PAGE_RATE.observe(pages_read / max(elapsed, 1e-6), analyzer="text")
+        log.debug("text.extracted", f"🔍 Extracted {stats.word_count} words ({extraction_method})")
+        result = self._process_extracted_text(stats, "PDF", extraction_method)
+        if layer is not None and layer.spans:
+            self._add_text_layer(result, layer)
+        if len(pages) < page_count:
+            result["sampling"] = {"pagesAnalyzed": len(pages), "totalPages": page_count}
+        if context.limits.exceeded:
+            mark_limit_exceeded(result, context.limits.exceeded)
+            result["coverage"] = {"pagesAnalyzed": pages_read, "pagesRequested": len(pages)}
+        elif pages_read < len(pages) and extraction_method != "extraction_failed":
+            # Out of time: the statistics cover the pages read so far
+            result["status"] = "partial"
+            result["coverage"] = {"pagesAnalyzed": pages_read, "pagesRequested": len(pages)}
+        return result
+
+    def _add_text_layer(self, result: dict, layer: TextLayerStatistics):
+        """Report text-layer consistency; odd spans and hidden text cost confidence"""
+        summary = layer.summary()
+        result["textLayer"] = summary
+        penalty = 0
+        if summary["outlierCount"]:
+            pages = summary["outlierPages"]
+            result["flags"].append(
+                f"Text in a different font, size, colour or baseline from its row on {len(pages)} page(s)"
+            )
+            penalty += TEXT_LAYER_PENALTY * len(pages)
+        hidden = summary["hiddenText"]
+        if hidden["count"]:
+            result["flags"].append(
+                f"Text covered by shapes or images, invisible or off the page on {len(hidden['pages'])} page(s)"
+            )
+            penalty += HIDDEN_TEXT_PENALTY * len(hidden["pages"])
+        if penalty:
+            result["confidence"] = max(TEXT_LAYER_MIN_CONFIDENCE, result["confidence"] - penalty)
+
+    def _extract_sharded(self, file_path: str, pages: list, context=None):
+        """Summarize page ranges in parallel worker processes: (stats, text layer, pages read), or
+        None when not worth it or unavailable. Shards still running at the deadline are dropped,
+        and so is the first shard whose text does not fit the decoded-data budget, with the rest."""
+        executor = get_executor()
+        pool = executor.process_pool()
+        if pool is None or len(pages) < SHARD_MIN_PAGES:
+            return None
+        shard_count = min(len(pages), executor.process_workers * SHARDS_PER_WORKER)
+        shard_size = -(-len(pages) // shard_count)
+        shards = [pages[i:i + shard_size] for i in range(0, len(pages), shard_size)]
+        try:
+            futures = [pool.submit(extract_page_stats, file_path, shard) for shard in shards]
+            # Merging in submission order keeps per-page records in page order
+            stats = TextStatistics()
+            layer = TextLayerStatistics()
+            pages_read = 0
+            deadline = getattr(context, "deadline", None)
+            for shard, future in zip(shards, futures):
+                try:
+                    shard_stats, shard_layer, extracted = future.result(
+                        timeout=deadline.remaining() if deadline else None
+                    )
+                except FutureTimeout:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                if context is not None and not context.limits.charge(extracted, "page text"):
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                stats.merge(shard_stats)
+                layer.merge(shard_layer)
+                pages_read += len(shard)
+            return stats, layer, pages_read
+        except Exception as e:
+            log.warning("text.shards_failed", f"Sharded extraction failed, reading pages serially: {e}")
+            return None
     
-    async def _analyze_docx_text(self, file_path: str):
-        """Extract text from DOCX files using python-docx"""
-        extracted_text = ""
+    def _analyze_docx_text(self, file_path: str, context):
+        """Extract text from DOCX files by streaming word/document.xml"""
+        stats = TextStatistics()
         extraction_method = "none"
+        stopped_early = False
+        limit = None
         
         try:
-            print(f"📝 Opening DOCX file: {file_path}")
-            doc = docx.Document(file_path)
-            
-            # Extract text from all paragraphs
-            paragraphs = []
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    paragraphs.append(para.text)
-            
-            extracted_text = " ".join(paragraphs)
-            
-            # Also extract text from tables
-            table_text = []
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            table_text.append(cell.text)
-            
-            if table_text:
-                extracted_text += " " + " ".join(table_text)
+            log.debug("text.docx", f"📝 Opening DOCX file: {file_path}")
+            with context.open("ooxml") as package:
+                # Body and table-cell paragraphs in document order; batching keeps
+                # per-call overhead down when a table has hundreds of thousands of cells
+                batch, size = [], 0
+                for text in package.iter_paragraphs():
+                    batch.append(text)
+                    size += len(text)
+                    if size >= DOCX_TEXT_CHUNK:
+                        if not context.limits.charge(size, "document text"):
+                            limit = context.limits.exceeded
+                            break
+                        stats.add_text("\n".join(batch))
+                        batch, size = [], 0
+                        if out_of_time(context):
+                            stopped_early = True
+                            break
+                else:
+                    stats.add_text("\n".join(batch))
             
             extraction_method = "docx_success"
-            print(f"📊 DOCX extracted: {len(extracted_text)} characters")
+            log.debug("text.extracted", f"📊 DOCX extracted: {stats.word_count} words")
             
+        except LimitExceeded as e:
+            log.warning("text.limit_exceeded", f"DOCX text extraction stopped: {e}")
+            limit = e.info()
+            extraction_method = "docx_success"
         except Exception as e:
-            print(f"DOCX text extraction failed: {e}")
+            log.warning("text.failed", f"DOCX text extraction failed: {e}")
             extraction_method = "extraction_failed"
         
-        return self._process_extracted_text(extracted_text, "DOCX", extraction_method)
+        result = self._process_extracted_text(stats, "DOCX", extraction_method)
+        if limit:
+            mark_limit_exceeded(result, limit)
+            result["coverage"] = {"wordsAnalyzed": stats.word_count}
+        elif stopped_early:
+            # Out of time: the statistics cover the document up to this point
+            result["status"] = "partial"
+            result["coverage"] = {"wordsAnalyzed": stats.word_count}
+        return result
     
-    def _process_extracted_text(self, extracted_text: str, file_type: str, extraction_method: str):
+    def _process_extracted_text(self, stats: TextStatistics, file_type: str, extraction_method: str):
         """Process and analyze extracted text with proper confidence scoring"""
         
-        # Clean text
-        cleaned_text = re.sub(r'\s+', ' ', extracted_text.strip()) if extracted_text else ""
-        
-        if cleaned_text and len(cleaned_text) > 0:
+        if stats.has_text:
             # Text found - normal analysis
-            words = re.findall(r'\b\w+\b', cleaned_text)
-            word_count = len(words)
-            
-            print(f"📊 Final word count: {word_count}")
-            print(f"📝 Sample text: {cleaned_text[:200]}...")
+            word_count = stats.word_count
             
             # Analyze for suspicious patterns
             suspicious_count = 0
@@ -126,12 +308,12 @@ class TextAnalyzer:
             
             if word_count > 10:
                 # Check for repetition
-                if len(set(words)) < max(1, len(words) * 0.1):
+                if stats.distinct_words < max(1, word_count * 0.1):
                     suspicious_count += 5
                     flags.append("High text repetition detected")
                 
                 # Check word length distribution
-                avg_word_length = sum(len(word) for word in words) / len(words)
+                avg_word_length = stats.average_word_length
                 if avg_word_length < 2:
                     suspicious_count += 3
                     flags.append("Unusually short words detected")
@@ -142,12 +324,17 @@ class TextAnalyzer:
             # Calculate confidence
             confidence = max(70, min(100, 100 - (suspicious_count * 3)))
             
-            return {
+            result = {
                 "totalWords": word_count,
                 "suspiciousWords": suspicious_count,
                 "confidence": confidence,
-                "flags": flags if flags else [f"Text extraction successful from {file_type}"]
+                "flags": flags if flags else [f"Text extraction successful from {file_type}"],
+                "pageFlags": stats.page_flags()
             }
+            if stats.minhash.shingles >= MIN_SIGNATURE_SHINGLES:
+                # Raw bytes for the near-duplicate index; the pipeline removes it from the response
+                result["textSignature"] = stats.minhash.signature()
+            return result
             
         elif extraction_method == "extraction_failed":
             # Genuine extraction failure
@@ -160,7 +347,7 @@ class TextAnalyzer:
             
         else:
             # No text found but extraction succeeded - likely image-only document
-            print(f"📊 No text content found - appears to be image-only {file_type}")
+            log.debug("text.empty", f"📊 No text content found - appears to be image-only {file_type}")
             return {
                 "totalWords": 0,
                 "suspiciousWords": 0,
@@ -168,7 +355,7 @@ class TextAnalyzer:
                 "flags": [f"No text content detected - document appears to be image/diagram only"]
             }
     
-    async def _basic_analysis(self, file_info: dict):
+    def _basic_analysis(self, file_info: dict):
         """Basic analysis for non-PDF/DOCX files"""
         return {
             "totalWords": 0,
@@ -0,0 +1,332 @@
+# text_layer.py
+import os
+import re
+from array import array
+
+from analyzers.spatial import GridIndex, area, overlap_area
+
+# A span's style must cover less than this share of the document's characters to be reported
+RARE_STYLE_SHARE = 0.05
+MIN_DOCUMENT_CHARS = 200  # too little text to tell an odd span from the document's style
+MIN_SPAN_CHARS = 2
+SIZE_TOLERANCE = 0.6  # points
+BASELINE_TOLERANCE = 0.1  # share of the font size
+ROW_TOLERANCE = 0.5  # spans whose baselines are closer than this share of the size share a row
+SUPERSCRIPT = 1  # PyMuPDF span flag
+MAX_CANDIDATES = 5000  # deviating spans kept for the document-level check
+MAX_OUTLIERS = 50
+MAX_FONTS = 10
+MAX_SPAN_TEXT = 60
+
+# Hidden text: spans painted over, invisible or off the page, and text in the colour of what lies
+# under it. Needs a second, display-list pass per page (no decoding), so it can be turned off.
+OVERLAP_CHECK = os.getenv("TEXT_OVERLAP_CHECK", "1").lower() not in ("0", "false", "no")
+COVER_KINDS = {"fill-path": "shape", "fill-shade": "shape", "fill-image": "image", "fill-imgmask": "image"}
+TEXT_KINDS = ("fill-text", "stroke-text", "ignore-text")
+COVER_SHARE = 0.6  # share of a text box a later fill must cover to hide it
+MIN_TEXT_AREA = 1.0  # square points
+SAME_COLOR = 0x10  # every channel closer than this to the background's
+PAGE_WHITE = 0xFFFFFF
+MAX_HIDDEN = 50
+
+SUBSET_PREFIX = re.compile(r"^[A-Z]{6}\+")
+FAMILY_SUFFIX = re.compile(r"(PSMT|MT|PS)$")
+
+
+def font_family(font: str) -> str:
+    """"ABCDEF+TimesNewRomanPS-BoldMT" -> "TimesNewRoman": weight and slant are not a different font"""
+    name = SUBSET_PREFIX.sub("", font or "")
+    name = re.split(r"[-,]", name, 1)[0]
+    return FAMILY_SUFFIX.sub("", name) or name
+
+
+def read_page(page, overlaps: bool = OVERLAP_CHECK):
+    """(plain text, span dictionary, paint log) of a PyMuPDF page.
+
+    The text comes from a single extraction, joined the way page.get_text()
+    joins it, so word statistics are unchanged; image blocks are left out of
+    the dictionary. The paint log lists what the page draws, in painting order,
+    as (kind, rect, detail) in the same coordinates as the spans (None when
+    overlaps are not checked). The detail is the 0xRRGGBB colour of an opaque
+    vector fill and the text of a run drawn off the page, None otherwise.
+    """
+    import fitz
+    layout = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+    lines = []
+    for block in layout["blocks"]:
+        for line in block.get("lines", ()):
+            lines.append("".join(span["text"] for span in line["spans"]))
+    text = ("\n".join(lines) + "\n") if lines else ""
+    if not overlaps:
+        return text, layout, None
+
+    # All three are in unrotated page coordinates; a drawing's seqno is its index in the bbox log
+    bbox_log = page.get_bboxlog()
+    fills = {}
+    if any(kind == "fill-path" for kind, _ in bbox_log):
+        fills = {
+            drawing["seqno"]: _rgb(drawing["fill"]) for drawing in page.get_cdrawings()
+            if drawing.get("fill") is not None and drawing.get("fill_opacity", 1) >= 1
+        }
+    paint_log = [(kind, rect, fills.get(seq)) for seq, (kind, rect) in enumerate(bbox_log)]
+    bounds = (0.0, 0.0, layout["width"], layout["height"])
+    off_page = [i for i, (kind, rect, _) in enumerate(paint_log) if kind in TEXT_KINDS and overlap_area(rect, bounds) == 0]
+    if off_page:
+        # The extraction above stops at the mediabox; only pages that draw off it pay for a second one
+        unclipped = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_MEDIABOX_CLIP, clip=fitz.INFINITE_RECT())
+        outside = [
+            span for block in unclipped["blocks"] for line in block.get("lines", ()) for span in line["spans"]
+            if span["text"].strip() and overlap_area(span["bbox"], bounds) == 0
+        ]
+        for i in off_page:
+            kind, rect, _ = paint_log[i]
+            found = " ".join(
+                span["text"].strip() for span in outside
+                if overlap_area(span["bbox"], rect) >= 0.5 * area(span["bbox"])
+            )
+            paint_log[i] = (kind, rect, found[:MAX_SPAN_TEXT])
+    return text, layout, paint_log
+
+
+def _rgb(color) -> int:
+    """PyMuPDF (r, g, b) floats -> 0xRRGGBB"""
+    red, green, blue = (min(255, max(0, round(channel * 255))) for channel in tuple(color)[:3])
+    return red << 16 | green << 8 | blue
+
+
+def _same_color(a: int, b: int) -> bool:
+    return all(abs((a >> shift & 0xFF) - (b >> shift & 0xFF)) < SAME_COLOR for shift in (16, 8, 0))
+
+
+class TextLayerStatistics:
+    """Font, size, colour and baseline consistency of a PDF's text layer.
+
+    Each page's spans are loaded into per-page arrays and grouped into visual
+    rows by baseline (PyMuPDF splits a line wherever the baseline shifts, which
+    is exactly what an edit tends to do). Every span whose font family, size,
+    colour or baseline differs from the rest of its row is kept as a candidate;
+    only the per-style character counts outlive the page. At the end,
+    candidates whose style is rare in the whole document are reported: a word
+    pasted in from another font stands out, while headings (whole rows) and
+    bold or italic runs (same family) do not.
+
+    With a paint log, text boxes and the fills and images drawn on the page
+    go into a per-page GridIndex, so finding what lies over or under a span
+    costs a lookup of its neighbourhood rather than a scan of every shape.
+    """
+
+    def __init__(self):
+        self.spans = 0
+        self.characters = 0
+        self.style_chars = {}  # (family, size to 0.5pt, colour) -> characters
+        self.candidates = []  # (page, family, size, colour, bbox, text, reasons)
+        self.hidden = []  # hidden-text findings, up to MAX_HIDDEN
+        self.hidden_count = 0
+        self.hidden_pages = set()
+
+    def add_page(self, page_number: int, layout: dict, paint_log: list = None):
+        """Consume one page's get_text("dict") output and, optionally, its paint log"""
+        families = []  # font family names, indexed by the ids in the arrays below
+        family_ids = {}
+        family = array("I")
+        size = array("f")
+        color = array("I")
+        baseline = array("f")
+        chars = array("I")
+        flags = array("I")
+        spans = []
+
+        for block in layout["blocks"]:
+            for line in block.get("lines", ()):
+                # Rotated lines have no meaningful shared baseline
+                horizontal = tuple(line.get("dir", (1, 0))) == (1, 0)
+                for span in line["spans"]:
+                    text = span["text"]
+                    count = len(text.strip())
+                    if not count:
+                        continue
+                    name = font_family(span["font"])
+                    if name not in family_ids:
+                        family_ids[name] = len(families)
+                        families.append(name)
+                    family.append(family_ids[name])
+                    size.append(span["size"])
+                    color.append(span["color"] & 0xFFFFFF)
+                    baseline.append(span["origin"][1] if horizontal else -1.0)
+                    chars.append(count)
+                    flags.append(span["flags"])
+                    spans.append(span)
+                    key = (name, round(span["size"] * 2) / 2, span["color"] & 0xFFFFFF)
+                    self.style_chars[key] = self.style_chars.get(key, 0) + count
+
+        self.spans += len(spans)
+        self.characters += sum(chars)
+        order = sorted((i for i in range(len(spans)) if baseline[i] >= 0), key=baseline.__getitem__)
+        row = []
+        for i in order:
+            if row and baseline[i] - baseline[row[0]] > ROW_TOLERANCE * size[row[0]]:
+                self._check_row(page_number, row, families, family, size, color, baseline, chars, flags, spans)
+                row = []
+            row.append(i)
+        self._check_row(page_number, row, families, family, size, color, baseline, chars, flags, spans)
+        if paint_log is not None:
+            self._check_hidden(page_number, layout, spans, color, paint_log)
+
+    def _check_hidden(self, page_number, layout, spans, color, paint_log):
+        """Text painted over by a later fill or image, invisible text with no image to
+        explain it (OCR layers sit on a scan), text off the page, and text in the colour
+        of the fill drawn under it (or white on a bare page)"""
+        bounds = (0.0, 0.0, layout["width"], layout["height"])
+        covers = GridIndex(bounds)
+        runs = GridIndex(bounds)
+        for seq, (kind, rect, detail) in enumerate(paint_log):
+            if kind in COVER_KINDS and area(rect) > 0:
+                covers.insert(rect, (seq, COVER_KINDS[kind], detail))
+            elif kind in TEXT_KINDS:
+                runs.insert(rect, seq)
+        text_boxes = GridIndex(bounds)
+        for i, span in enumerate(spans):
+            text_boxes.insert(span["bbox"], i)
+
+        def text_at(rect):
+            return " ".join(
+                spans[i]["text"].strip() for box, i in text_boxes.query(rect)
+                if overlap_area(box, rect) >= 0.5 * area(box)
+            )[:MAX_SPAN_TEXT]
+
+        for seq, (kind, rect, detail) in enumerate(paint_log):
+            if kind not in TEXT_KINDS or area(rect) < MIN_TEXT_AREA:
+                continue
+            if overlap_area(rect, bounds) == 0:
+                # Off-page spans are not in the layout (or the grid); read_page extracted their text
+                self._add_hidden(page_number, "offPage", rect, detail or "")
+            elif kind == "ignore-text":
+                if not any(cover_kind == "image" for _, (_, cover_kind, _) in covers.query(rect)):
+                    self._add_hidden(page_number, "invisibleText", rect, text_at(rect))
+            else:
+                for cover, (cover_seq, cover_kind, _) in covers.query(rect):
+                    if cover_seq > seq and overlap_area(cover, rect) >= COVER_SHARE * area(rect):
+                        self._add_hidden(
+                            page_number, "coveredText", rect, text_at(rect),
+                            coveredBy={"kind": cover_kind, "bbox": [round(v, 1) for v in cover]},
+                        )
+                        break
+
+        for i, span in enumerate(spans):
+            rect = span["bbox"]
+            # The run that drew the span: only what was painted before it can be its background
+            drawn = max(((overlap_area(run, rect), seq) for run, seq in runs.query(rect)), default=(0, len(paint_log)))[1]
+            under = max(
+                (
+                    (cover_seq, cover_kind, fill) for cover, (cover_seq, cover_kind, fill) in covers.query(rect)
+                    if cover_seq < drawn and overlap_area(cover, rect) > 0.5 * area(rect)
+                ),
+                default=None,
+            )
+            if under is None:
+                if _same_color(color[i], PAGE_WHITE):
+                    self._add_hidden(page_number, "whiteText", rect, span["text"].strip()[:MAX_SPAN_TEXT])
+            # Images and shadings have no single colour to compare with
+            elif under[2] is not None and _same_color(color[i], under[2]):
+                self._add_hidden(
+                    page_number, "sameColorText", rect, span["text"].strip()[:MAX_SPAN_TEXT],
+                    background=f"#{under[2]:06x}",
+                )
+
+    def _add_hidden(self, page_number: int, kind: str, rect, text: str, **details):
+        self.hidden_count += 1
+        self.hidden_pages.add(page_number)
+        if len(self.hidden) < MAX_HIDDEN:
+            self.hidden.append({
+                "page": page_number, "kind": kind, "text": text,
+                "bbox": [round(v, 1) for v in rect], **details,
+            })
+
+    def _check_row(self, page_number, row, families, family, size, color, baseline, chars, flags, spans):
+        """Keep the spans of one row that differ from the row's dominant style"""
+        if len(row) < 2:
+            return
+
+        def dominant(values):
+            weights = {}
+            for i in row:
+                weights[values[i]] = weights.get(values[i], 0) + chars[i]
+            return max(weights, key=weights.get)
+
+        row_family, row_size, row_color, row_baseline = dominant(family), dominant(size), dominant(color), dominant(baseline)
+        for i in row:
+            if chars[i] < MIN_SPAN_CHARS or not any(c.isalnum() for c in spans[i]["text"]):
+                continue
+            raised = flags[i] & SUPERSCRIPT
+            reasons = []
+            if family[i] != row_family:
+                reasons.append("font")
+            if not raised and abs(size[i] - row_size) > SIZE_TOLERANCE:
+                reasons.append("size")
+            if color[i] != row_color:
+                reasons.append("color")
+            if not raised and abs(baseline[i] - row_baseline) > BASELINE_TOLERANCE * size[i]:
+                reasons.append("baseline")
+            if not reasons:
+                continue
+            if len(self.candidates) >= MAX_CANDIDATES:
+                return
+            self.candidates.append((
+                page_number, families[family[i]], size[i], color[i],
+                tuple(round(v, 1) for v in spans[i]["bbox"]), spans[i]["text"].strip()[:MAX_SPAN_TEXT], reasons,
+            ))
+
+    def merge(self, other: "TextLayerStatistics"):
+        """Append statistics from a later shard of the same document"""
+        self.spans += other.spans
+        self.characters += other.characters
+        for key, count in other.style_chars.items():
+            self.style_chars[key] = self.style_chars.get(key, 0) + count
+        self.candidates.extend(other.candidates[:MAX_CANDIDATES - len(self.candidates)])
+        self.hidden.extend(other.hidden[:MAX_HIDDEN - len(self.hidden)])
+        self.hidden_count += other.hidden_count
+        self.hidden_pages |= other.hidden_pages
+
+    def outliers(self) -> list:
+        """Candidate spans set in a style that is rare across the document"""
+        if self.characters < MIN_DOCUMENT_CHARS:
+            return []
+        found = []
+        for page, family, size, color, bbox, text, reasons in self.candidates:
+            share = self.style_chars.get((family, round(size * 2) / 2, color), 0) / self.characters
+            if share >= RARE_STYLE_SHARE:
+                continue
+            found.append({
+                "page": page,
+                "text": text,
+                "font": family,
+                "size": round(size, 1),
+                "color": f"#{color:06x}",
+                "bbox": list(bbox),
+                "reasons": reasons,
+                "styleShare": round(share, 4),
+            })
+        return found
+
+    def summary(self) -> dict:
+        """textLayer response section"""
+        families = {}
+        for (family, _, _), count in self.style_chars.items():
+            families[family] = families.get(family, 0) + count
+        total = max(1, self.characters)
+        outliers = self.outliers()
+        return {
+            "spansAnalyzed": self.spans,
+            "fonts": [
+                {"font": family, "share": round(count / total, 3)}
+                for family, count in sorted(families.items(), key=lambda item: -item[1])[:MAX_FONTS]
+            ],
+            "outlierCount": len(outliers),
+            "outlierPages": sorted({outlier["page"] for outlier in outliers}),
+            "outlierSpans": outliers[:MAX_OUTLIERS],
+            "hiddenText": {
+                "count": self.hidden_count,
+                "pages": sorted(self.hidden_pages),
+                "findings": self.hidden,
+            },
+        }
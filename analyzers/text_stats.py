@@ -0,0 +1,228 @@
+# text_stats.py
+import hashlib
+import math
+import re
+import zlib
+from array import array
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# Distinct words are counted exactly up to this many, then by HyperLogLog
+EXACT_DISTINCT_LIMIT = 50000
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+MAX_WORD_LENGTH_BUCKET = 32
+MAX_PAGE_FLAGS = 50
+
+# MinHash over word shingles, for near-duplicate lookups across documents
+MINHASH_PERMUTATIONS = 128
+SHINGLE_WORDS = 3
+MINHASH_BATCH = 4096  # shingles hashed per vectorized step
+# Fixed seeds: signatures must stay comparable with those already in the index
+_MINHASH_SEEDS = np.random.default_rng(20240611).integers(1, 2 ** 63, size=(2, MINHASH_PERMUTATIONS), dtype=np.uint64)
+_MINHASH_SEEDS[0] |= np.uint64(1)  # multiply-shift hashing needs odd multipliers
+
+
+class HyperLogLog:
+    """Approximate distinct counter in a fixed 2**precision byte array; mergeable across shards"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: str):
+        # Deterministic hash so sketches built in different processes can be merged
+        value = int.from_bytes(hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+class MinHash:
+    """MinHash signature of a text's word shingles, fed in order; mergeable across shards.
+
+    Each permutation is a multiply-shift hash of the shingle's CRC-32, so
+    signatures built in different processes agree. Matching positions between
+    two signatures estimate the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self):
+        self.values = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+        self.shingles = 0
+        self._head = []  # first words fed, so a merge can hash the shingles spanning a shard boundary
+        self._tail = []  # last words of the previous chunk, so shingles continue across pages
+
+    def update(self, words: list):
+        words = [word.lower() for word in words]
+        if len(self._head) < SHINGLE_WORDS - 1:
+            self._head = (self._head + words)[:SHINGLE_WORDS - 1]
+        self._add_shingles(self._tail + words)
+        self._tail = (self._tail + words)[-(SHINGLE_WORDS - 1):]
+
+    def merge(self, other: "MinHash"):
+        """Append a later shard, hashing the shingles that span the boundary, so the
+        signature matches one built from the whole text in a single pass"""
+        self._add_shingles(self._tail + other._head)
+        np.minimum(self.values, other.values, out=self.values)
+        self.shingles += other.shingles
+        if len(self._head) < SHINGLE_WORDS - 1:
+            self._head = (self._head + other._head)[:SHINGLE_WORDS - 1]
+        self._tail = (self._tail + other._tail)[-(SHINGLE_WORDS - 1):]
+
+    def signature(self) -> bytes:
+        return self.values.tobytes()
+
+    def _add_shingles(self, words: list):
+        hashes = [
+            zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8", "surrogatepass"))
+            for i in range(len(words) - SHINGLE_WORDS + 1)
+        ]
+        self.shingles += len(hashes)
+        multipliers, offsets = _MINHASH_SEEDS
+        for start in range(0, len(hashes), MINHASH_BATCH):
+            batch = np.array(hashes[start:start + MINHASH_BATCH], dtype=np.uint64)[:, None]
+            permuted = ((batch * multipliers + offsets) >> np.uint64(32)).astype(np.uint32)
+            np.minimum(self.values, permuted.min(axis=0), out=self.values)
+
+
+class TextStatistics:
+    """Running word statistics fed one page or paragraph at a time.
+
+    Nothing here keeps the document text: memory is bounded by the largest
+    chunk plus the distinct-word counter (capped, then a fixed-size sketch)
+    and one small record per page.
+    """
+
+    def __init__(self):
+        self.word_count = 0
+        self.has_text = False  # any non-whitespace character seen
+        self.length_total = 0
+        self.length_histogram = array("I", [0] * (MAX_WORD_LENGTH_BUCKET + 1))
+        self.minhash = MinHash()
+        self._distinct = set()
+        self._sketch = None
+        # Per-page counters, indexed like self.page_numbers
+        self.page_numbers = array("I")
+        self.page_words = array("I")
+        self.page_distinct = array("I")
+        self.page_length_total = array("I")
+
+    def add_page(self, page_number: int, text: str):
+        """Consume one page; pages are 1-based and fed in order"""
+        words = self._consume(text)
+        self.page_numbers.append(page_number)
+        self.page_words.append(len(words))
+        self.page_distinct.append(len(set(words)))
+        self.page_length_total.append(sum(len(word) for word in words))
+
+    def add_text(self, text: str):
+        """Consume a chunk that does not map to a page (DOCX paragraphs, table cells)"""
+        self._consume(text)
+
+    def merge(self, other: "TextStatistics"):
+        """Append statistics from a later shard of the same document"""
+        self.word_count += other.word_count
+        self.has_text = self.has_text or other.has_text
+        self.length_total += other.length_total
+        for bucket, count in enumerate(other.length_histogram):
+            self.length_histogram[bucket] += count
+        self.minhash.merge(other.minhash)
+        if other._sketch is not None:
+            self._to_sketch()
+            self._sketch.merge(other._sketch)
+        else:
+            self._add_distinct(other._distinct)
+        self.page_numbers.extend(other.page_numbers)
+        self.page_words.extend(other.page_words)
+        self.page_distinct.extend(other.page_distinct)
+        self.page_length_total.extend(other.page_length_total)
+
+    @property
+    def distinct_words(self) -> int:
+        if self._sketch is not None:
+            return self._sketch.estimate()
+        return len(self._distinct)
+
+    @property
+    def distinct_is_exact(self) -> bool:
+        return self._sketch is None
+
+    @property
+    def average_word_length(self) -> float:
+        return self.length_total / self.word_count if self.word_count else 0.0
+
+    def page_flags(self) -> list:
+        """Per-page anomalies: repetition, odd word lengths, blank pages between text pages"""
+        flags = []
+        numbers = self.page_numbers
+        for i, page in enumerate(numbers):
+            words = self.page_words[i]
+            if words > 10:
+                if self.page_distinct[i] < max(1, words * 0.1):
+                    flags.append({"page": page, "flag": "High text repetition"})
+                average = self.page_length_total[i] / words
+                if average < 2:
+                    flags.append({"page": page, "flag": "Unusually short words"})
+                elif average > 15:
+                    flags.append({"page": page, "flag": "Unusually long words"})
+            elif words == 0 and 0 < i < len(numbers) - 1 and self._has_text_neighbours(i):
+                flags.append({"page": page, "flag": "No text layer between text pages"})
+            if len(flags) >= MAX_PAGE_FLAGS:
+                break
+        return flags
+
+    def _has_text_neighbours(self, i: int) -> bool:
+        """Both physically adjacent pages were read (not skipped by sampling) and have text"""
+        page = self.page_numbers[i]
+        return (
+            self.page_numbers[i - 1] == page - 1 and self.page_numbers[i + 1] == page + 1
+            and self.page_words[i - 1] > 0 and self.page_words[i + 1] > 0
+        )
+
+    def _consume(self, text: str) -> list:
+        if not text:
+            return []
+        words = WORD_PATTERN.findall(text)
+        self.word_count += len(words)
+        if not self.has_text:
+            self.has_text = not text.isspace()
+        histogram = self.length_histogram
+        for word in words:
+            length = len(word)
+            self.length_total += length
+            histogram[min(length, MAX_WORD_LENGTH_BUCKET)] += 1
+        self._add_distinct(words)
+        self.minhash.update(words)
+        return words
+
+    def _add_distinct(self, words):
+        if self._sketch is not None:
+            for word in words:
+                self._sketch.add(word)
+            return
+        self._distinct.update(words)
+        if len(self._distinct) > EXACT_DISTINCT_LIMIT:
+            self._to_sketch()
+
+    def _to_sketch(self):
+        if self._sketch is None:
+            self._sketch = HyperLogLog()
+            for word in self._distinct:
+                self._sketch.add(word)
+            self._distinct = set()
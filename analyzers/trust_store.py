@@ -0,0 +1,26 @@
+# trust_store.py
+import hashlib
+import os
+
+# PEM bundle, or a directory of PEM/DER certificates, whose members are trusted as chain anchors
+TRUST_STORE_PATH = os.getenv("SIGNATURE_TRUST_STORE", "")
+CERTIFICATE_SUFFIXES = (".pem", ".crt", ".cer", ".der")
+
+
+def trust_store_files(path: str = TRUST_STORE_PATH) -> list:
+    """Certificate files making up the trust store, in a stable order"""
+    if not path:
+        return []
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(CERTIFICATE_SUFFIXES)]
+    return [path] if os.path.isfile(path) else []
+
+
+def trust_store_digest(path: str = TRUST_STORE_PATH) -> str:
+    """Hash of the trust store files' bytes; cheap enough for cache keys, no certificate parsing"""
+    digest = hashlib.sha256()
+    for file_path in trust_store_files(path):
+        with open(file_path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
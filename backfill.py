@@ -0,0 +1,95 @@
+# backfill.py
+# Bulk-load an archive of documents into the cross-document indexes: python backfill.py [--workers N] <file or directory> ...
+# Only image hashes and text signatures are computed (no forensics), spread over worker processes;
+# image rows go in large batches with the lookup indexes rebuilt once at the end.
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services.ingest import sniff_type, SNIFF_BYTES, DOCX_TYPE
+from services.image_index import get_image_index
+from services.text_index import get_text_index
+
+TEXT_BATCH = 1000  # documents per text index transaction
+
+
+def iter_files(paths: list):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if not name.startswith("."):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def hash_document(path: str):
+    """(path, sha256, image hashes, text signature) for one file; (path, sha256, None, None) when unsupported"""
+    from analyzers.image_analyzer import ImageAnalyzer
+    from analyzers.text_analyzer import TextAnalyzer
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        digest.update(head)
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    content_type = sniff_type(head, os.path.basename(path)) or ""
+    file_info = {"filename": os.path.basename(path), "type": content_type, "size": os.path.getsize(path)}
+    hashes, signature = None, None
+    try:
+        if content_type == "application/pdf" or content_type.startswith("image/"):
+            hashes = ImageAnalyzer().image_hashes(path, file_info)
+        if content_type in ("application/pdf", DOCX_TYPE):
+            signature = TextAnalyzer().analyze_sync(path, file_info).get("textSignature")
+    except Exception as e:
+        print(f"❌ {path}: {e}")
+    return path, digest.hexdigest(), hashes, signature
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load documents into the image and text indexes")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    started = time.time()
+    stats = {"documents": 0, "images": 0, "texts": 0}
+    text_index = get_text_index()
+    texts = []
+
+    def image_entries(results):
+        # Text signatures ride along and are flushed in their own batches
+        for path, sha256, hashes, signature in results:
+            if hashes is None and signature is None:
+                continue
+            stats["documents"] += 1
+            if stats["documents"] % 1000 == 0:
+                print(f"⚙️ {stats['documents']} documents, {stats['images']} images, {stats['texts']} texts")
+            if signature is not None:
+                stats["texts"] += 1
+                texts.append((sha256, os.path.basename(path), signature))
+                if len(texts) >= TEXT_BATCH:
+                    text_index.add_many(texts)
+                    texts.clear()
+            for entry in hashes or []:
+                stats["images"] += 1
+                yield (sha256, os.path.basename(path), entry["page"], entry["image"],
+                       int(entry["phash"], 16), int(entry["dhash"], 16))
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        added = get_image_index().bulk_load(image_entries(pool.map(hash_document, iter_files(args.paths), chunksize=8)))
+    text_index.add_many(texts)
+
+    print(
+        f"✅ Indexed {added} new images and {stats['texts']} texts from {stats['documents']} documents "
+        f"in {time.time() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
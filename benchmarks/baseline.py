@@ -0,0 +1,94 @@
+# baseline.py
+# Saved benchmark results and regression diffs against them.
+import json
+import os
+import platform
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "baselines", "baseline.json")
+# Relative change beyond which a metric counts as a regression (or improvement)
+THRESHOLD = 0.15
+# Timings this small, and memory moves this small, are noise; they are never reported
+MIN_SECONDS = 0.005
+MIN_MB = 2.0
+
+
+def host_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "system": platform.system(),
+    }
+
+
+def save(results: dict, path: str = DEFAULT_BASELINE):
+    """Write results as stable, sorted JSON so a changed baseline reads well in git diff"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load(path: str = DEFAULT_BASELINE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """{"analyzers.text-300p.pdf/text.medianSeconds": 0.41, ...} for every numeric metric"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD) -> list:
+    """Metrics that moved more than threshold: (metric, baseline, current, change, verdict).
+
+    Throughput (…PerSecond) is better when higher; everything else (seconds,
+    MB, errors) is better when lower.
+    """
+    current, previous = flatten(results.get("benchmarks", {})), flatten(baseline.get("benchmarks", {}))
+    rows = []
+    for metric in sorted(current.keys() | previous.keys()):
+        if metric not in current or metric not in previous:
+            rows.append((metric, previous.get(metric), current.get(metric), None, "new" if metric in current else "gone"))
+            continue
+        before, after = previous[metric], current[metric]
+        if before == after:
+            continue
+        change = (after - before) / before if before else float("inf")
+        if abs(change) < threshold:
+            continue
+        if metric.endswith("Seconds") and max(before, after) < MIN_SECONDS:
+            continue
+        if metric.endswith("Mb") and abs(after - before) < MIN_MB:
+            continue
+        worse = change < 0 if metric.endswith("PerSecond") else change > 0
+        rows.append((metric, before, after, change, "regression" if worse else "improvement"))
+    return rows
+
+
+def report(rows: list, results: dict, baseline: dict) -> int:
+    """Print the diff; returns the number of regressions"""
+    if results.get("host") != baseline.get("host"):
+        print(f"⚠️ Baseline was recorded on a different host: {baseline.get('host')}")
+    if not rows:
+        print("✅ No metric moved more than the threshold")
+        return 0
+    print(f"{'metric':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric, before, after, change, verdict in rows:
+        change_text = f"{change:+.0%}" if change is not None else ""
+        marker = {"regression": "❌", "improvement": "✅"}.get(verdict, "•")
+        print(f"{metric:<60} {_format(before):>10} {_format(after):>10} {change_text:>8} {marker} {verdict}")
+    return sum(1 for row in rows if row[4] == "regression")
+
+
+def _format(value) -> str:
+    return "-" if value is None else f"{value:.4g}"
@@ -0,0 +1,87 @@
+# bench_analyzers.py
+# Per-analyzer latency and peak RSS over the synthetic corpus: python -m benchmarks.bench_analyzers [repeat]
+# Each (document, analyzer) pair runs in a fresh process, so peak RSS belongs to that
+# analyzer alone and the first (cold) run includes its library imports. Every run parses
+# the document again through its own DocumentContext, as a request would.
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.corpus import build_corpus, DEFAULT_DIR
+
+ANALYZERS = ("metadata", "text", "image", "signature")
+REPEAT = 5
+
+
+def run_analyzer(analyzer: str, file_path: str, file_info: dict, context):
+    """One analyzer pass, the way services.pipeline calls it (minus the executor)"""
+    from analyzers.registry import get_analyzer
+
+    if analyzer == "metadata":
+        name = "pdf" if file_info["type"] == "application/pdf" else "docx"
+        return get_analyzer(name).extract_metadata_sync(file_path, context=context)
+    return get_analyzer(analyzer).analyze_sync(file_path, file_info, context=context)
+
+
+def measure(analyzer: str, file_path: str, file_type: str, repeat: int) -> dict:
+    """Process entry point: cold run, then `repeat` warm runs of one analyzer on one document"""
+    import resource
+
+    from analyzers.document_context import DocumentContext
+
+    file_info = {
+        "filename": os.path.basename(file_path),
+        "size": os.path.getsize(file_path),
+        "type": file_type,
+        "options": {},
+    }
+    start_rss = _current_rss_mb()
+    timings = []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        with DocumentContext(file_path, file_info) as context:
+            run_analyzer(analyzer, file_path, file_info, context)
+        timings.append(time.perf_counter() - started)
+    warm = timings[1:] or timings
+    return {
+        "coldSeconds": round(timings[0], 4),
+        "medianSeconds": round(statistics.median(warm), 4),
+        "minSeconds": round(min(warm), 4),
+        "peakRssMb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rssGrowthMb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - start_rss, 1),
+    }
+
+
+def _current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def run(corpus_dir: str = DEFAULT_DIR, repeat: int = REPEAT, scale: int = 1) -> dict:
+    """{"<document>/<analyzer>": timings} for every document and analyzer"""
+    manifest = build_corpus(corpus_dir, scale)
+    # Children inherit the environment; the signed documents chain to the corpus root
+    os.environ["SIGNATURE_TRUST_STORE"] = os.path.abspath(os.path.join(corpus_dir, manifest["trustStore"]))
+    # Analyzers log as they go; keep that out of the benchmark output
+    os.environ["LOG_LEVEL"] = "off"
+    results = {}
+    for doc in manifest["documents"]:
+        path = os.path.abspath(os.path.join(corpus_dir, doc["name"]))
+        for analyzer in ANALYZERS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(measure, analyzer, path, doc["type"], repeat).result()
+            key = f"{doc['name']}/{analyzer}"
+            results[key] = result
+            print(
+                f"{key:>28} {result['coldSeconds']:>8.3f}s cold {result['medianSeconds']:>8.3f}s median"
+                f" {result['peakRssMb']:>8.1f} MB peak {result['rssGrowthMb']:>+8.1f} MB",
+                flush=True,
+            )
+    return results
+
+
+if __name__ == "__main__":
+    run(repeat=int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT)
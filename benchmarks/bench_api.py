@@ -0,0 +1,102 @@
+# bench_api.py
+# End-to-end /api/analyze throughput through the ASGI app, in-process: python -m benchmarks.bench_api [requests]
+# Requests go through httpx's ASGI transport (the client FastAPI's TestClient uses),
+# so routing, multipart parsing, ingest and the pipeline are all measured, without a
+# socket. The result cache and deadline are off and the similarity indexes live in
+# a scratch directory, so every request is a full analysis.
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import build_corpus, DEFAULT_DIR
+
+CONCURRENCY = (1, 4, 16)
+REQUESTS = 48
+
+
+def _configure(scratch: str, trust_store: str):
+    """Environment for a self-contained app; must run before index is imported"""
+    os.environ.update({
+        "RESULT_CACHE_ENABLED": "0",
+        "IMAGE_INDEX_PATH": os.path.join(scratch, "image_index.sqlite3"),
+        "TEXT_INDEX_PATH": os.path.join(scratch, "text_index.sqlite3"),
+        "JOB_DIR": os.path.join(scratch, "jobs"),
+        "JOB_WORKERS": "0",
+        "ANALYSIS_DEADLINE": "0",
+        # One client driving 16 requests at once would be turned away; measure the pipeline itself
+        "ADMISSION_ENABLED": "0",
+        "SIGNATURE_TRUST_STORE": trust_store,
+        # The app logs every request; keep that out of the benchmark output
+        "LOG_LEVEL": "off",
+    })
+    # Building the corpus may already have imported (and configured) the logger
+    from analyzers.log import configure
+    configure("off")
+
+
+async def _drive(app, uploads: list, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(uploads[i % len(uploads)])
+
+    async def client_loop(client):
+        nonlocal errors
+        while not queue.empty():
+            name, content_type, body = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.post("/api/analyze", files={"file": (name, body, content_type)})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[client_loop(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requestsPerSecond": round(len(latencies) / elapsed, 3),
+        "p50Seconds": round(statistics.median(latencies), 4),
+        "p95Seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4),
+        "errors": errors,
+    }
+
+
+def run(corpus_dir: str = DEFAULT_DIR, requests: int = REQUESTS, scale: int = 1) -> dict:
+    """{"concurrency-<n>": throughput} over a round-robin of the corpus documents"""
+    manifest = build_corpus(corpus_dir, scale)
+    scratch = tempfile.mkdtemp(prefix="forgery-bench-")
+    _configure(scratch, os.path.abspath(os.path.join(corpus_dir, manifest["trustStore"])))
+
+    from index import app
+
+    uploads = []
+    for doc in manifest["documents"]:
+        with open(os.path.join(corpus_dir, doc["name"]), "rb") as f:
+            uploads.append((doc["name"], doc["type"], f.read()))
+
+    results = {}
+    for concurrency in CONCURRENCY:
+        result = asyncio.run(_drive(app, uploads, requests, concurrency))
+        results[f"concurrency-{concurrency}"] = result
+        print(
+            f"{'concurrency ' + str(concurrency):>16} {result['requestsPerSecond']:>8.2f} req/s"
+            f" {result['p50Seconds']:>8.3f}s p50 {result['p95Seconds']:>8.3f}s p95 {result['errors']:>4} errors",
+            flush=True,
+        )
+    results["peakRssMb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+if __name__ == "__main__":
+    run(requests=int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS)
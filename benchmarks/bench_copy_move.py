@@ -0,0 +1,60 @@
+# bench_copy_move.py
+# Copy-move detector runtime vs image size and block stride: python -m benchmarks.bench_copy_move [megapixels ...]
+# Each synthetic image has one cloned patch, so the table also shows whether it was found.
+# Images are analyzed at full size (no pixel budget) to show raw scaling; the last
+# column is the default-budget run the API actually does.
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from analyzers.copy_move import detect_copy_move, PIXEL_BUDGET
+
+SIZES = [0.5, 1, 2, 4, 8]  # megapixels
+STRIDES = [1, 2, 4]
+PATCH = 160
+
+
+def synthetic_image(megapixels: float, seed: int = 0):
+    """Smooth random texture plus sensor-like noise, with one patch copied elsewhere"""
+    rng = np.random.default_rng(seed)
+    height = int((megapixels * 1_000_000 * 3 / 4) ** 0.5)
+    width = int(height * 4 / 3)
+    coarse = Image.fromarray(rng.uniform(40, 215, (height // 24 + 1, width // 24 + 1)).astype(np.uint8))
+    pixels = np.asarray(coarse.resize((width, height), Image.BICUBIC), dtype=np.float32)
+    pixels = pixels + rng.normal(0, 6, pixels.shape)
+    source = (height // 5, width // 5)
+    target = (height // 2 + 37, width // 2 + 53)  # deliberately off every stride grid
+    pixels[target[0]:target[0] + PATCH, target[1]:target[1] + PATCH] = \
+        pixels[source[0]:source[0] + PATCH, source[1]:source[1] + PATCH]
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)), source
+
+
+def run(image, source, **kwargs):
+    start = time.perf_counter()
+    regions, info = detect_copy_move(image, **kwargs)
+    elapsed = time.perf_counter() - start
+    found = any(
+        abs(region["x"] - source[1]) < PATCH and abs(region["y"] - source[0]) < PATCH
+        for region in regions
+    )
+    return elapsed, found, info.get("blocks", 0)
+
+
+def main(sizes: list):
+    header = f"{'MP':>5} {'size':>11}" + "".join(f" {'stride ' + str(s):>17}" for s in STRIDES)
+    print(header + f" {'default budget':>17}")
+    for megapixels in sizes:
+        image, source = synthetic_image(megapixels)
+        row = f"{megapixels:>5} {f'{image.width}x{image.height}':>11}"
+        for stride in STRIDES:
+            elapsed, found, _ = run(image, source, pixel_budget=image.width * image.height, stride=stride)
+            row += f" {elapsed:>8.2f}s {'found' if found else 'missed':>7}"
+        elapsed, found, _ = run(image, source, pixel_budget=PIXEL_BUDGET)
+        row += f" {elapsed:>8.2f}s {'found' if found else 'missed':>7}"
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main([float(arg) for arg in sys.argv[1:]] or SIZES)
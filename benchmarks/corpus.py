@@ -0,0 +1,294 @@
+# corpus.py
+# Synthetic document corpus for the benchmarks: python -m benchmarks.corpus [out_dir] [--scale N]
+# Every document is generated from a fixed seed, so two runs of the same scale
+# produce the same workload. build_corpus() returns a manifest the benchmarks read.
+import datetime
+import io
+import json
+import os
+import random
+import re
+import sys
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+from analyzers.registry import load_library
+
+DEFAULT_DIR = os.path.join("benchmarks", "corpus")
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+WORDS = (
+    "invoice amount total paid balance due contract clause party agreement signature date account "
+    "payment schedule delivery terms company address reference number statement period tax rate"
+).split()
+
+
+def corpus_spec(scale: int = 1) -> list:
+    """(name, builder, kwargs) for every document; scale multiplies the sizes"""
+    return [
+        ("text-10p.pdf", text_pdf, {"pages": 10}),
+        ("text-300p.pdf", text_pdf, {"pages": 300 * scale}),
+        ("images-24.pdf", text_pdf, {"pages": 12, "images_per_page": 2 * scale}),
+        ("revisions-20.pdf", revised_pdf, {"pages": 5, "updates": 20 * scale}),
+        ("signed-3.pdf", signed_pdf, {"pages": 3, "signatures": 3}),
+        ("table-5k.docx", table_docx, {"rows": 5000 * scale, "cols": 6}),
+        ("table-50k.docx", table_docx, {"rows": 50000 * scale, "cols": 6}),
+    ]
+
+
+def build_corpus(out_dir: str = DEFAULT_DIR, scale: int = 1, force: bool = False) -> dict:
+    """Generate the corpus (reusing documents already on disk) and write manifest.json"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("scale") == scale and all(
+            os.path.exists(os.path.join(out_dir, doc["name"])) for doc in manifest["documents"]
+        ):
+            return manifest
+
+    trust_store = os.path.join(out_dir, "trust-root.pem")
+    documents = []
+    for name, builder, kwargs in corpus_spec(scale):
+        path = os.path.join(out_dir, name)
+        print(f"📄 Generating {name}", flush=True)
+        if builder is signed_pdf:
+            builder(path, trust_store=trust_store, **kwargs)
+        else:
+            builder(path, **kwargs)
+        documents.append({
+            "name": name,
+            "type": DOCX_TYPE if name.endswith(".docx") else "application/pdf",
+            "size": os.path.getsize(path),
+            "params": kwargs,
+        })
+
+    manifest = {"scale": scale, "trustStore": "trust-root.pem", "documents": documents}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(f"{rng.choice(WORDS)}{rng.randint(0, 999) if rng.random() < 0.2 else ''}" for _ in range(words))
+
+
+def _photo(rng: random.Random, width: int = 640, height: int = 480) -> bytes:
+    """JPEG with smooth structure and sensor-like noise, different for every call"""
+    noise = np.random.default_rng(rng.randrange(2 ** 32))
+    coarse = Image.fromarray(noise.uniform(30, 225, (height // 32 + 1, width // 32 + 1, 3)).astype(np.uint8))
+    pixels = np.asarray(coarse.resize((width, height), Image.BICUBIC), dtype=np.float32)
+    pixels = np.clip(pixels + noise.normal(0, 5, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=88)
+    return buffer.getvalue()
+
+
+def text_pdf(path: str, pages: int, images_per_page: int = 0, seed: int = 1):
+    """PDF of pages full of text lines, optionally with distinct JPEG photos on every page"""
+    fitz = load_library("fitz")
+    rng = random.Random(seed)
+    document = fitz.open()
+    for _ in range(pages):
+        page = document.new_page()
+        y = 60
+        for _ in range(36 if not images_per_page else 8):
+            page.insert_text((50, y), _sentence(rng), fontsize=9)
+            y += 18
+        for i in range(images_per_page):
+            top = 230 + i * 270
+            page.insert_image(fitz.Rect(60, top, 540, top + 250), stream=_photo(rng))
+    document.set_metadata({"author": "Benchmark", "creator": "benchmarks.corpus", "producer": "PyMuPDF"})
+    document.save(path, garbage=3, deflate=True)
+    document.close()
+
+
+def revised_pdf(path: str, pages: int, updates: int, seed: int = 2):
+    """Text PDF followed by incremental updates that each edit a page and the metadata"""
+    fitz = load_library("fitz")
+    text_pdf(path, pages, seed=seed)
+    rng = random.Random(seed)
+    for revision in range(1, updates + 1):
+        document = fitz.open(path)
+        page = document[rng.randrange(pages)]
+        page.insert_text((50, 760), f"Amended {revision}: {_sentence(rng, 6)}", fontsize=8)
+        document.set_metadata({**document.metadata, "author": f"Editor {revision % 3}"})
+        document.save(path, incremental=True, encryption=0)
+        document.close()
+
+
+def signed_pdf(path: str, pages: int, signatures: int, trust_store: str, seed: int = 3):
+    """Text PDF signed `signatures` times, each signature in its own incremental update.
+
+    Signer certificates chain to a generated root CA, written to trust_store as
+    PEM, so the signatures verify when SIGNATURE_TRUST_STORE points at it.
+    """
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.serialization import pkcs7
+
+    fitz = load_library("fitz")
+    text_pdf(path, pages, seed=seed)
+    document = fitz.open(path)
+    catalog_number = document.pdf_catalog()
+    catalog = document.xref_object(catalog_number, compressed=True)
+    next_number = document.xref_length()
+    document.close()
+
+    root_key = rsa.generate_private_key(65537, 2048)
+    root = _certificate("Benchmark Root CA", root_key, "Benchmark Root CA", root_key, ca=True)
+    with open(trust_store, "wb") as f:
+        f.write(root.public_bytes(serialization.Encoding.PEM))
+
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    placeholder = 8192
+    fields = []
+    for index in range(1, signatures + 1):
+        signer_key = rsa.generate_private_key(65537, 2048)
+        signer = _certificate(f"Signer {index}", signer_key, "Benchmark Root CA", root_key, ca=False)
+        field_number, value_number = next_number, next_number + 1
+        next_number += 2
+        fields.append(f"{field_number} 0 R")
+        previous_xref = int(re.findall(rb"startxref\s+(\d+)", bytes(data))[-1])
+
+        objects = {
+            catalog_number: catalog.rstrip()[:-2] + f"/AcroForm<</Fields[{' '.join(fields)}]/SigFlags 3>>>>",
+            field_number: f"<</FT/Sig/T(Signature{index})/V {value_number} 0 R/Type/Annot/Subtype/Widget/Rect[0 0 0 0]>>",
+            value_number: (
+                "<</Type/Sig/Filter/Adobe.PPKLite/SubFilter/adbe.pkcs7.detached"
+                f"/M(D:202601{index:02d}120000Z)/Reason(Approval {index})"
+                "/ByteRange[0000000000 0000000000 0000000000 0000000000]"
+                "/Contents<" + "0" * (2 * placeholder) + ">>>"
+            ),
+        }
+        offsets = {}
+        for number, body in objects.items():
+            if not data.endswith(b"\n"):
+                data += b"\n"
+            offsets[number] = len(data)
+            data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+        xref_offset = len(data)
+        data += b"xref\n"
+        for number in sorted(offsets):
+            data += f"{number} 1\n{offsets[number]:010d} 00000 n \n".encode()
+        data += (
+            f"trailer\n<</Size {next_number}/Root {catalog_number} 0 R/Prev {previous_xref}>>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        ).encode()
+
+        contents = data.index(b"/Contents<", offsets[value_number]) + len(b"/Contents")
+        contents_end = contents + 2 + 2 * placeholder
+        byte_range = f"[{0:010d} {contents:010d} {contents_end:010d} {len(data) - contents_end:010d}]".encode()
+        marker = data.index(b"[0000000000 0000000000 0000000000 0000000000]", offsets[value_number])
+        data[marker:marker + len(byte_range)] = byte_range
+        signed = bytes(data[:contents]) + bytes(data[contents_end:])
+        signature = (
+            pkcs7.PKCS7SignatureBuilder().set_data(signed).add_signer(signer, signer_key, hashes.SHA256())
+            .add_certificate(root)
+            .sign(serialization.Encoding.DER, [pkcs7.PKCS7Options.DetachedSignature, pkcs7.PKCS7Options.Binary])
+        ).hex().encode()
+        data[contents + 1:contents + 1 + len(signature)] = signature
+
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _certificate(subject: str, key, issuer: str, issuer_key, ca: bool):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.x509.oid import NameOID
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject)]))
+        .issuer_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, issuer)]))
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=3650))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .sign(issuer_key, hashes.SHA256())
+    )
+
+
+DOCX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+        '<Override PartName="/docProps/app.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+        'Target="docProps/core.xml"/>'
+        '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties" '
+        'Target="docProps/app.xml"/>'
+        '</Relationships>'
+    ),
+    "docProps/core.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        '<dc:title>Benchmark table</dc:title><dc:creator>Benchmark</dc:creator>'
+        '<cp:lastModifiedBy>Benchmark</cp:lastModifiedBy><cp:revision>2</cp:revision>'
+        '<dcterms:created xsi:type="dcterms:W3CDTF">2026-01-01T12:00:00Z</dcterms:created>'
+        '<dcterms:modified xsi:type="dcterms:W3CDTF">2026-01-02T12:00:00Z</dcterms:modified>'
+        '</cp:coreProperties>'
+    ),
+    "docProps/app.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+        '<Application>benchmarks.corpus</Application></Properties>'
+    ),
+}
+
+
+def table_docx(path: str, rows: int, cols: int, paragraphs: int = 200, seed: int = 4):
+    """DOCX with some body paragraphs and one rows x cols table, streamed straight into the zip"""
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, xml in DOCX_PARTS.items():
+            package.writestr(name, xml)
+        with package.open("word/document.xml", "w") as document:
+            document.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            )
+            for _ in range(paragraphs):
+                document.write(f"<w:p><w:r><w:t>{_sentence(rng)}</w:t></w:r></w:p>".encode())
+            document.write(b"<w:tbl><w:tblPr/><w:tblGrid>" + b"<w:gridCol/>" * cols + b"</w:tblGrid>")
+            for row in range(rows):
+                cells = "".join(
+                    f"<w:tc><w:p><w:r><w:t>{rng.choice(WORDS)} {row}.{col}</w:t></w:r></w:p></w:tc>"
+                    for col in range(cols)
+                )
+                document.write(f"<w:tr>{cells}</w:tr>".encode())
+            document.write(b"</w:tbl><w:p/><w:sectPr/></w:body></w:document>")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    scale = 1
+    if "--scale" in args:
+        at = args.index("--scale")
+        scale = int(args[at + 1])
+        del args[at:at + 2]
+    out_dir = args[0] if args else DEFAULT_DIR
+    manifest = build_corpus(out_dir, scale, force=True)
+    for doc in manifest["documents"]:
+        print(f"{doc['name']:>20} {doc['size'] / 1e6:>8.2f} MB")
@@ -0,0 +1,61 @@
+# suite.py
+# Full benchmark run with baseline diffing: python -m benchmarks.suite [--save] [--only analyzers|api] ...
+# Generates the synthetic corpus (benchmarks/corpus, reused between runs), runs the
+# per-analyzer and end-to-end benchmarks, and compares against the saved baseline;
+# the exit status is 1 when a metric regressed. Record a new baseline with --save
+# after an intentional change, on the machine the comparisons will run on.
+import argparse
+import sys
+from datetime import datetime
+
+from benchmarks import baseline, bench_analyzers, bench_api
+from benchmarks.corpus import DEFAULT_DIR
+
+SUITES = {"analyzers": bench_analyzers, "api": bench_api}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="run only this suite (repeatable)")
+    parser.add_argument("--corpus", default=DEFAULT_DIR, help="corpus directory (default: %(default)s)")
+    parser.add_argument("--scale", type=int, default=1, help="multiply document sizes (default: 1)")
+    parser.add_argument("--repeat", type=int, default=bench_analyzers.REPEAT, help="warm runs per analyzer")
+    parser.add_argument("--requests", type=int, default=bench_api.REQUESTS, help="requests per concurrency level")
+    parser.add_argument("--baseline", default=baseline.DEFAULT_BASELINE, help="baseline file (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=baseline.THRESHOLD, help="relative change to report")
+    parser.add_argument("--save", action="store_true", help="write these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = {
+        "recorded": datetime.now().isoformat(timespec="seconds"),
+        "host": baseline.host_info(),
+        "scale": args.scale,
+        "benchmarks": {},
+    }
+    for name in args.only or list(SUITES):
+        print(f"⏱️ {name}")
+        if name == "analyzers":
+            results["benchmarks"][name] = bench_analyzers.run(args.corpus, args.repeat, args.scale)
+        else:
+            results["benchmarks"][name] = bench_api.run(args.corpus, args.requests, args.scale)
+
+    previous = baseline.load(args.baseline)
+    regressions = 0
+    if previous is None:
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+    elif previous.get("scale") != args.scale:
+        print(f"⚠️ Baseline was recorded at scale {previous.get('scale')}, not comparing")
+    else:
+        if args.only:
+            # Only compare the suites that ran
+            previous = {**previous, "benchmarks": {k: v for k, v in previous["benchmarks"].items() if k in args.only}}
+        regressions = baseline.report(baseline.compare(results, previous, args.threshold), results, previous)
+
+    if args.save:
+        baseline.save(results, args.baseline)
+        print(f"💾 Baseline saved to {args.baseline}")
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,48 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from services.startup import boot_phase, mark_ready, startup_report
 import os
-import tempfile
-import shutil
+import hmac
 from datetime import datetime
-import mimetypes
 
-from analyzers.pdf_analyzer import PDFAnalyzer
-from analyzers.docx_analyzer import DOCXAnalyzer
-from analyzers.image_analyzer import ImageAnalyzer
-from analyzers.text_analyzer import TextAnalyzer
-from analyzers.signature_analyzer import SignatureAnalyzer
+# Analyzers and their libraries (PyMuPDF, pikepdf, numpy, cryptography...) are
+# imported on first use through analyzers.registry, not here
+with boot_phase("framework"):
+    from fastapi import FastAPI, HTTPException, Header, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+    from starlette.concurrency import run_in_threadpool
 
-app = FastAPI()
+with boot_phase("services"):
+    from analyzers.executor import shutdown_executor
+    from analyzers.log import get_logger
+    from analyzers.metrics import HTTP_IN_FLIGHT, render as render_metrics
+    from analyzers.registry import start_warmup
+    from services.admission import admission_middleware, get_admission_controller
+    from services.ingest import ingest_request, upload_limit_middleware
+    from services.pipeline import analyze_upload, parse_analyzers
+    from services.batch import stream_batch, BATCH_MAX_BYTES, BATCH_MAX_FILES
+    from services.jobs import JobWorker, JOB_WORKERS, submit_job, get_job_queue, job_events
+    from services.result_cache import get_result_cache, analyzer_fingerprint
+
+with boot_phase("app"):
+    app = FastAPI()
+
+log = get_logger("api")
+
+# Middleware added last runs first: CORS wraps everything so rejections below stay
+# readable by browsers, and oversized uploads are turned away before taking a slot
+
+# ✅ Cap concurrent analyses (host-wide), queue a few more, turn the rest away with Retry-After
+app.middleware("http")(admission_middleware({"/analyze", "/api/analyze"}, {"/analyze/batch", "/api/analyze/batch"}))
+
+# ✅ Reject oversized uploads before their body is read
+app.middleware("http")(upload_limit_middleware({"/analyze", "/api/analyze", "/api/jobs"}))
+app.middleware("http")(upload_limit_middleware({"/analyze/batch", "/api/analyze/batch"}, BATCH_MAX_BYTES))
+
+# ✅ Count requests in flight for /metrics
+@app.middleware("http")
+async def track_in_flight(request, call_next):
+    with HTTP_IN_FLIGHT.track():
+        return await call_next(request)
 
 # ✅ CORS Configuration
 app.add_middleware(
@@ -22,8 +51,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],   # allow all methods
     allow_headers=["*"],   # allow all headers
+    expose_headers=["Retry-After"],
 )
 
+job_worker = None
+
+@app.on_event("startup")
+async def start_job_worker():
+    global job_worker
+    if JOB_WORKERS > 0:
+        job_worker = JobWorker(concurrency=JOB_WORKERS)
+        job_worker.start()
+    # ANALYZER_WARMUP=1 pre-imports analyzers in the background; requests are served meanwhile
+    start_warmup()
+    mark_ready()
+
+@app.on_event("shutdown")
+async def shutdown_analyzer_pools():
+    if job_worker:
+        await job_worker.stop()
+    shutdown_executor()
+
 @app.get("/")
 @app.get("/api")
 async def root():
@@ -42,91 +90,168 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
-@app.post("/analyze")
-@app.post("/api/analyze")
-async def analyze_document(file: UploadFile = File(...)):
-    """Analyze uploaded document for forgery detection"""
-    try:
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No file provided")
+@app.get("/api/diagnostics/startup")
+async def startup_diagnostics():
+    """Cold-start timing: boot phases, lazy analyzer/library imports and warm-up state"""
+    return startup_report()
+
+@app.get("/metrics")
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus metrics: analyzer latency, page throughput, ingest volume, cache and fallback counts"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-        content = await file.read()
-        file_size = len(content)
+@app.get("/api/admission")
+async def admission_status():
+    """Analysis slots in use and requests queued across all worker processes, with the limits"""
+    return await run_in_threadpool(get_admission_controller().info)
 
-        if file_size > 50 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File too large (max 50MB)")
+@app.post("/analyze")
+@app.post("/api/analyze")
+async def analyze_document(
+    request: Request, text_sample: str = None, analyzers: str = None, mode: str = None, timeout: float = None
+):
+    """Analyze a document uploaded as the multipart "file" field for forgery detection.
 
-        await file.seek(0)
+    text_sample ("first:5,last:5,stride:20") reads only those PDF pages for quick triage.
+    analyzers ("metadata,signature") runs only those analyzers; mode=quick reads
+    document-level metadata only, without touching page content.
+    timeout (seconds, default ANALYSIS_DEADLINE) bounds the analysis; sections
+    that run out of time come back marked partial or timedOut, and documents over
+    a resource limit (page count, decoded size, nesting) come back limitExceeded.
+    """
+    try:
+        options = parse_options(text_sample, analyzers, mode)
+        timeout = parse_timeout(timeout)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_file_path = temp_file.name
+        # Parse the body as it arrives: to disk in chunks, hashing on the way and failing fast on size
+        (upload,), _ = await ingest_request(request)
 
         try:
-            file_info = {
-                "filename": file.filename,
-                "size": file_size,
-                "type": file.content_type or mimetypes.guess_type(file.filename)[0],
-                "upload_time": datetime.now().isoformat()
-            }
-
-            # Initialize analyzers
-            pdf_analyzer = PDFAnalyzer()
-            docx_analyzer = DOCXAnalyzer()
-            image_analyzer = ImageAnalyzer()
-            text_analyzer = TextAnalyzer()
-            signature_analyzer = SignatureAnalyzer()
-
-            # Perform analysis
-            metadata = await extract_metadata(temp_file_path, file_info, pdf_analyzer, docx_analyzer)
-            text_analysis = await text_analyzer.analyze(temp_file_path, file_info)
-            image_analysis = await image_analyzer.analyze(temp_file_path, file_info)
-            signature_check = await signature_analyzer.analyze(temp_file_path, file_info)
-
-            return JSONResponse({
-                "success": True,
-                "metadata": metadata,
-                "textAnalysis": text_analysis,
-                "imageAnalysis": image_analysis,
-                "signatureCheck": signature_check,
-                "analysisTime": datetime.now().isoformat()
-            })
+            return JSONResponse(await analyze_upload(upload, options=options, timeout=timeout))
 
         finally:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            upload.cleanup()
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Analysis error: {str(e)}")
+        log.error("api.analysis_failed", f"❌ Analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-async def extract_metadata(file_path: str, file_info: dict, pdf_analyzer, docx_analyzer):
-    """Extract metadata depending on file type"""
-    base_metadata = {
-        "filename": file_info["filename"],
-        "size": file_info["size"],
-        "type": file_info["type"],
-        "lastModified": file_info["upload_time"],
+def parse_options(text_sample: str = None, analyzers: str = None, mode: str = None) -> dict:
+    """Validate per-request analysis options from query parameters"""
+    try:
+        options = parse_analyzers(analyzers, mode)
+        if text_sample:
+            from analyzers.text_analyzer import parse_sampling
+            options["textSample"] = parse_sampling(text_sample)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return options
+
+def parse_timeout(timeout=None) -> float:
+    """Validate a per-document time budget from the timeout query parameter (or form field)"""
+    from analyzers.deadline import parse_deadline
+    try:
+        return parse_deadline(None if timeout in (None, "") else float(timeout))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/analyze/batch")
+@app.post("/api/analyze/batch")
+async def analyze_batch(
+    request: Request, text_sample: str = None, analyzers: str = None, mode: str = None, timeout: float = None
+):
+    """Analyze many documents (multipart "files" fields, or one zip/tar of them), streaming one JSON result per line"""
+    options = parse_options(text_sample, analyzers, mode)
+    timeout = parse_timeout(timeout)
+
+    # Every part is on disk before results stream; the request body is fully read once we return
+    uploads, _ = await ingest_request(request, "files", max_bytes=BATCH_MAX_BYTES, max_files=BATCH_MAX_FILES)
+
+    return StreamingResponse(stream_batch(uploads, options, timeout=timeout), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: Request, text_sample: str = None, analyzers: str = None, mode: str = None):
+    """Queue a document (multipart "file" field) for background analysis and return its job id immediately.
+
+    timeout (form field, seconds) bounds the job's analysis; without it jobs
+    get JOB_DEADLINE, which is no deadline by default.
+    """
+    options = parse_options(text_sample, analyzers, mode)
+    (upload,), fields = await ingest_request(request)
+    try:
+        timeout = parse_timeout(fields.get("timeout"))
+    except HTTPException:
+        upload.cleanup()
+        raise
+    if timeout is not None:
+        options["timeout"] = timeout
+    try:
+        job_id = await run_in_threadpool(submit_job, upload, options)
+    except Exception as e:
+        upload.cleanup()
+        log.error("api.job_submission_failed", f"❌ Job submission error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Job submission failed: {str(e)}")
+    return {
+        "jobId": job_id,
+        "status": "queued",
+        "statusUrl": f"/api/jobs/{job_id}",
+        "eventsUrl": f"/api/jobs/{job_id}/events",
     }
 
-    file_type = file_info["type"]
-
-    if file_type == "application/pdf":
-        pdf_metadata = await pdf_analyzer.extract_metadata(file_path)
-        return {**base_metadata, **pdf_metadata}
-    elif file_type in [
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/msword",
-    ]:
-        docx_metadata = await docx_analyzer.extract_metadata(file_path)
-        return {**base_metadata, **docx_metadata}
-    else:
-        return {
-            **base_metadata,
-            "author": "Not available for this file type",
-            "createdDate": None,
-            "modifiedDate": None,
-        }
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, per-analyzer partial results and, once done, the full result"""
+    job = await run_in_threadpool(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events with per-analyzer progress until the job finishes"""
+    return StreamingResponse(
+        job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/admin/cache")
+async def cache_info(x_admin_token: str = Header(None)):
+    """Result cache statistics"""
+    require_admin(x_admin_token)
+    return get_result_cache().info()
+
+@app.delete("/api/admin/cache")
+async def invalidate_cache(digest: str = None, stale_only: bool = False, x_admin_token: str = Header(None)):
+    """Invalidate cached results for one document, older analyzer versions, or everything"""
+    require_admin(x_admin_token)
+    removed = await run_in_threadpool(get_result_cache().invalidate, digest, stale_only)
+    return {"removed": removed, "fingerprint": analyzer_fingerprint()}
+
+@app.get("/api/admin/image-index")
+async def image_index_info(x_admin_token: str = Header(None)):
+    """Size of the cross-document image index"""
+    require_admin(x_admin_token)
+    from services.image_index import get_image_index
+    return await run_in_threadpool(get_image_index().info)
+
+@app.get("/api/admin/text-index")
+async def text_index_info(x_admin_token: str = Header(None)):
+    """Size of the near-duplicate text index"""
+    require_admin(x_admin_token)
+    from services.text_index import get_text_index
+    return await run_in_threadpool(get_text_index().info)
+
+def require_admin(token: str):
+    """Admin routes need X-Admin-Token to match ADMIN_TOKEN; they are off without it"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 # ✅ Run locally (python index.py)
 if __name__ == "__main__":
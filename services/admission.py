@@ -0,0 +1,313 @@
+# admission.py
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi.responses import JSONResponse
+
+from analyzers.log import get_logger
+from analyzers.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS
+
+try:
+    import fcntl  # slots are shared by every worker process on the host through file locks
+except ImportError:
+    fcntl = None
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").lower() not in ("0", "false", "no")
+# Analyses running at once across all worker processes on the host
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", str(max(2, os.cpu_count() or 1))))
+# Requests allowed to wait for a slot, and for how long, before 503
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", str(4 * ADMISSION_MAX_ACTIVE)))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Requests (running or waiting) per client before 429; 0 = no per-client limit
+ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "4"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+# Identify clients by the first X-Forwarded-For address (only behind a trusted proxy)
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "0").lower() in ("1", "true", "yes")
+ADMISSION_DIR = os.getenv("ADMISSION_DIR", os.path.join(tempfile.gettempdir(), "forgery_admission"))
+POLL_INTERVAL = 0.05
+CLIENT_BUCKETS = 1024  # clients are hashed onto this many per-client slot groups
+
+log = get_logger("admission")
+
+
+class Rejected(Exception):
+    """A request turned away by admission control"""
+
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class SlotPool:
+    """A fixed number of slots shared by every process on the host.
+
+    Slot i is an exclusive flock on <dir>/<name>-<i>.lock. The kernel drops the
+    lock when its holder exits, so a killed worker never leaks capacity. flock
+    does not exclude other holders within the same process, so slots held here
+    are also tracked in memory. Without fcntl (Windows) the pool is per process.
+    """
+
+    def __init__(self, directory: str, name: str, size: int):
+        self.directory = directory
+        self.name = name
+        self.size = size
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """A slot handle, or None when every slot is taken"""
+        with self._lock:
+            for index in range(self.size):
+                if index in self._held:
+                    continue
+                locked, fd = self._lock_file(index)
+                if locked:
+                    self._held.add(index)
+                    return index, fd
+        return None
+
+    def release(self, slot):
+        index, fd = slot
+        with self._lock:
+            self._held.discard(index)
+            if fd is not None:
+                os.close(fd)  # closing the descriptor releases the flock
+
+    def in_use(self) -> int:
+        """Slots taken host-wide right now (each free slot is probed, then let go)"""
+        with self._lock:
+            taken = len(self._held)
+            if fcntl is None:
+                return taken
+            for index in range(self.size):
+                if index not in self._held:
+                    locked, fd = self._lock_file(index)
+                    if locked:
+                        os.close(fd)
+                    else:
+                        taken += 1
+            return taken
+
+    def _lock_file(self, index: int):
+        """(locked, descriptor holding the lock)"""
+        if fcntl is None:
+            return True, None
+        fd = os.open(os.path.join(self.directory, f"{self.name}-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True, fd
+        except OSError:
+            os.close(fd)
+            return False, None
+
+
+class AdmissionController:
+    """Caps concurrent analyses host-wide, with a bounded, timed wait queue and a per-client limit.
+
+    A request first takes one of its client's slots (429 when the client
+    already has ADMISSION_MAX_PER_CLIENT requests in), then a running slot if
+    one is free; otherwise it takes a queue slot (503 when the queue is full)
+    and polls for a running slot until ADMISSION_QUEUE_TIMEOUT (503). Waiters
+    are not served in strict arrival order. Work that runs several analyses
+    (batches) or none of a request's (jobs) takes a running slot per analysis
+    through running() instead.
+    """
+
+    def __init__(self, directory: str = ADMISSION_DIR):
+        if fcntl is not None:
+            os.makedirs(directory, exist_ok=True)
+        else:
+            log.warning("admission.per_process", "File locks unavailable; admission limits apply per process")
+        self.active = SlotPool(directory, "active", ADMISSION_MAX_ACTIVE)
+        self.queue = SlotPool(directory, "queue", ADMISSION_MAX_QUEUE)
+        self._directory = directory
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self.waiting = 0  # in this process
+
+    async def acquire(self, client: str, active: bool = True) -> list:
+        """Slots to pass to release() once the request is done; raises Rejected.
+
+        With active=False only the client's slot is taken.
+        """
+        held = []
+        try:
+            if ADMISSION_MAX_PER_CLIENT:
+                slot = self._client_pool(client).try_acquire()
+                if slot is None:
+                    raise Rejected(
+                        429, "client", f"Too many concurrent requests from this client (max {ADMISSION_MAX_PER_CLIENT})"
+                    )
+                held.append(("client", client, slot))
+
+            if active:
+                slot = self.active.try_acquire()
+                if slot is None:
+                    slot = await self._wait_in_queue()
+                held.append(("active", None, slot))
+            return held
+        except BaseException:
+            self.release(held)
+            raise
+
+    def release(self, held: list):
+        for pool, client, slot in reversed(held):
+            (self._client_pool(client) if pool == "client" else self.active).release(slot)
+
+    @asynccontextmanager
+    async def running(self, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        """Hold a running slot for one analysis, waiting in the queue up to queue_timeout
+        (raises Rejected). With queue_timeout=None it waits as long as it takes, without
+        a queue slot: background work has no client waiting on a 503."""
+        slot = self.active.try_acquire()
+        if slot is None:
+            slot = await (self._wait_for_slot() if queue_timeout is None else self._wait_in_queue(queue_timeout))
+        ADMISSION_ACTIVE.inc()
+        try:
+            yield
+        finally:
+            ADMISSION_ACTIVE.dec()
+            self.active.release(slot)
+
+    def info(self) -> dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "sharedAcrossProcesses": fcntl is not None,
+            "active": self.active.in_use(),
+            "maxActive": ADMISSION_MAX_ACTIVE,
+            "queued": self.queue.in_use(),
+            "maxQueue": ADMISSION_MAX_QUEUE,
+            "queuedInThisProcess": self.waiting,
+            "queueTimeoutSeconds": ADMISSION_QUEUE_TIMEOUT,
+            "maxPerClient": ADMISSION_MAX_PER_CLIENT,
+        }
+
+    async def _wait_in_queue(self, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        ticket = self.queue.try_acquire()
+        if ticket is None:
+            raise Rejected(503, "queueFull", f"Server busy: {ADMISSION_MAX_QUEUE} requests already waiting")
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            with ADMISSION_QUEUED.track():
+                while True:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    slot = self.active.try_acquire()
+                    if slot is not None:
+                        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started)
+                        return slot
+                    if time.monotonic() - started >= timeout:
+                        raise Rejected(503, "queueTimeout", f"Server busy: no analysis slot within {timeout:g}s")
+        finally:
+            self.waiting -= 1
+            self.queue.release(ticket)
+
+    async def _wait_for_slot(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            slot = self.active.try_acquire()
+            if slot is not None:
+                return slot
+
+    def _client_pool(self, client: str) -> SlotPool:
+        bucket = int.from_bytes(hashlib.sha1(client.encode()).digest()[:4], "big") % CLIENT_BUCKETS
+        with self._clients_lock:
+            pool = self._clients.get(bucket)
+            if pool is None:
+                pool = self._clients[bucket] = SlotPool(self._directory, f"client{bucket}", ADMISSION_MAX_PER_CLIENT)
+            return pool
+
+
+def client_id(request) -> str:
+    if ADMISSION_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
+
+
+@asynccontextmanager
+async def analysis_slot(background: bool = False):
+    """A running slot around one analysis that admission did not charge (batch items, jobs).
+
+    Background work waits for a slot however long it takes; anything else
+    queues like a request does. A no-op when admission control is off.
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    async with get_admission_controller().running(None if background else ADMISSION_QUEUE_TIMEOUT):
+        yield
+
+
+def admission_middleware(admitted_paths, batch_paths=frozenset()):
+    """Admit analysis requests before their body is read, and hold their slots until the
+    response (streamed batch results included) has been sent.
+
+    Batch requests only take their client's slot here: each document they
+    analyze takes its own running slot through analysis_slot().
+    """
+    async def middleware(request, call_next):
+        path = request.url.path
+        if not ADMISSION_ENABLED or request.method != "POST" or (path not in admitted_paths and path not in batch_paths):
+            return await call_next(request)
+        controller = get_admission_controller()
+        active = path not in batch_paths
+        try:
+            held = await controller.acquire(client_id(request), active)
+        except Rejected as e:
+            ADMISSION_REJECTIONS.inc(reason=e.reason)
+            log.warning("admission.rejected", f"🚦 {e}", reason=e.reason, path=request.url.path)
+            return JSONResponse(
+                status_code=e.status,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+
+        if active:
+            ADMISSION_ACTIVE.inc()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                if active:
+                    ADMISSION_ACTIVE.dec()
+                controller.release(held)
+
+        try:
+            response = await call_next(request)
+        except BaseException:
+            release()
+            raise
+        body = response.body_iterator
+
+        async def body_then_release():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                release()
+
+        response.body_iterator = body_then_release()
+        return response
+    return middleware
@@ -0,0 +1,167 @@
+# batch.py
+import asyncio
+import json
+import os
+import tarfile
+import zipfile
+
+from starlette.concurrency import run_in_threadpool
+
+from analyzers.log import get_logger
+from services.admission import analysis_slot, Rejected
+from services.ingest import ingest_fileobj, MAX_UPLOAD_BYTES
+from services.pipeline import analyze_upload
+
+BATCH_CONCURRENCY = max(1, int(os.getenv("BATCH_CONCURRENCY", "4")))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", "500")) * 1024 * 1024
+
+ARCHIVE_TYPES = {"application/zip", "application/x-tar", "application/gzip"}
+
+log = get_logger("batch")
+
+
+class BatchItem:
+    """One document of a batch: an ingested file, or the reason it could not be ingested"""
+
+    def __init__(self, index: int, filename: str, upload=None, error: str = None):
+        self.index = index
+        self.filename = filename
+        self.upload = upload
+        self.error = error
+
+
+def is_archive(upload) -> bool:
+    return upload.content_type in ARCHIVE_TYPES
+
+
+def iter_archive(upload, start_index: int = 0):
+    """Yield a BatchItem per regular member of a zip or tar archive.
+
+    Members are extracted one at a time straight to their own temp file, so
+    memory stays flat whatever the archive size.
+    """
+    index = start_index
+    total = 0
+    for name, opener, size in _archive_members(upload.path, upload.content_type):
+        if index - start_index >= BATCH_MAX_FILES:
+            yield BatchItem(index, name, error=f"Batch limit reached ({BATCH_MAX_FILES} files)")
+            return
+        if size > MAX_UPLOAD_BYTES:
+            yield BatchItem(index, name, error=f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)")
+        elif total + size > BATCH_MAX_BYTES:
+            yield BatchItem(index, name, error=f"Batch size limit reached ({BATCH_MAX_BYTES // (1024 * 1024)}MB)")
+            return
+        else:
+            total += size
+            try:
+                with opener() as member:
+                    yield BatchItem(index, name, upload=ingest_fileobj(member, name))
+            except Exception as e:
+                yield BatchItem(index, name, error=f"Could not extract: {e}")
+        index += 1
+
+
+def _archive_members(path: str, content_type: str):
+    """(name, opener, uncompressed size) for each regular file, in archive order"""
+    if content_type == "application/zip":
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _skip_member(info.filename):
+                    continue
+                yield info.filename, (lambda info=info: archive.open(info)), info.file_size
+    else:
+        # Stream mode reads members sequentially, which also covers .tar.gz
+        with tarfile.open(path, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile() or _skip_member(info.name):
+                    continue
+                yield info.name, (lambda info=info: archive.extractfile(info)), info.size
+
+
+def _skip_member(name: str) -> bool:
+    """Skip OS junk (__MACOSX, dotfiles) that archivers add alongside documents"""
+    base = os.path.basename(name)
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+async def stream_batch(uploads, options: dict = None, concurrency: int = BATCH_CONCURRENCY, timeout: float = None):
+    """Analyze uploads (expanding archives) and yield one NDJSON line per document as it finishes.
+
+    timeout is each document's own time budget, not the whole batch's.
+    """
+    items = asyncio.Queue(maxsize=concurrency)
+    results = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        index = 0
+        try:
+            for upload in uploads:
+                if is_archive(upload):
+                    members = iter_archive(upload, index)
+                    try:
+                        while True:
+                            item = await run_in_threadpool(next, members, None)
+                            if item is None:
+                                break
+                            await items.put(item)
+                            index = item.index + 1
+                    except Exception as e:
+                        await items.put(BatchItem(index, upload.filename, error=f"Unreadable archive: {e}"))
+                        index += 1
+                    finally:
+                        members.close()
+                elif upload.size > MAX_UPLOAD_BYTES:
+                    error = f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"
+                    await items.put(BatchItem(index, upload.filename, error=error))
+                    index += 1
+                else:
+                    await items.put(BatchItem(index, upload.filename, upload=upload))
+                    index += 1
+        finally:
+            for _ in range(concurrency):
+                await items.put(done)
+
+    async def consume():
+        while True:
+            item = await items.get()
+            if item is done:
+                await results.put(done)
+                return
+            await results.put(await _analyze_item(item, options, timeout))
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(consume()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            result = await results.get()
+            if result is done:
+                finished += 1
+                continue
+            yield json.dumps(result, default=str) + "\n"
+        await tasks[0]
+    finally:
+        # Client went away or we are done: stop work and drop every temp file
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for upload in uploads:
+            upload.cleanup()
+
+
+async def _analyze_item(item: BatchItem, options: dict = None, timeout: float = None) -> dict:
+    """Analyze one batch item under its own running slot; errors are reported in-line, never raised"""
+    if item.error:
+        return {"index": item.index, "filename": item.filename, "success": False, "error": item.error}
+    try:
+        async with analysis_slot():
+            result = await analyze_upload(item.upload, options=options, timeout=timeout)
+        return {"index": item.index, "filename": item.filename, **result}
+    except Rejected as e:
+        return {"index": item.index, "filename": item.filename, "success": False, "error": str(e)}
+    except Exception as e:
+        log.error("batch.failed", f"❌ Batch analysis error for {item.filename}: {e}")
+        return {"index": item.index, "filename": item.filename, "success": False, "error": f"Analysis failed: {e}"}
+    finally:
+        item.upload.cleanup()
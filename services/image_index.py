@@ -0,0 +1,228 @@
+# image_index.py
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from analyzers.image_hash import hamming, HASH_BITS
+from analyzers.log import get_logger
+
+IMAGE_INDEX_ENABLED = os.getenv("IMAGE_INDEX_ENABLED", "1").lower() not in ("0", "false", "no")
+IMAGE_INDEX_PATH = os.getenv("IMAGE_INDEX_PATH", os.path.join(tempfile.gettempdir(), "forgery_image_index.sqlite3"))
+MATCH_DISTANCE = int(os.getenv("IMAGE_MATCH_DISTANCE", "6"))  # max pHash bits that may differ
+DHASH_DISTANCE = int(os.getenv("IMAGE_MATCH_DHASH_DISTANCE", "12"))  # dHash must agree too
+MAX_MATCHES_PER_IMAGE = 5
+MAX_SIMILAR_IMAGES = 50
+MAX_CANDIDATES = 5000  # rows fetched per chunk lookup; bounds the cost of very common images
+
+# Multi-index hashing: the 64-bit pHash is split into CHUNKS substrings, each indexed.
+# Two hashes within distance r agree on some chunk to within r // CHUNKS bits.
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+SQL_BATCH = 500  # values per IN (...) list
+
+log = get_logger("image_index")
+
+
+class ImageIndex:
+    """Persistent perceptual-hash index of every image seen, for spotting reuse across documents.
+
+    One SQLite row per distinct image per document. Hamming-radius lookups
+    probe each chunk column for values within r // CHUNKS bits of the query
+    chunk, then verify full distances on the few rows found, so queries stay
+    sub-linear as the index grows.
+    """
+
+    def __init__(self, path: str = IMAGE_INDEX_PATH, distance: int = MATCH_DISTANCE,
+                 enabled: bool = IMAGE_INDEX_ENABLED):
+        self.path = path
+        self.distance = distance
+        self._local = threading.local()
+        self.enabled = enabled and self._init_db()
+
+    def match(self, document: str, filename: str, hashes: list) -> list:
+        """Images of other documents close to these hashes; then remember these for later lookups"""
+        if not self.enabled or not hashes:
+            return []
+        try:
+            similar = self.similar(document, hashes)
+            self.add(document, filename, hashes)
+            return similar
+        except sqlite3.Error as e:
+            log.warning("image_index.unavailable", f"Image index unavailable: {e}")
+            return []
+
+    def similar(self, document: str, hashes: list) -> list:
+        """Matches for each {page, image, phash, dhash} entry (hex hashes), closest first"""
+        results = []
+        for entry in hashes:
+            phash, dhash = int(entry["phash"], 16), int(entry["dhash"], 16)
+            for row, distance in self.query(phash, dhash, exclude=document)[:MAX_MATCHES_PER_IMAGE]:
+                match_document, match_filename, match_page, match_image = row
+                where = f"image {match_image} on page {match_page} of" if match_page else "image"
+                results.append({
+                    "page": entry.get("page"),
+                    "image": entry.get("image"),
+                    "distance": distance,
+                    "matchDocument": match_document,
+                    "matchFilename": match_filename,
+                    "matchPage": match_page,
+                    "matchImage": match_image,
+                    "description": f"Closely matches {where} {match_filename or match_document}",
+                })
+        results.sort(key=lambda result: result["distance"])
+        return results[:MAX_SIMILAR_IMAGES]
+
+    def query(self, phash: int, dhash: int, exclude: str = None, distance: int = None) -> list:
+        """((document, filename, page, image), pHash distance) for indexed images near the hashes"""
+        distance = self.distance if distance is None else distance
+        radius = distance // CHUNKS
+        conn = self._db()
+        seen = set()
+        found = []
+        for i, chunk in enumerate(_chunks(phash)):
+            values = _within(chunk, radius)
+            for start in range(0, len(values), SQL_BATCH):
+                batch = values[start:start + SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT id, document, filename, page, image, phash, dhash FROM images "
+                    f"WHERE c{i} IN ({','.join('?' * len(batch))}) LIMIT ?",
+                    (*batch, MAX_CANDIDATES),
+                )
+                for row_id, document, filename, page, image, row_phash, row_dhash in rows:
+                    if row_id in seen or document == exclude:
+                        continue
+                    seen.add(row_id)
+                    bits = hamming(phash, _unsigned(row_phash))
+                    if bits <= distance and hamming(dhash, _unsigned(row_dhash)) <= DHASH_DISTANCE:
+                        found.append(((document, filename, page, image), bits))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def add(self, document: str, filename: str, hashes: list):
+        """Index one document's images; the same image twice in a document is stored once"""
+        now = time.time()
+        rows = [
+            _row(document, filename, entry.get("page"), entry.get("image"),
+                 int(entry["phash"], 16), int(entry["dhash"], 16), now)
+            for entry in hashes
+        ]
+        with self._db() as conn:
+            conn.executemany(INSERT, rows)
+
+    def bulk_load(self, entries, batch_size: int = 10000) -> int:
+        """Load (document, filename, page, image, phash, dhash) tuples from a backfill run.
+
+        Rows go into an unindexed staging table private to this connection, then
+        into the index in one transaction, sorted on the first chunk column. The
+        live table keeps its indexes throughout, so lookups stay fast during the
+        load and an interrupted run leaves it untouched. Returns rows added.
+        """
+        conn = self._db()
+        added = 0
+        with conn:
+            conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS images_load AS SELECT {COLUMNS} FROM images WHERE 0")
+            conn.execute("DELETE FROM images_load")
+        try:
+            now = time.time()
+            rows = (_row(*entry, now) for entry in entries)
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                with conn:
+                    conn.executemany(STAGE_INSERT, batch)
+            with conn:
+                before = conn.total_changes
+                conn.execute(f"INSERT OR IGNORE INTO images ({COLUMNS}) SELECT {COLUMNS} FROM images_load ORDER BY c0")
+                added = conn.total_changes - before
+        finally:
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS temp.images_load")
+        return added
+
+    def info(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        entries, documents = self._db().execute("SELECT COUNT(*), COUNT(DISTINCT document) FROM images").fetchone()
+        return {"enabled": True, "entries": entries, "documents": documents, "distance": self.distance}
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> bool:
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._db() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS images ("
+                    "id INTEGER PRIMARY KEY, document TEXT NOT NULL, filename TEXT, page INTEGER, image TEXT, "
+                    "phash INTEGER NOT NULL, dhash INTEGER NOT NULL, "
+                    + "".join(f"c{i} INTEGER NOT NULL, " for i in range(CHUNKS))
+                    + "added REAL, UNIQUE (document, phash, dhash))"
+                )
+                _create_indexes(conn)
+            return True
+        except (OSError, sqlite3.Error) as e:
+            log.warning("image_index.disabled", f"Image index disabled: {e}")
+            return False
+
+
+COLUMNS = "document, filename, page, image, phash, dhash, " + "".join(f"c{i}, " for i in range(CHUNKS)) + "added"
+VALUES = "VALUES (" + ", ".join("?" * (7 + CHUNKS)) + ")"
+INSERT = f"INSERT OR IGNORE INTO images ({COLUMNS}) {VALUES}"
+STAGE_INSERT = f"INSERT INTO images_load ({COLUMNS}) {VALUES}"
+
+
+def _create_indexes(conn: sqlite3.Connection):
+    for i in range(CHUNKS):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS images_c{i} ON images (c{i})")
+
+
+def _row(document, filename, page, image, phash: int, dhash: int, added: float) -> tuple:
+    # SQLite integers are signed 64-bit
+    return (document, filename, page, image, _signed(phash), _signed(dhash), *_chunks(phash), added)
+
+
+def _chunks(value: int) -> list:
+    return [(value >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def _within(value: int, radius: int) -> list:
+    """Every CHUNK_BITS-bit value within radius bits of value"""
+    values = [value]
+    for flips in range(1, radius + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), flips):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+def _signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_image_index() -> ImageIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ImageIndex()
+        return _index
@@ -0,0 +1,320 @@
+# ingest.py
+import hashlib
+import mimetypes
+import os
+import tempfile
+import zlib
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from analyzers.metrics import INGESTED_BYTES, INGESTED_FILES
+
+try:
+    import xxhash  # optional, much faster than crc32 on large files
+except ImportError:
+    xxhash = None
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+FAST_HASH_ENABLED = os.getenv("UPLOAD_FAST_HASH", "0").lower() in ("1", "true", "yes")
+SNIFF_BYTES = 8192
+
+# Slack for multipart boundaries and part headers around the file body
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_FIELD_BYTES = 8 * 1024  # a non-file form field
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", "image/bmp"),
+]
+
+
+class IngestedFile:
+    """An upload streamed to disk, with its digests and sniffed type"""
+
+    def __init__(self, path: str, filename: str, size: int, sha256: str, fast_hash, content_type: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.fast_hash = fast_hash
+        self.content_type = content_type
+
+    def cleanup(self):
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class _StreamingWriter:
+    """Writes chunks to a temp file while hashing them"""
+
+    def __init__(self, suffix: str):
+        self.file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        self.path = self.file.name
+        self.size = 0
+        self.head = b""
+        self.sha256 = hashlib.sha256()
+        self.fast = None
+        if FAST_HASH_ENABLED:
+            self.fast = xxhash.xxh3_64() if xxhash else _Crc32()
+
+    def write(self, chunk: bytes):
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        self.sha256.update(chunk)
+        if self.fast:
+            self.fast.update(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        self.file.close()
+
+    def finish(self, filename: str, declared_type: str = None) -> IngestedFile:
+        content_type = sniff_type(self.head, filename) or declared_type or mimetypes.guess_type(filename)[0]
+        INGESTED_FILES.inc()
+        INGESTED_BYTES.inc(self.size)
+        return IngestedFile(
+            path=self.path,
+            filename=filename,
+            size=self.size,
+            sha256=self.sha256.hexdigest(),
+            fast_hash=self.fast.hexdigest() if self.fast else None,
+            content_type=content_type,
+        )
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class _Crc32:
+    """hashlib-style wrapper so crc32 can stand in for xxhash"""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, chunk: bytes):
+        self.value = zlib.crc32(chunk, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value:08x}"
+
+
+class _FormReader:
+    """python-multipart callbacks for one request body.
+
+    Parts of the file field are written to temp files and hashed as their bytes
+    arrive; other fields are kept as short strings. Crossing max_bytes (file
+    bytes, all parts together) or max_files raises from inside the parser.
+    """
+
+    def __init__(self, field: str, max_bytes: int, max_files: int):
+        self.field = field
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.files = []
+        self.fields = {}
+        self.received = 0
+        self.complete = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name = None
+        self._filename = None
+        self._declared_type = None
+        self._writer = None
+        self._value = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_end": self.on_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = params.get(b"name", b"").decode("utf-8", "replace")
+        filename = params.get(b"filename")
+        if filename is None:
+            self._value = bytearray()
+        elif self._name == self.field:
+            if len(self.files) >= self.max_files:
+                raise HTTPException(status_code=400, detail=f"Too many files (max {self.max_files})")
+            self._filename = os.path.basename(filename.decode("utf-8", "replace"))
+            if not self._filename:
+                raise HTTPException(status_code=400, detail="No file provided")
+            self._declared_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+            self._writer = _StreamingWriter(f"_{self._filename}")
+        # Files under any other field name are skipped
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._writer is not None:
+            if self.received + end - start > self.max_bytes:
+                raise _too_large(self.max_bytes)
+            self.received += end - start
+            self._writer.write(data[start:end])
+        elif self._value is not None:
+            if len(self._value) + end - start > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=400, detail=f"Form field {self._name!r} too large")
+            self._value += data[start:end]
+
+    def on_part_end(self):
+        if self._writer is not None:
+            self._writer.close()
+            self.files.append(self._writer.finish(self._filename, self._declared_type))
+            self._writer = None
+        elif self._value is not None:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+            self._value = None
+
+    def on_end(self):
+        self.complete = True
+
+    def discard(self):
+        if self._writer is not None:
+            self._writer.discard()
+        for upload in self.files:
+            upload.cleanup()
+
+
+async def ingest_request(request, field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES, max_files: int = 1) -> tuple:
+    """Stream a multipart/form-data request body to temp files, hashing as it goes.
+
+    The body is parsed straight off request.stream(), so each file is written
+    once and nothing is spooled ahead of the handler. Raises 413 as soon as the
+    file bytes cross max_bytes, or the body itself runs past that plus
+    MULTIPART_OVERHEAD (chunked uploads have no Content-Length for
+    upload_limit_middleware to check). Returns (files of the field, {other
+    field: value}).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    form = _FormReader(field, max_bytes, max_files)
+    parser = MultipartParser(boundary, form.callbacks())
+    streamed = 0
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            streamed += len(chunk)
+            if streamed > max_bytes + MULTIPART_OVERHEAD:
+                raise _too_large(max_bytes)
+            pending += chunk
+            # Server chunks are small; hand the parser (and the disk) CHUNK_SIZE at a time
+            if len(pending) >= CHUNK_SIZE:
+                data = bytes(pending)
+                pending.clear()
+                await run_in_threadpool(parser.write, data)
+        if pending:
+            await run_in_threadpool(parser.write, bytes(pending))
+        parser.finalize()
+        if not form.complete:
+            raise HTTPException(status_code=400, detail="Incomplete multipart body")
+    except MultipartParseError as e:
+        form.discard()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    except BaseException:
+        form.discard()
+        raise
+
+    if not form.files:
+        raise HTTPException(status_code=400, detail="No file provided")
+    return form.files, form.fields
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File too large (max {max_bytes // (1024 * 1024)}MB)")
+
+
+def ingest_fileobj(fileobj, filename: str, max_bytes: int = MAX_UPLOAD_BYTES, declared_type: str = None) -> IngestedFile:
+    """Blocking counterpart of ingest_request for file objects (archive members, job inputs)"""
+    filename = os.path.basename(filename or "")
+    if not filename:
+        raise ValueError("No file name provided")
+
+    writer = _StreamingWriter(f"_{filename}")
+    try:
+        while True:
+            chunk = fileobj.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if writer.size + len(chunk) > max_bytes:
+                raise ValueError(f"File too large (max {max_bytes // (1024 * 1024)}MB)")
+            writer.write(chunk)
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.finish(filename, declared_type)
+
+
+def sniff_type(head: bytes, filename: str = ""):
+    """Detect the real file type from its leading bytes; None when unknown"""
+    for magic, mime in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"\x1f\x8b"):
+        return "application/gzip"
+    if head[257:262] == b"ustar":
+        return "application/x-tar"
+    if head.startswith(b"PK\x03\x04"):
+        # OOXML packages are zips; word/ parts identify a Word document
+        if b"word/" in head or filename.lower().endswith((".docx", ".docm")):
+            return DOCX_TYPE
+        return "application/zip"
+    # Tolerate junk before the header, as PDF readers do
+    if b"%PDF-" in head[:1024]:
+        return "application/pdf"
+    return None
+
+
+def upload_limit_middleware(limited_paths, max_bytes: int = MAX_UPLOAD_BYTES):
+    """Reject oversized uploads from Content-Length before the body is read"""
+    async def middleware(request, call_next):
+        if request.method == "POST" and request.url.path in limited_paths:
+            length = request.headers.get("content-length")
+            if length and length.isdigit() and int(length) > max_bytes + MULTIPART_OVERHEAD:
+                return JSONResponse(
+                    status_code=413,
+                    content={"detail": f"File too large (max {max_bytes // (1024 * 1024)}MB)"},
+                )
+        return await call_next(request)
+    return middleware
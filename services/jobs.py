@@ -0,0 +1,335 @@
+# jobs.py
+import asyncio
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+from starlette.concurrency import run_in_threadpool
+
+from analyzers.log import get_logger
+from services.admission import analysis_slot
+from services.ingest import IngestedFile
+from services.pipeline import analyze_upload, selected_sections
+
+JOB_DIR = os.getenv("JOB_DIR", os.path.join(tempfile.gettempdir(), "forgery_jobs"))
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(JOB_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # in-process workers; 0 = use worker.py
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))  # requeue jobs whose worker vanished
+# Running jobs are touched this often, so a long analysis is never mistaken for a vanished worker
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(max(1, JOB_STALE_SECONDS // 5))))
+JOB_TTL = int(os.getenv("JOB_TTL", str(24 * 3600)))  # keep finished jobs this long
+# Time budget for a background analysis in seconds (0 = none); jobs exist for documents too big to wait on
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "0"))
+
+log = get_logger("jobs")
+
+class JobQueue(ABC):
+    """Queue backend interface. Backends must be safe to share between processes."""
+
+    @abstractmethod
+    def enqueue(self, job_id: str, upload: IngestedFile, options: dict = None):
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str):
+        """Atomically move the oldest queued job to running: (job_id, upload, options), or None when idle.
+
+        Running jobs not touched for JOB_STALE_SECONDS are requeued first.
+        """
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str):
+        """Mark a running job as still alive, so claim() does not requeue it"""
+
+    @abstractmethod
+    def progress(self, job_id: str, section: str, result: dict):
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, result: dict):
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def purge(self, older_than: float) -> list:
+        """Forget finished jobs; returns their input paths so callers can delete them"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """Default backend: one SQLite file shared by the API and any worker processes"""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL, updated REAL, "
+                "worker TEXT, upload TEXT, options TEXT, progress TEXT, result TEXT, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def enqueue(self, job_id: str, upload: IngestedFile, options: dict = None):
+        now = time.time()
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created, updated, upload, options, progress) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, '{}')",
+                (job_id, now, now, json.dumps(vars(upload)), json.dumps(options or {})),
+            )
+
+    def claim(self, worker_id: str):
+        now = time.time()
+        conn = self._db()
+        # IMMEDIATE takes the write lock up front, so two workers never claim the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND updated < ?",
+                (now - JOB_STALE_SECONDS,),
+            )
+            row = conn.execute(
+                "SELECT id, upload, options FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, updated = ? WHERE id = ?",
+                    (worker_id, now, row[0]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return row[0], IngestedFile(**json.loads(row[1])), json.loads(row[2] or "{}")
+
+    def heartbeat(self, job_id: str, worker_id: str):
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET updated = ? WHERE id = ? AND status = 'running' AND worker = ?",
+                (time.time(), job_id, worker_id),
+            )
+
+    def progress(self, job_id: str, section: str, result: dict):
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = json_set(progress, ?, json(?)), updated = ? WHERE id = ?",
+                (f"$.{section}", json.dumps(result, default=str), time.time(), job_id),
+            )
+
+    def complete(self, job_id: str, result: dict):
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, updated = ? WHERE id = ?",
+                (json.dumps(result, default=str), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str):
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str):
+        row = self._db().execute(
+            "SELECT id, status, created, updated, options, progress, result, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        job_id, status, created, updated, options, progress, result, error = row
+        return {
+            "jobId": job_id,
+            "status": status,
+            "createdAt": created,
+            "updatedAt": updated,
+            "options": json.loads(options or "{}"),
+            "progress": json.loads(progress or "{}"),
+            "result": json.loads(result) if result else None,
+            "error": error,
+        }
+
+    def purge(self, older_than: float) -> list:
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT upload FROM jobs WHERE status IN ('completed', 'failed') AND updated < ?", (older_than,)
+            ).fetchall()
+            conn.execute("DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated < ?", (older_than,))
+        return [json.loads(upload)["path"] for (upload,) in rows]
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+QUEUE_BACKENDS = {"sqlite": SQLiteJobQueue}
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def register_queue_backend(name: str, factory):
+    """Make a JobQueue implementation selectable through JOB_QUEUE_BACKEND"""
+    QUEUE_BACKENDS[name] = factory
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if JOB_QUEUE_BACKEND not in QUEUE_BACKENDS:
+                raise ValueError(f"Unknown job queue backend: {JOB_QUEUE_BACKEND}")
+            _queue = QUEUE_BACKENDS[JOB_QUEUE_BACKEND]()
+        return _queue
+
+
+def submit_job(upload: IngestedFile, options: dict = None) -> str:
+    """Move an ingested upload into the job directory and queue it"""
+    job_id = uuid.uuid4().hex
+    os.makedirs(JOB_DIR, exist_ok=True)
+    job_path = os.path.join(JOB_DIR, f"{job_id}_{upload.filename}")
+    shutil.move(upload.path, job_path)
+    upload.path = job_path
+    get_job_queue().enqueue(job_id, upload, options)
+    return job_id
+
+
+class JobWorker:
+    """Claims queued jobs and runs them through the analyzer pipeline"""
+
+    def __init__(self, concurrency: int = JOB_WORKERS, queue: JobQueue = None):
+        self.concurrency = concurrency
+        self.queue = queue or get_job_queue()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._tasks = []
+        self._stopping = asyncio.Event()
+
+    def start(self):
+        for _ in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._loop()))
+
+    async def stop(self):
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def _loop(self):
+        last_purge = 0
+        while not self._stopping.is_set():
+            if time.time() - last_purge > 60:
+                last_purge = time.time()
+                for path in await run_in_threadpool(self.queue.purge, time.time() - JOB_TTL):
+                    _remove(path)
+            claimed = await run_in_threadpool(self.queue.claim, self.worker_id)
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(*claimed)
+
+    async def run_job(self, job_id: str, upload: IngestedFile, options: dict = None):
+        log.info("job.started", f"⚙️ Job {job_id} started ({upload.filename})")
+
+        async def on_progress(section, result):
+            await run_in_threadpool(self.queue.progress, job_id, section, result)
+
+        # The budget is stored with the options but is not one: it must not change the cache key
+        options = dict(options or {})
+        timeout = options.pop("timeout", None)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            # Jobs are not admitted as requests; each still counts against the host's analysis cap
+            async with analysis_slot(background=True):
+                result = await analyze_upload(
+                    upload, on_progress, options, timeout=JOB_DEADLINE if timeout is None else timeout
+                )
+            await run_in_threadpool(self.queue.complete, job_id, result)
+            log.info("job.completed", f"✅ Job {job_id} completed")
+        except Exception as e:
+            log.error("job.failed", f"❌ Job {job_id} failed: {e}")
+            await run_in_threadpool(self.queue.fail, job_id, f"Analysis failed: {e}")
+        finally:
+            heartbeat.cancel()
+            _remove(upload.path)
+
+    async def _heartbeat(self, job_id: str):
+        """Touch the job while it runs; sections can take longer than JOB_STALE_SECONDS"""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await run_in_threadpool(self.queue.heartbeat, job_id, self.worker_id)
+            except Exception as e:
+                log.warning("job.heartbeat_failed", f"Heartbeat for job {job_id} failed: {e}")
+
+
+def _remove(path: str):
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+
+async def job_events(job_id: str):
+    """Server-sent events for a job: one progress event per finished section, then the result"""
+    queue = get_job_queue()
+    sent = set()
+    last_beat = time.monotonic()
+    while True:
+        job = await run_in_threadpool(queue.get, job_id)
+        if job is None:
+            yield _sse("error", {"jobId": job_id, "error": "Job not found"})
+            return
+
+        sections = selected_sections(job["options"])
+        for section in sections:
+            if section in job["progress"] and section not in sent:
+                sent.add(section)
+                yield _sse("progress", {
+                    "jobId": job_id,
+                    "section": section,
+                    "completed": len(sent),
+                    "total": len(sections),
+                    "result": job["progress"][section],
+                })
+
+        if job["status"] in ("completed", "failed"):
+            yield _sse(job["status"], {"jobId": job_id, "result": job["result"], "error": job["error"]})
+            return
+
+        if time.monotonic() - last_beat > 15:
+            # Comment line keeps proxies from closing an idle stream
+            last_beat = time.monotonic()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,353 @@
+# pipeline.py
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+from starlette.concurrency import run_in_threadpool
+
+from analyzers.deadline import start_deadline
+from analyzers.document_context import DocumentContext
+from analyzers.limits import LimitExceeded, preflight
+from analyzers.log import get_logger
+from analyzers.metrics import ANALYSES_IN_FLIGHT, CACHE_LOOKUPS, SECTIONS
+from analyzers.registry import ANALYZERS, get_analyzer
+from services.result_cache import get_result_cache, cache_key
+
+DOCX_TYPES = [
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+]
+
+# ?analyzers= names and the response section each one fills, in response order
+ANALYZER_SECTIONS = {
+    "metadata": "metadata",
+    "text": "textAnalysis",
+    "image": "imageAnalysis",
+    "signature": "signatureCheck",
+}
+MODES = ("full", "quick")
+# Registry analyzers behind each response section
+SECTION_ANALYZERS = {
+    "metadata": ("pdf", "docx"),
+    "textAnalysis": ("text",),
+    "imageAnalysis": ("image",),
+    "signatureCheck": ("signature",),
+}
+# Document backends each analyzer opens; the preflight limit checks only use these
+ANALYZER_BACKENDS = {
+    "metadata": {"pikepdf", "ooxml"},
+    "text": {"fitz", "ooxml"},
+    "image": {"pikepdf", "pillow"},
+    "signature": {"pikepdf", "ooxml"},
+}
+# Section statuses for results cut short; other statuses (e.g. an "unverified" signature) are complete
+INCOMPLETE_STATUSES = ("partial", "timedOut", "limitExceeded")
+
+log = get_logger("pipeline")
+
+
+def parse_analyzers(spec: str = None, mode: str = None) -> dict:
+    """Options for "analyzers=metadata,signature" and "mode=quick|full"; raises ValueError on bad input.
+
+    Quick mode reads only document-level metadata, so it defaults to the
+    metadata section alone. Selecting everything in full mode is the default
+    and adds no options, so those requests share cache entries with plain ones.
+    """
+    mode = (mode or "full").strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode: {mode} (expected {' or '.join(MODES)})")
+    if spec:
+        names = {name.strip().lower() for name in spec.split(",") if name.strip()}
+        unknown = names - set(ANALYZER_SECTIONS)
+        if unknown or not names:
+            raise ValueError(
+                f"Invalid analyzers: {', '.join(sorted(unknown)) or spec} (choose from {', '.join(ANALYZER_SECTIONS)})"
+            )
+    else:
+        names = {"metadata"} if mode == "quick" else set(ANALYZER_SECTIONS)
+
+    options = {}
+    if names != set(ANALYZER_SECTIONS):
+        options["analyzers"] = [name for name in ANALYZER_SECTIONS if name in names]
+    if mode == "quick":
+        options["mode"] = "quick"
+    return options
+
+
+def selected_sections(options: dict = None) -> list:
+    """Response sections a request asked for, in response order"""
+    names = (options or {}).get("analyzers") or list(ANALYZER_SECTIONS)
+    return [ANALYZER_SECTIONS[name] for name in names]
+
+
+def preflight_backends(options: dict = None) -> set:
+    """Backends the requested analyzers will open, for the preflight limit checks.
+
+    Quick metadata reads only the trailer and catalog, never page content, so
+    it gives preflight nothing to guard and its backend is left out.
+    """
+    options = options or {}
+    names = options.get("analyzers") or list(ANALYZER_SECTIONS)
+    backends = set()
+    for name in names:
+        if name == "metadata" and options.get("mode") == "quick":
+            continue
+        backends |= ANALYZER_BACKENDS[name]
+    return backends
+
+
+def build_file_info(upload, options: dict = None) -> dict:
+    """file_info handed to every analyzer for an ingested upload"""
+    return {
+        "filename": upload.filename,
+        "size": upload.size,
+        "type": upload.content_type,
+        "sha256": upload.sha256,
+        "fast_hash": upload.fast_hash,
+        "upload_time": datetime.now().isoformat(),
+        "options": options or {},
+    }
+
+
+async def analyze_upload(upload, on_progress=None, options: dict = None, timeout: float = None) -> dict:
+    """Analyze an ingested upload, serving repeat submissions from the result cache.
+
+    on_progress(section, result) is awaited as each response section completes.
+    options (e.g. textSample) change the result, so they are part of the cache key.
+    timeout is the time budget in seconds (default ANALYSIS_DEADLINE); it does not
+    change complete results, so it is not part of the key.
+    """
+    file_info = build_file_info(upload, options)
+    cache = get_result_cache()
+    key = cache_key(upload.sha256, file_info["type"], json.dumps(file_info["options"], sort_keys=True))
+
+    cached, tier = await run_in_threadpool(cache.get, key)
+    if cache.enabled:
+        CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss", tier=tier or "none")
+    if cached is not None:
+        # Per-request fields come from this upload, not the one that filled the cache
+        if "metadata" in cached:
+            cached["metadata"].update({
+                "filename": file_info["filename"],
+                "lastModified": file_info["upload_time"],
+            })
+        # Other documents may have been indexed since the result was cached
+        if "imageAnalysis" in cached:
+            await link_similar_images(cached["imageAnalysis"], file_info)
+        if "textAnalysis" in cached:
+            await link_similar_documents(cached["textAnalysis"], file_info)
+        if on_progress:
+            for section, result in cached.items():
+                await on_progress(section, result)
+        return {
+            "success": True,
+            **cached,
+            "cache": {"hit": True, "tier": tier},
+            "analysisTime": datetime.now().isoformat()
+        }
+
+    deadline = start_deadline(timeout)
+    with ANALYSES_IN_FLIGHT.track():
+        sections = await run_analysis(upload.path, file_info, on_progress, deadline)
+    incomplete = {
+        section: result["status"] for section, result in sections.items() if result.get("status") in INCOMPLETE_STATUSES
+    }
+    for section in sections:
+        SECTIONS.inc(section=section, status=incomplete.get(section, "complete"))
+    if not incomplete:
+        # Partial results would be served to later requests with more time to spare
+        await run_in_threadpool(cache.set, key, upload.sha256, sections)
+    response = {
+        "success": True,
+        **sections,
+        "cache": {"hit": False, "tier": None},
+        "analysisTime": datetime.now().isoformat()
+    }
+    if deadline is not None:
+        response["deadline"] = {
+            "budgetSeconds": deadline.seconds,
+            "elapsedSeconds": round(deadline.elapsed(), 3),
+            "complete": not incomplete,
+            "partialSections": [section for section, status in incomplete.items() if status == "partial"],
+            "timedOutSections": [section for section, status in incomplete.items() if status == "timedOut"],
+        }
+    limited = [section for section, status in incomplete.items() if status == "limitExceeded"]
+    if limited:
+        response["limitExceeded"] = {"sections": limited, "limit": sections[limited[0]].get("limit")}
+    return response
+
+
+async def run_analysis(file_path: str, file_info: dict, on_progress=None, deadline=None) -> dict:
+    """Run the requested analyzers on one file and return their response sections.
+
+    With a deadline, analyzers that run short of time return partial sections
+    ("status": "partial"), and sections still running when it passes are
+    reported as {"status": "timedOut"} instead of holding up the response.
+    Documents over a resource limit (analyzers/limits.py) are rejected before
+    any analyzer runs, and every section reports {"status": "limitExceeded"}.
+    """
+    wanted = selected_sections(file_info.get("options"))
+
+    # Only requested analyzers are imported and run, and the document context
+    # opens a backend only when one of them asks for it. A cold import pulls in
+    # PyMuPDF, numpy or pikepdf, so analyzers are resolved off the event loop
+    needed = [name for name in ANALYZERS if any(name in SECTION_ANALYZERS[section] for section in wanted)]
+    builders = {
+        "metadata": lambda context: extract_metadata(
+            file_path, file_info, analyzers["pdf"], analyzers["docx"], context
+        ),
+        "textAnalysis": lambda context: _with_similar_documents(
+            analyzers["text"].analyze(file_path, file_info, context), file_info
+        ),
+        "imageAnalysis": lambda context: _with_similar_images(
+            analyzers["image"].analyze(file_path, file_info, context), file_info
+        ),
+        "signatureCheck": lambda context: analyzers["signature"].analyze(file_path, file_info, context),
+    }
+
+    # Perform analysis; the file is parsed once per backend and shared,
+    # and independent analyzers run concurrently off the event loop, each
+    # with whatever is left of the request's budget
+    context = DocumentContext(file_path, file_info, deadline)
+    try:
+        try:
+            await run_in_threadpool(preflight, context, preflight_backends(file_info.get("options")))
+        except LimitExceeded as e:
+            log.warning("pipeline.limit_exceeded", f"🚫 {file_info['filename']}: {e}")
+            return await _over_limit(wanted, file_info, e.info(), on_progress)
+        analyzers = await run_in_threadpool(lambda: {name: get_analyzer(name) for name in needed})
+        sections = {section: builders[section](context) for section in wanted}
+        results = await asyncio.gather(*[
+            _report(section, _within_deadline(section, _within_limits(section, coro), deadline), on_progress)
+            for section, coro in sections.items()
+        ])
+    finally:
+        if deadline is not None and deadline.cancelled:
+            # Timed-out analyzers may still hold a handle; close once they let go
+            threading.Thread(target=context.close, name="context-close", daemon=True).start()
+        else:
+            context.close()
+
+    return dict(zip(sections, results))
+
+
+async def _over_limit(wanted: list, file_info: dict, limit: dict, on_progress=None) -> dict:
+    """Sections for a document rejected by the preflight checks; metadata keeps the upload's own fields"""
+    sections = {}
+    for section in wanted:
+        result = {"status": "limitExceeded", "limit": limit, "error": limit["message"]}
+        if section == "metadata":
+            result = {**base_metadata(file_info), **result}
+        sections[section] = result
+        if on_progress:
+            await on_progress(section, result)
+    return sections
+
+
+async def _within_limits(section: str, coro):
+    """Await one section, turning a limit hit mid-analysis (or a worker out of memory) into its result"""
+    try:
+        return await coro
+    except LimitExceeded as e:
+        limit = e.info()
+    except MemoryError:
+        limit = {"limit": "memory", "value": None, "max": None, "message": "Analysis ran out of memory"}
+    log.warning("pipeline.limit_exceeded", f"🚫 {section}: {limit['message']}")
+    return {"status": "limitExceeded", "limit": limit, "error": limit["message"]}
+
+
+async def _within_deadline(section: str, coro, deadline):
+    """Await one section, giving up when the request's deadline passes"""
+    if deadline is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, deadline.hard_remaining())
+    except asyncio.TimeoutError:
+        # Threads cannot be interrupted; cancelling stops the analyzer at its next handle request
+        deadline.cancel()
+        log.warning("pipeline.timed_out", f"⏱️ {section} timed out after {deadline.elapsed():.2f}s")
+        return {
+            "status": "timedOut",
+            "error": f"Analysis did not finish within the {deadline.seconds:g}s deadline",
+        }
+
+
+async def _with_similar_images(coro, file_info: dict):
+    return await link_similar_images(await coro, file_info)
+
+
+async def link_similar_images(image_analysis: dict, file_info: dict) -> dict:
+    """Add similarImages (close matches in previously seen documents) and index this document's images"""
+    from services.image_index import get_image_index
+    hashes = image_analysis.get("imageHashes")
+    if hashes is not None:
+        image_analysis["similarImages"] = await run_in_threadpool(
+            get_image_index().match, file_info["sha256"], file_info["filename"], hashes
+        )
+    return image_analysis
+
+
+async def _with_similar_documents(coro, file_info: dict):
+    return await link_similar_documents(await coro, file_info)
+
+
+async def link_similar_documents(text_analysis: dict, file_info: dict) -> dict:
+    """Replace the raw MinHash signature with similarDocuments (prior documents with near-identical text).
+
+    Full extractions are indexed; sampled and incomplete ones only look up, since
+    their signature covers part of the text. Without a signature (cache hits) the
+    one stored for the document is used.
+    """
+    from services.text_index import get_text_index
+    signature = text_analysis.pop("textSignature", None)
+    if signature is None and "similarDocuments" not in text_analysis:
+        return text_analysis
+    complete = "sampling" not in text_analysis and not text_analysis.get("status")
+    similar = await run_in_threadpool(
+        get_text_index().match, file_info["sha256"], file_info["filename"], signature, complete
+    )
+    if similar is not None:
+        text_analysis["similarDocuments"] = similar
+    return text_analysis
+
+
+async def _report(section: str, coro, on_progress):
+    """Await one section and hand its result to the progress callback"""
+    result = await coro
+    if on_progress:
+        await on_progress(section, result)
+    return result
+
+
+def base_metadata(file_info: dict) -> dict:
+    """Metadata fields known from the upload itself, without parsing the document"""
+    return {
+        "filename": file_info["filename"],
+        "size": file_info["size"],
+        "type": file_info["type"],
+        "sha256": file_info.get("sha256"),
+        "lastModified": file_info["upload_time"],
+    }
+
+
+async def extract_metadata(file_path: str, file_info: dict, pdf_analyzer, docx_analyzer, context=None):
+    """Extract metadata depending on file type"""
+    base = base_metadata(file_info)
+
+    file_type = file_info["type"]
+    quick = file_info.get("options", {}).get("mode") == "quick"
+
+    if file_type == "application/pdf":
+        pdf_metadata = await pdf_analyzer.extract_metadata(file_path, context, quick)
+        return {**base, **pdf_metadata}
+    elif file_type in DOCX_TYPES:
+        docx_metadata = await docx_analyzer.extract_metadata(file_path, context, quick)
+        return {**base, **docx_metadata}
+    else:
+        return {
+            **base,
+            "author": "Not available for this file type",
+            "createdDate": None,
+            "modifiedDate": None,
+        }
@@ -0,0 +1,249 @@
+# result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from analyzers.log import get_logger
+from analyzers.trust_store import trust_store_digest
+
+CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "forgery_result_cache.sqlite3")
+)
+CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+MEMORY_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+MEMORY_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Bump to invalidate every cached result without touching analyzer sources
+ANALYZER_VERSION = os.getenv("ANALYZER_VERSION", "1")
+
+log = get_logger("result_cache")
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_FINGERPRINT_SOURCES = ("analyzers", "services/pipeline.py")
+
+_fingerprint = None
+
+
+def analyzer_fingerprint() -> str:
+    """Short hash of the analyzer sources and trust store, so edited logic never serves old results"""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(ANALYZER_VERSION.encode())
+        for source in _FINGERPRINT_SOURCES:
+            path = os.path.join(_PROJECT_ROOT, source)
+            files = [path] if os.path.isfile(path) else [
+                os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".py")
+            ]
+            for file_path in files:
+                digest.update(os.path.relpath(file_path, _PROJECT_ROOT).encode())
+                with open(file_path, "rb") as f:
+                    digest.update(f.read())
+        # Signature verdicts depend on which certificates are trusted
+        digest.update(trust_store_digest().encode())
+        _fingerprint = digest.hexdigest()[:16]
+    return _fingerprint
+
+
+def cache_key(sha256: str, file_type: str, *variant) -> str:
+    """Content hash + resolved type + analyzer fingerprint (+ request options)"""
+    parts = [sha256, file_type or "", analyzer_fingerprint(), *[str(v) for v in variant]]
+    return ":".join(parts)
+
+
+class ResultCache:
+    """Two-tier result cache: an in-process LRU in front of a shared SQLite store.
+
+    The memory tier is bounded by entry count, serialized size and TTL. The
+    SQLite tier survives restarts and is shared by every worker on the host.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL,
+                 max_entries: int = MEMORY_MAX_ENTRIES, max_bytes: int = MEMORY_MAX_BYTES,
+                 enabled: bool = CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._memory = OrderedDict()  # key -> (expires_at, body)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"memoryHits": 0, "diskHits": 0, "misses": 0}
+        self.disk_enabled = self.enabled and self._init_db()
+        self._generation = 0
+        self._generation = self._read_generation()
+
+    def get(self, key: str):
+        """Return (result, tier) where tier is "memory" or "disk"; (None, None) on miss"""
+        if not self.enabled:
+            return None, None
+        now = time.time()
+        self._sync_generation()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                expires_at, body = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memoryHits"] += 1
+                    return json.loads(body), "memory"
+                self._evict(key)
+
+        row = None
+        if self.disk_enabled:
+            try:
+                row = self._db().execute(
+                    "SELECT body, expires FROM results WHERE key = ? AND expires > ?", (key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                log.warning("result_cache.read_failed", f"Result cache read failed: {e}")
+        if row is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None, None
+
+        body, expires_at = row
+        with self._lock:
+            self.stats["diskHits"] += 1
+            self._remember(key, body, expires_at)
+        return json.loads(body), "disk"
+
+    def set(self, key: str, digest: str, result: dict):
+        if not self.enabled:
+            return
+        body = json.dumps(result, default=str)
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, body, expires_at)
+        if not self.disk_enabled:
+            return
+        try:
+            with self._db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, digest, fingerprint, created, expires, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, digest, analyzer_fingerprint(), now, expires_at, body),
+                )
+        except sqlite3.Error as e:
+            log.warning("result_cache.write_failed", f"Result cache write failed: {e}")
+
+    def invalidate(self, digest: str = None, stale_only: bool = False) -> int:
+        """Drop entries for one document, entries from older analyzer versions, or everything"""
+        if not self.enabled:
+            return 0
+        fingerprint = analyzer_fingerprint()
+        removed = 0
+        with self._lock:
+            for key in list(self._memory):
+                if (digest and not key.startswith(digest + ":")) or (stale_only and fingerprint in key):
+                    continue
+                self._evict(key)
+                removed += 1
+        if not self.disk_enabled:
+            return removed
+
+        clauses, params = [], []
+        if digest:
+            clauses.append("digest = ?")
+            params.append(digest)
+        if stale_only:
+            clauses.append("fingerprint != ?")
+            params.append(fingerprint)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._db() as conn:
+            removed = conn.execute(f"DELETE FROM results{where}", params).rowcount
+            conn.execute("DELETE FROM results WHERE expires <= ?", (time.time(),))
+            # Tell other workers to drop their memory tiers
+            conn.execute("UPDATE meta SET generation = generation + 1")
+        self._generation = self._read_generation()
+        return removed
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "diskEnabled": self.disk_enabled,
+                "fingerprint": analyzer_fingerprint(),
+                "memoryEntries": len(self._memory),
+                "memoryBytes": self._memory_bytes,
+                **self.stats,
+            }
+
+    # Internals (callers hold self._lock)
+
+    def _remember(self, key: str, body: str, expires_at: float):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._memory:
+            self._evict(key)
+        self._memory[key] = (expires_at, body)
+        self._memory_bytes += len(body)
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            self._evict(next(iter(self._memory)))
+
+    def _evict(self, key: str):
+        _, body = self._memory.pop(key)
+        self._memory_bytes -= len(body)
+
+    def _read_generation(self) -> int:
+        if not self.disk_enabled:
+            return 0
+        try:
+            return self._db().execute("SELECT generation FROM meta").fetchone()[0]
+        except sqlite3.Error:
+            return self._generation
+
+    def _sync_generation(self):
+        """Clear the memory tier if another worker invalidated since we last looked"""
+        generation = self._read_generation()
+        if generation != self._generation:
+            with self._lock:
+                self._memory.clear()
+                self._memory_bytes = 0
+                self._generation = generation
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> bool:
+        try:
+            with self._db() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, digest TEXT, fingerprint TEXT, "
+                    "created REAL, expires REAL, body TEXT)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS results_digest ON results (digest)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (generation INTEGER NOT NULL)")
+                if conn.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 0:
+                    conn.execute("INSERT INTO meta (generation) VALUES (0)")
+            return True
+        except sqlite3.Error as e:
+            # A read-only filesystem still gets the memory tier
+            log.warning("result_cache.disk_unavailable", f"Result cache disk tier unavailable: {e}")
+            return False
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
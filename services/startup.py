@@ -0,0 +1,54 @@
+# startup.py
+import os
+import time
+from contextlib import contextmanager
+
+from analyzers import registry
+
+# Imported first by index.py, so this is as close to interpreter start as app code gets
+BOOT_STARTED = time.perf_counter()
+
+_phases = []
+_ready = None
+
+
+def _process_age():
+    """Seconds since the process was created (Linux /proc), or None where unavailable"""
+    try:
+        with open("/proc/self/stat") as f:
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return round(uptime - started_ticks / os.sysconf("SC_CLK_TCK"), 3)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+INTERPRETER_SECONDS = _process_age()
+
+
+@contextmanager
+def boot_phase(name: str):
+    """Time one step of application boot (an import group, app setup...)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append({"phase": name, "seconds": round(time.perf_counter() - started, 4)})
+
+
+def mark_ready():
+    """Record the moment the app finished its startup hooks"""
+    global _ready
+    if _ready is None:
+        _ready = time.perf_counter()
+
+
+def startup_report() -> dict:
+    """Cold-start breakdown: interpreter start, boot phases, and lazy imports since"""
+    return {
+        "interpreterSeconds": INTERPRETER_SECONDS,
+        "bootSeconds": round(_ready - BOOT_STARTED, 4) if _ready is not None else None,
+        "phases": list(_phases),
+        **registry.report(),
+    }
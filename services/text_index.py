@@ -0,0 +1,162 @@
+# text_index.py
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from analyzers.log import get_logger
+from analyzers.text_stats import MINHASH_PERMUTATIONS
+
+TEXT_INDEX_ENABLED = os.getenv("TEXT_INDEX_ENABLED", "1").lower() not in ("0", "false", "no")
+TEXT_INDEX_PATH = os.getenv("TEXT_INDEX_PATH", os.path.join(tempfile.gettempdir(), "forgery_text_index.sqlite3"))
+MIN_SIMILARITY = float(os.getenv("TEXT_MATCH_MIN_SIMILARITY", "0.5"))  # estimated Jaccard
+MAX_SIMILAR_DOCUMENTS = 5
+MAX_CANDIDATES = 2000  # documents whose signatures are compared per lookup
+
+# LSH banding: documents sharing every row of any band become candidates.
+# 32 bands x 4 rows puts the 50% detection point near Jaccard 0.42.
+BANDS = 32
+ROWS = MINHASH_PERMUTATIONS // BANDS
+
+log = get_logger("text_index")
+
+
+class TextIndex:
+    """Persistent MinHash/LSH index of analyzed documents' text, for spotting lightly edited copies.
+
+    Each document keeps its signature plus one bucket row per band; a lookup
+    reads BANDS index entries and compares only the signatures found there,
+    so its cost does not grow with the corpus.
+    """
+
+    def __init__(self, path: str = TEXT_INDEX_PATH, enabled: bool = TEXT_INDEX_ENABLED):
+        self.path = path
+        self._local = threading.local()
+        self.enabled = enabled and self._init_db()
+
+    def match(self, document: str, filename: str, signature: bytes = None, remember: bool = True) -> list:
+        """Prior documents with near-identical text; then index this one (unless remember is False).
+
+        Without a signature, the one stored for the document is used, so cached
+        results can be refreshed; None when there is none.
+        """
+        if not self.enabled:
+            return []
+        try:
+            if signature is None:
+                row = self._db().execute("SELECT signature FROM documents WHERE sha256 = ?", (document,)).fetchone()
+                if not row:
+                    return None
+                signature, remember = row[0], False
+            similar = self.similar(document, signature)
+            if remember:
+                self.add(document, filename, signature)
+            return similar
+        except sqlite3.Error as e:
+            log.warning("text_index.unavailable", f"Text index unavailable: {e}")
+            return []
+
+    def similar(self, document: str, signature: bytes) -> list:
+        """[{document, filename, similarity}] for indexed documents, most similar first"""
+        conn = self._db()
+        candidates = set()
+        for band, bucket in enumerate(_buckets(signature)):
+            rows = conn.execute(
+                "SELECT document FROM buckets WHERE band = ? AND bucket = ? LIMIT ?", (band, bucket, MAX_CANDIDATES)
+            )
+            candidates.update(row[0] for row in rows)
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+        if not candidates:
+            return []
+
+        ids = list(candidates)[:MAX_CANDIDATES]
+        rows = conn.execute(
+            f"SELECT sha256, filename, signature FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall()
+        query = np.frombuffer(signature, dtype=np.uint32)
+        results = []
+        for sha256, filename, stored in rows:
+            if sha256 == document:
+                continue
+            similarity = float((np.frombuffer(stored, dtype=np.uint32) == query).mean())
+            if similarity >= MIN_SIMILARITY:
+                results.append({"document": sha256, "filename": filename, "similarity": round(similarity, 2)})
+        results.sort(key=lambda result: result["similarity"], reverse=True)
+        return results[:MAX_SIMILAR_DOCUMENTS]
+
+    def add(self, document: str, filename: str, signature: bytes):
+        self.add_many([(document, filename, signature)])
+
+    def add_many(self, entries: list):
+        """Index (sha256, filename, signature) tuples in one transaction; known documents are skipped"""
+        now = time.time()
+        with self._db() as conn:
+            for document, filename, signature in entries:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO documents (sha256, filename, signature, added) VALUES (?, ?, ?, ?)",
+                    (document, filename, signature, now),
+                )
+                if cursor.rowcount:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO buckets (band, bucket, document) VALUES (?, ?, ?)",
+                        [(band, bucket, cursor.lastrowid) for band, bucket in enumerate(_buckets(signature))],
+                    )
+
+    def info(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        documents = self._db().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"enabled": True, "documents": documents, "minSimilarity": MIN_SIMILARITY}
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> bool:
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._db() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS documents ("
+                    "id INTEGER PRIMARY KEY, sha256 TEXT UNIQUE NOT NULL, filename TEXT, "
+                    "signature BLOB NOT NULL, added REAL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS buckets ("
+                    "band INTEGER NOT NULL, bucket INTEGER NOT NULL, document INTEGER NOT NULL, "
+                    "PRIMARY KEY (band, bucket, document)) WITHOUT ROWID"
+                )
+            return True
+        except (OSError, sqlite3.Error) as e:
+            log.warning("text_index.disabled", f"Text index disabled: {e}")
+            return False
+
+
+def _buckets(signature: bytes) -> list:
+    """One signed 64-bit key per band, hashed from that band's rows of the signature"""
+    width = ROWS * 4
+    return [
+        int.from_bytes(hashlib.blake2b(signature[i:i + width], digest_size=8).digest(), "little", signed=True)
+        for i in range(0, BANDS * width, width)
+    ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_text_index() -> TextIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TextIndex()
+        return _index
@@ -0,0 +1,32 @@
+# worker.py
+# Standalone job worker: python worker.py [concurrency]
+# Runs queued /api/jobs analyses outside the API process (set JOB_WORKERS=0 on the API).
+import asyncio
+import sys
+
+from services.jobs import JobWorker, JOB_WORKERS
+from analyzers.executor import shutdown_executor
+from analyzers.limits import limit_worker_memory
+from analyzers.log import get_logger
+
+log = get_logger("worker")
+
+
+async def main(concurrency: int):
+    worker = JobWorker(concurrency=concurrency)
+    log.info("worker.started", f"⚙️ Job worker {worker.worker_id} running with {concurrency} slot(s)")
+    try:
+        await worker.run_forever()
+    finally:
+        await worker.stop()
+        shutdown_executor()
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else max(1, JOB_WORKERS)
+    # A runaway decode fails its job with MemoryError instead of taking the worker down
+    limit_worker_memory()
+    try:
+        asyncio.run(main(concurrency))
+    except KeyboardInterrupt:
+        pass